@@ -0,0 +1,282 @@
+"""
+截图归档
+超过一定时间的截图追加到按月滚动的 pack 文件（标准的无压缩 tar，可用 tar 命令直接查看），
+同时维护 哈希→(pack, 偏移, 长度) 索引，任意截图都能按哈希 O(1) 定位并通过 mmap 读取。
+
+目录结构:
+  screenshots/archive/pack-YYYYMM.tar
+  screenshots/archive/index.json
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import tarfile
+import hashlib
+from pathlib import Path
+
+from .storage import atomic_write_bytes, stored_file_time, file_lock, fsync_path
+
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+
+# tar 结尾的两个全零块；下次追加时从这里覆盖写入
+END_OF_ARCHIVE = b"\0" * (BLOCK_SIZE * 2)
+
+
+class ScreenshotArchive:
+    """截图 pack 文件归档"""
+
+    def __init__(self, archive_dir, fsync=False):
+        self.archive_dir = Path(archive_dir)
+        self.index_path = self.archive_dir / "index.json"
+        self.fsync = fsync
+        # packs: {pack 文件名: 有效数据结束偏移}
+        # entries: {md5: [pack 文件名, 数据偏移, 长度, 原文件名, mtime]}
+        # aliases: {原文件名: md5}，内容与已归档文件相同、文件名不同的截图
+        self.packs = {}
+        self.entries = {}
+        self.aliases = {}
+        self.names = {}
+        self._maps = {}
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        # 其他进程可能已经扩展了 pack，旧的映射长度不够
+        self.close()
+        try:
+            index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        self.packs = index.get("packs", {})
+        self.entries = index.get("entries", {})
+        self.aliases = index.get("aliases", {})
+        self.names = {entry[3]: digest for digest, entry in self.entries.items()}
+        self.names.update(self.aliases)
+
+    def save_index(self):
+        # 原文件删除后索引是找到归档内容的唯一途径，总是落盘
+        data = json.dumps({"packs": self.packs, "entries": self.entries,
+                           "aliases": self.aliases}).encode("utf-8")
+        atomic_write_bytes(self.index_path, data, fsync=True)
+
+    def _pack_end(self, pack_path):
+        """pack 中有效数据的结束位置，按文件实际内容确定而不是信任索引
+
+        正常结束的 pack 以两个全零块结尾，从结尾标记处继续写；
+        写入中途失败留下的残余数据不覆盖，按块对齐后接在其后。
+        """
+        try:
+            size = pack_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+        if size >= len(END_OF_ARCHIVE):
+            with open(pack_path, "rb") as f:
+                f.seek(size - len(END_OF_ARCHIVE))
+                if f.read() == END_OF_ARCHIVE:
+                    return size - len(END_OF_ARCHIVE)
+        return size + (-size % BLOCK_SIZE)
+
+    def _append(self, pack_name, name, data, mtime):
+        """在 pack 末尾追加一个 tar 成员，返回数据偏移
+
+        只写入新成员和结尾标记，不扫描已有内容；
+        追加位置按 pack 的实际大小确定，索引过期或丢失时也不会覆盖已有数据。
+        """
+        pack_path = self.archive_dir / pack_name
+        end = self._pack_end(pack_path)
+
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(mtime)
+        info.mode = 0o644
+        header = info.tobuf(format=tarfile.GNU_FORMAT)
+        padding = -len(data) % BLOCK_SIZE
+
+        # 已映射的 pack 即将被扩展，先关闭旧的映射
+        old_map = self._maps.pop(pack_name, None)
+        if old_map is not None:
+            old_map.close()
+
+        with open(pack_path, "r+b" if pack_path.exists() else "wb") as f:
+            f.seek(end)
+            f.write(header)
+            f.write(data)
+            f.write(b"\0" * padding)
+            new_end = f.tell()
+            f.write(END_OF_ARCHIVE)
+            f.truncate()
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        self.packs[pack_name] = new_end
+        return end + len(header)
+
+    def add(self, filepath):
+        """归档单个文件，返回其内容的 MD5；内容已归档过时只记录不重复写入
+
+        调用方负责调用 save_index()，索引落盘之后才能删除原文件。
+        """
+        filepath = Path(filepath)
+        data = filepath.read_bytes()
+        digest = hashlib.md5(data).hexdigest()
+        if digest not in self.entries:
+            mtime = filepath.stat().st_mtime
+            pack_name = time.strftime("pack-%Y%m.tar", time.localtime(mtime))
+            offset = self._append(pack_name, filepath.name, data, mtime)
+            self.entries[digest] = [pack_name, offset, len(data), filepath.name, mtime]
+        if self.entries[digest][3] != filepath.name:
+            # 重复内容只保存一份，文件名作为别名写入索引，重新加载后仍可按文件名查找
+            self.aliases[filepath.name] = digest
+        else:
+            self.aliases.pop(filepath.name, None)
+        self.names[filepath.name] = digest
+        return digest
+
+    def archive_files(self, paths):
+        """归档一批文件并删除原文件，返回成功归档的数量
+
+        命令行和监听器可能同时归档同一目录：整批持有归档目录的文件锁，并以磁盘上的索引为准。
+        pack 和索引都落盘之后才删除原文件；中途崩溃时原文件仍在，下次归档会重新写入，已有数据不会被覆盖。
+        """
+        with file_lock(self.archive_dir / ".lock"):
+            self.load_index()
+            added = []
+            try:
+                for path in paths:
+                    try:
+                        digest = self.add(path)
+                    except FileNotFoundError:
+                        continue
+                    added.append((Path(path), self.entries[digest][0]))
+            finally:
+                if added:
+                    for pack_name in {pack_name for _, pack_name in added}:
+                        fsync_path(self.archive_dir / pack_name)
+                    self.save_index()
+                    for path, _ in added:
+                        try:
+                            path.unlink()
+                        except FileNotFoundError:
+                            pass
+        return len(added)
+
+    def resolve(self, key):
+        """按 MD5、MD5 前缀或原文件名查找，返回 MD5；找不到或不唯一时返回 None"""
+        key = Path(key).name
+        if key in self.entries:
+            return key
+        if key in self.names:
+            return self.names[key]
+        matches = [digest for digest in self.entries if digest.startswith(key)]
+        return matches[0] if len(matches) == 1 else None
+
+    def _map(self, pack_name):
+        mapped = self._maps.get(pack_name)
+        if mapped is None:
+            with open(self.archive_dir / pack_name, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack_name] = mapped
+        return mapped
+
+    def read(self, digest):
+        """通过 mmap 读取归档的文件内容"""
+        pack_name, offset, size = self.entries[digest][:3]
+        return self._map(pack_name)[offset:offset + size]
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+
+def open_archive(archive_dir, fsync=False, engine="tar"):
+    """按引擎名称打开归档: tar（pack 文件）或 tiles（分块去重，需要 numpy）"""
+    if engine == "tiles":
+        from .tiles import TileStore
+        return TileStore(archive_dir, fsync=fsync)
+    return ScreenshotArchive(archive_dir, fsync=fsync)
+
+
+def main():
+    """命令行入口点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude Code 截图归档")
+    parser.add_argument(
+        "--tmp-dir",
+        type=str,
+        help="截图目录（默认: ~/.neurora/claude-code/screenshots）"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["tar", "tiles"],
+        default="tar",
+        help="归档引擎（默认 tar；tiles 为分块去重存储）"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="列出已归档的截图")
+
+    pack = subparsers.add_parser("pack", help="立即归档超过指定时间的截图")
+    pack.add_argument("--hours", type=float, default=24, help="归档多少小时以前的截图（默认24）")
+
+    restore = subparsers.add_parser("restore", help="恢复归档的截图")
+    restore.add_argument("key", help="MD5（或前缀）或原文件名")
+    restore.add_argument("-o", "--output", help="写入的文件路径（默认恢复到截图目录）")
+    restore.add_argument("--clipboard", action="store_true", help="恢复到剪切板而不是文件")
+
+    args = parser.parse_args()
+
+    tmp_dir = Path(args.tmp_dir) if args.tmp_dir else \
+        Path.home() / ".neurora" / "claude-code" / "screenshots"
+    try:
+        archive = open_archive(tmp_dir / "archive", engine=args.engine)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    try:
+        if args.command == "list":
+            for digest, (pack_name, _, size, name, mtime) in sorted(
+                    archive.entries.items(), key=lambda item: item[1][4]):
+                when = time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime))
+                print(f"{digest[:12]}  {when}  {size / 1024:8.0f} KB  {pack_name}  {name}")
+            print(f"📦 共 {len(archive.entries)} 个归档截图")
+
+        elif args.command == "pack":
+            cutoff = time.time() - args.hours * 3600
+            aged = [p for p in tmp_dir.glob("clipboard_*")
+                    if stored_file_time(p.stat()) < cutoff]
+            count = archive.archive_files(aged)
+            print(f"📦 已归档 {count} 个截图")
+
+        elif args.command == "restore":
+            digest = archive.resolve(args.key)
+            if digest is None:
+                print(f"❌ 未找到归档截图: {args.key}")
+                return 1
+            data = archive.read(digest)
+            name = archive.entries[digest][3]
+
+            if args.clipboard:
+                from .clipboard import set_clipboard_png
+                if not name.lower().endswith(".png") or not set_clipboard_png(data):
+                    print("❌ 无法恢复到剪切板（仅支持 PNG），请使用 -o 恢复到文件")
+                    return 1
+                print(f"📋 已恢复到剪切板: {name}")
+            else:
+                output = Path(args.output) if args.output else tmp_dir / name
+                atomic_write_bytes(output, data)
+                print(f"✅ 已恢复: {output}")
+    finally:
+        archive.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
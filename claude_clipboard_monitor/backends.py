@@ -0,0 +1,501 @@
+"""
+平台后端
+监听器通过这一层访问剪切板、进程、窗口和输入注入，不直接调用 ImageGrab / pyperclip /
+psutil / pyautogui。运行时选择实现：
+
+- system: 真实的平台实现，依赖在首次使用时才导入，缺少依赖不会影响模块导入；
+          X11 上有 python-xlib 时输入注入直接走 XTEST，否则使用 pyautogui
+- fake:   纯内存实现，不需要显示器，用于无头运行和基准测试
+
+环境变量 CLAUDE_CLIPBOARD_BACKEND=fake 可让所有入口使用内存实现。
+"""
+
+import os
+import time
+import select
+import platform
+import subprocess
+
+from . import clipboard
+
+
+class SystemClipboard:
+    """真实剪切板"""
+
+    def __init__(self):
+        # X11 上的剪切板变化计数器（首次使用时创建，不可用时为 False）
+        self._counter = None
+
+    def read(self, encode=True):
+        """读取剪切板：PNG 字节、复制的文件路径列表、PIL 图片（encode=False）或 None"""
+        return clipboard.grab_clipboard(encode=encode)
+
+    def read_text(self):
+        import pyperclip
+        return pyperclip.paste()
+
+    def write_text(self, text):
+        import pyperclip
+        pyperclip.copy(text)
+
+    def write_text_once(self, text):
+        """写入只服务一次粘贴请求的文本，返回写入进程；平台不支持时返回 None"""
+        return clipboard.set_clipboard_text_once(text)
+
+    def change_count(self):
+        """剪切板变化计数（不读取内容）；无法获取时返回 None，调用方每次都需要重新读取"""
+        if self._counter is None:
+            self._counter = False
+            if platform.system() == "Linux" and os.environ.get("DISPLAY"):
+                try:
+                    self._counter = clipboard.SelectionChangeCounter()
+                except Exception:
+                    pass
+        return clipboard.clipboard_change_count(self._counter or None)
+
+    def write_png(self, data):
+        return clipboard.set_clipboard_png(data)
+
+    def write_files(self, paths):
+        return clipboard.set_clipboard_files(paths)
+
+
+class SystemProcesses:
+    """通过 psutil 枚举进程"""
+
+    def is_claude_running(self):
+        """检测 Claude Code 是否在运行"""
+        import psutil
+        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+            try:
+                name = proc.info.get('name', '')
+                cmdline = proc.info.get('cmdline', [])
+                # 检查进程名或命令行中是否包含 claude
+                if (name and 'claude' in name.lower()) or \
+                   (cmdline and any('claude' in str(cmd).lower() for cmd in cmdline)):
+                    return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return False
+
+    def claude_terminals(self):
+        """返回运行在终端中的 Claude Code 进程 [(pid, 终端设备), ...]
+
+        按可执行文件名匹配（见 is_claude_command），排除本进程和没有控制终端的进程。
+        """
+        import psutil
+        own = os.getpid()
+        found = []
+        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'terminal']):
+            try:
+                info = proc.info
+                if info['pid'] == own or not info.get('terminal'):
+                    continue
+                if is_claude_command(info.get('name'), info.get('cmdline')):
+                    found.append((info['pid'], info['terminal']))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return found
+
+
+# Claude Code 通过 npm 安装时由 node 运行的包路径
+CLAUDE_PACKAGE = "@anthropic-ai/claude-code"
+
+# 运行 npm 安装的 claude 脚本的解释器
+SCRIPT_RUNTIMES = ("node", "bun", "deno")
+
+
+def _executable_name(path):
+    name = os.path.basename(path.replace("\\", "/")).lower()
+    return name[:-4] if name.endswith(".exe") else name
+
+
+def is_claude_command(name, cmdline):
+    """进程是否为 Claude Code 本身
+
+    只看可执行文件名：原生安装时为 claude，npm 安装时是 node 等解释器运行的
+    claude 脚本或 @anthropic-ai/claude-code 包。参数中出现 claude 或 clipboard 的其他进程
+    （本工具、打开 CLAUDE.md 的编辑器等）都不算。
+    """
+    cmdline = cmdline or []
+    program = _executable_name(cmdline[0]) if cmdline else ""
+    if _executable_name(name or "") == "claude" or program == "claude":
+        return True
+    if program in SCRIPT_RUNTIMES or _executable_name(name or "") in SCRIPT_RUNTIMES:
+        scripts = [arg for arg in cmdline[1:] if not arg.startswith("-")]
+        if scripts:
+            return _executable_name(scripts[0]) == "claude" or CLAUDE_PACKAGE in scripts[0]
+    return False
+
+
+class SystemWindows:
+    """真实窗口查找"""
+
+    def __init__(self):
+        self._finder = None
+        # 读取 _NET_ACTIVE_WINDOW 的 X 连接（首次使用时创建，不可用时为 False）
+        self._display = None
+
+    def find_claude_windows(self):
+        if self._finder is None:
+            from .drag_simulator import ClaudeCodeWindowFinder
+            self._finder = ClaudeCodeWindowFinder()
+        return self._finder.find_claude_windows()
+
+    def active_window_title(self):
+        """获取当前活动窗口标题"""
+        try:
+            if platform.system() == "Windows":
+                import win32gui
+                hwnd = win32gui.GetForegroundWindow()
+                return win32gui.GetWindowText(hwnd)
+            elif platform.system() == "Darwin":
+                from AppKit import NSWorkspace
+                active_app = NSWorkspace.sharedWorkspace().activeApplication()
+                return active_app.get('NSApplicationName', '')
+            elif platform.system() == "Linux":
+                result = subprocess.run(['xdotool', 'getactivewindow', 'getwindowname'],
+                                        capture_output=True, text=True)
+                return result.stdout.strip() if result.returncode == 0 else ""
+        except Exception:
+            pass
+        return ""
+
+    def _active_window_x11(self):
+        if self._display is None:
+            self._display = False
+            if os.environ.get("DISPLAY"):
+                from Xlib import display as xdisplay
+                self._display = xdisplay.Display()
+                self._active_atom = self._display.intern_atom("_NET_ACTIVE_WINDOW")
+        if not self._display:
+            return None
+        from Xlib import X
+        prop = self._display.screen().root.get_full_property(self._active_atom,
+                                                             X.AnyPropertyType)
+        return prop.value[0] if prop and len(prop.value) else None
+
+    def active_window_id(self):
+        """当前前台窗口的标识（不启动子进程）；无法获取时返回 None
+
+        只用于判断前台窗口是否变化，变化后再通过 active_window_title() 查询标题。
+        """
+        try:
+            if platform.system() == "Windows":
+                import win32gui
+                return win32gui.GetForegroundWindow()
+            elif platform.system() == "Darwin":
+                from AppKit import NSWorkspace
+                return NSWorkspace.sharedWorkspace().frontmostApplication().processIdentifier()
+            elif platform.system() == "Linux":
+                return self._active_window_x11()
+        except Exception:
+            pass
+        return None
+
+
+# 等待窗口激活的默认超时时间（秒）
+ACTIVATE_TIMEOUT = 1.0
+
+
+def _request_activate_x11(window_id):
+    """通过 wmctrl 或 xdotool 按 id 请求激活窗口，返回请求是否已发出"""
+    for command in (['wmctrl', '-ia', window_id], ['xdotool', 'windowactivate', window_id]):
+        try:
+            if subprocess.run(command, capture_output=True).returncode == 0:
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+class PyAutoGUIInput:
+    """通过 pyautogui 注入鼠标和键盘事件"""
+
+    def __init__(self):
+        self._pyautogui = None
+
+    @property
+    def pyautogui(self):
+        if self._pyautogui is None:
+            import pyautogui
+            # 禁用 pyautogui 的安全特性（在自动化中很重要）；
+            # 调用方按实际条件等待，不需要每次调用后的固定停顿
+            pyautogui.FAILSAFE = False
+            pyautogui.PAUSE = 0
+            self._pyautogui = pyautogui
+        return self._pyautogui
+
+    def activate(self, window, timeout=ACTIVATE_TIMEOUT):
+        """激活窗口，返回是否确认已成为前台窗口
+
+        Windows 上设置前台窗口并等待生效；Linux 上有窗口 id 时通过 wmctrl -ia
+        （或 xdotool windowactivate）请求窗口管理器激活。除 Windows 外无法确认，
+        返回 False，由调用方点击窗口或等待其出现在前台。
+        """
+        if platform.system() == "Linux" and window.get('id') is not None:
+            _request_activate_x11(str(window['id']))
+            return False
+        hwnd = window.get('hwnd')
+        if hwnd is None or platform.system() != "Windows":
+            return False
+        import win32gui
+        try:
+            win32gui.SetForegroundWindow(hwnd)
+        except Exception:
+            return False
+        deadline = time.monotonic() + timeout
+        while win32gui.GetForegroundWindow() != hwnd:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def click(self, x, y):
+        self.pyautogui.click(x, y)
+
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys)
+
+
+class XTestInput:
+    """通过 XTEST 扩展直接向 X 服务器注入事件（需要 python-xlib）
+
+    激活窗口时发送 _NET_ACTIVE_WINDOW 请求，并等待根窗口的 _NET_ACTIVE_WINDOW
+    属性确认切换完成；按键注入后 sync，返回时 X 服务器已经处理完所有事件。
+    """
+
+    def __init__(self, display_name=None):
+        from Xlib import X, XK, display as xdisplay
+        from Xlib.ext import xtest
+
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = xdisplay.Display(display_name)
+        if not self.display.has_extension("XTEST"):
+            raise RuntimeError("X 服务器不支持 XTEST 扩展")
+        self.root = self.display.screen().root
+        self.active_atom = self.display.intern_atom("_NET_ACTIVE_WINDOW")
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+
+    def active_window(self):
+        prop = self.root.get_full_property(self.active_atom, self.X.AnyPropertyType)
+        return prop.value[0] if prop and len(prop.value) else None
+
+    def activate(self, window, timeout=ACTIVATE_TIMEOUT):
+        """请求窗口管理器激活窗口，在 timeout 内等待确认"""
+        window_id = window.get('id')
+        if window_id is None:
+            return False
+        window_id = int(window_id, 0) if isinstance(window_id, str) else int(window_id)
+        if self.active_window() == window_id:
+            return True
+
+        from Xlib.protocol import event as xevent
+        # 来源指示 2（pager）：窗口管理器不会因焦点窃取保护而拒绝
+        message = xevent.ClientMessage(
+            window=self.display.create_resource_object("window", window_id),
+            client_type=self.active_atom,
+            data=(32, [2, self.X.CurrentTime, 0, 0, 0]),
+        )
+        mask = self.X.SubstructureRedirectMask | self.X.SubstructureNotifyMask
+        self.root.send_event(message, event_mask=mask)
+        self.display.flush()
+
+        deadline = time.monotonic() + timeout
+        while True:
+            while self.display.pending_events():
+                self.display.next_event()
+            if self.active_window() == window_id:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # 等待根窗口属性变化事件，而不是固定间隔轮询
+            select.select([self.display], [], [], remaining)
+
+    def _keycode(self, key):
+        name = {"ctrl": "Control_L", "shift": "Shift_L", "alt": "Alt_L",
+                "cmd": "Super_L", "enter": "Return"}.get(key, key)
+        keycode = self.display.keysym_to_keycode(self.XK.string_to_keysym(name))
+        if not keycode:
+            raise ValueError(f"无法映射按键: {key}")
+        return keycode
+
+    def click(self, x, y):
+        X = self.X
+        self.xtest.fake_input(self.display, X.MotionNotify, x=x, y=y)
+        self.xtest.fake_input(self.display, X.ButtonPress, 1)
+        self.xtest.fake_input(self.display, X.ButtonRelease, 1)
+        self.display.sync()
+
+    def hotkey(self, *keys):
+        keycodes = [self._keycode(key) for key in keys]
+        for keycode in keycodes:
+            self.xtest.fake_input(self.display, self.X.KeyPress, keycode)
+        for keycode in reversed(keycodes):
+            self.xtest.fake_input(self.display, self.X.KeyRelease, keycode)
+        self.display.sync()
+
+
+class SystemInput:
+    """X11 上优先使用 XTEST，不可用时回退到 pyautogui（首次注入时才选择和连接）"""
+
+    def __init__(self):
+        self._impl = None
+
+    @property
+    def impl(self):
+        if self._impl is None:
+            if platform.system() == "Linux" and os.environ.get("DISPLAY"):
+                try:
+                    self._impl = XTestInput()
+                except Exception:
+                    pass
+            if self._impl is None:
+                self._impl = PyAutoGUIInput()
+        return self._impl
+
+    def activate(self, window, timeout=ACTIVATE_TIMEOUT):
+        return self.impl.activate(window, timeout)
+
+    def click(self, x, y):
+        self.impl.click(x, y)
+
+    def hotkey(self, *keys):
+        self.impl.hotkey(*keys)
+
+
+class FakeClipboard:
+    """内存剪切板
+
+    content 为 read() 返回的内容（PNG 字节、文件路径列表或 PIL 图片），
+    text 为文本内容；所有写入按顺序记录在 writes 中。
+    """
+
+    def __init__(self, content=None, text=""):
+        self.content = content
+        self.text = text
+        self.writes = []
+        self.changes = 0
+
+    def set_content(self, content):
+        self.content = content
+        self.changes += 1
+
+    def set_text(self, text):
+        self.text = text
+        self.content = None
+        self.changes += 1
+
+    def change_count(self):
+        return self.changes
+
+    def read(self, encode=True):
+        content = self.content
+        if encode and content is not None and hasattr(content, "save"):
+            content = clipboard.encode_png(content.copy())
+        return content
+
+    def read_text(self):
+        return self.text
+
+    def write_text(self, text):
+        self.set_text(text)
+        self.writes.append(("text", text))
+
+    def write_text_once(self, text):
+        # 内存剪切板没有一次性写入进程，调用方回退到普通写入
+        return None
+
+    def write_png(self, data):
+        self.set_content(data)
+        self.writes.append(("png", data))
+        return True
+
+    def write_files(self, paths):
+        self.set_content(list(paths))
+        self.writes.append(("files", list(paths)))
+        return True
+
+
+class FakeProcesses:
+    """内存进程表"""
+
+    def __init__(self, claude_running=True, terminals=None):
+        self.claude_running = claude_running
+        self.terminals = terminals or []
+
+    def is_claude_running(self):
+        return self.claude_running
+
+    def claude_terminals(self):
+        return list(self.terminals)
+
+
+class FakeWindows:
+    """内存窗口列表"""
+
+    def __init__(self, windows=None, active_title="claude"):
+        if windows is None:
+            windows = [{'title': 'claude', 'x': 0, 'y': 0, 'width': 1280, 'height': 800}]
+        self.windows = windows
+        self.active_title = active_title
+
+    def find_claude_windows(self):
+        return list(self.windows)
+
+    def active_window_title(self):
+        return self.active_title
+
+    def active_window_id(self):
+        return self.active_title
+
+
+class FakeInput:
+    """记录注入的输入事件，不做任何实际操作"""
+
+    def __init__(self):
+        self.events = []
+
+    def activate(self, window, timeout=ACTIVATE_TIMEOUT):
+        self.events.append(("activate", window.get('title')))
+        return True
+
+    def click(self, x, y):
+        self.events.append(("click", x, y))
+
+    def hotkey(self, *keys):
+        self.events.append(("hotkey",) + keys)
+
+
+class Backends:
+    """一组平台后端"""
+
+    def __init__(self, clipboard, processes, windows, input):
+        self.clipboard = clipboard
+        self.processes = processes
+        self.windows = windows
+        self.input = input
+
+
+def system_backends():
+    return Backends(SystemClipboard(), SystemProcesses(), SystemWindows(), SystemInput())
+
+
+def fake_backends(**overrides):
+    backends = Backends(FakeClipboard(), FakeProcesses(), FakeWindows(), FakeInput())
+    for name, value in overrides.items():
+        setattr(backends, name, value)
+    return backends
+
+
+def get_backends(name=None):
+    """按名称（或 CLAUDE_CLIPBOARD_BACKEND 环境变量）选择后端，默认为 system"""
+    name = name or os.environ.get("CLAUDE_CLIPBOARD_BACKEND", "system")
+    if name == "fake":
+        return fake_backends()
+    if name == "system":
+        return system_backends()
+    raise ValueError(f"未知的后端: {name}")
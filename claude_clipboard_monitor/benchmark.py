@@ -0,0 +1,607 @@
+"""
+性能基准
+用模拟剪切板数据驱动监听器流水线，无需显示器或真实剪切板
+
+用法:
+  python -m claude_clipboard_monitor.benchmark memory            # 1000 次 4K 噪声截图内存基准（含解码）
+  python -m claude_clipboard_monitor.benchmark memory --no-decode  # 只测原样保存路径
+  python -m claude_clipboard_monitor.benchmark pipeline          # 无头运行 捕获→保存→交付 全流程
+  python -m claude_clipboard_monitor.benchmark schedule --hours 24  # 虚拟时钟模拟 24 小时运行
+  python -m claude_clipboard_monitor.benchmark record day.trace  # 录制真实剪切板轨迹
+  python -m claude_clipboard_monitor.benchmark replay day.trace --speed 60 --monitor smart
+"""
+
+import io
+import sys
+import time
+import struct
+import zlib
+import tempfile
+import tracemalloc
+import contextlib
+from pathlib import Path
+
+import psutil
+
+
+def make_png_variants(base_png, count, start=0):
+    """生成 count 份内容不同的 PNG 字节
+
+    在 IEND 之前插入一个带序号的 tEXt 块，得到合法且哈希各不相同的 PNG，
+    不需要对 4K 图片重复编码。
+    """
+    iend = base_png.rindex(b"IEND") - 4
+    head, tail = base_png[:iend], base_png[iend:]
+    for index in range(start, start + count):
+        payload = b"Comment\x00capture-%d" % index
+        chunk = b"tEXt" + payload
+        yield (
+            head
+            + struct.pack(">I", len(payload))
+            + chunk
+            + struct.pack(">I", zlib.crc32(chunk) & 0xFFFFFFFF)
+            + tail
+        )
+
+
+def make_screenshot_png(width=3840, height=2160, noise=False, seed=0):
+    """生成一张模拟截图的 PNG 字节
+
+    默认为渐变背景，压缩后体积很小；noise=True 时为随机像素，几乎不可压缩，
+    PNG 大小接近原始像素数据，用于内存基准中模拟最坏情况。
+    """
+    import random
+    from PIL import Image
+    if noise:
+        pixels = random.Random(seed).randbytes(width * height * 3)
+        image = Image.frombytes("RGB", (width, height), pixels)
+        del pixels
+    else:
+        with Image.linear_gradient("L") as gradient:
+            image = gradient.resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    image.close()
+    return buffer.getvalue()
+
+
+def make_ide_frames(count, width=1920, height=1080, seed=1):
+    """生成模拟 IDE 截图序列的 PNG 字节：每一帧只改动一行代码并移动光标"""
+    import random
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    line_height = 18
+    lines = [(rng.randint(0, 6), rng.randint(8, 90)) for _ in range(height // line_height - 4)]
+    palette = [(86, 156, 214), (206, 145, 120), (106, 153, 85), (197, 134, 192), (212, 212, 212)]
+
+    image = Image.new("RGB", (width, height), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 260, height), fill=(37, 37, 38))
+    for row in range(0, height, line_height * 2):
+        draw.rectangle((16, row + 6, 16 + rng.randint(60, 200), row + 14), fill=(150, 150, 150))
+
+    def draw_line(row, indent, length, cursor=False):
+        top = 40 + row * line_height
+        draw.rectangle((280, top, width, top + line_height - 1), fill=(30, 30, 30))
+        draw.text((280, top + 2), f"{row + 1:4d}", fill=(110, 110, 110))
+        x = 330 + indent * 28
+        for word in range(length // 6):
+            color = palette[(row + word) % len(palette)]
+            draw.rectangle((x, top + 5, x + 34, top + 12), fill=color)
+            x += 42
+        if cursor:
+            draw.rectangle((x, top + 2, x + 2, top + 16), fill=(255, 255, 255))
+
+    for row, (indent, length) in enumerate(lines):
+        draw_line(row, indent, length)
+
+    previous = 0
+    for _ in range(count):
+        draw_line(previous, *lines[previous])
+        row = rng.randrange(len(lines))
+        lines[row] = (lines[row][0], rng.randint(8, 90))
+        draw_line(row, *lines[row], cursor=True)
+        previous = row
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        yield buffer.getvalue()
+    image.close()
+
+
+def benchmark_memory(captures=1000, width=3840, height=2160, decode=True,
+                     window=100, tolerance_mb=8, rss_tolerance_mb=32):
+    """内存基准：连续处理 captures 张模拟截图，检查稳态内存是否平稳
+
+    截图为不可压缩的随机像素，decode=True（默认）时每张都会完整解码并缩放，
+    内存中同时存在完整的 PNG 字节和解码后的像素。保存的文件处理后立即删除，
+    磁盘占用不随截图数量增长。
+
+    比较第一个窗口（预热后）与最后一个窗口内的 tracemalloc 峰值和 RSS，
+    增长超过容差即视为存在泄漏。返回是否通过。
+    """
+    from .smart_monitor import SmartClipboardMonitor
+    from .backends import fake_backends
+
+    process = psutil.Process()
+    base_png = make_screenshot_png(width, height, noise=True)
+    mode = "解码并缩放" if decode else "原样保存"
+    print(f"📐 模拟截图: {width}x{height} 随机像素, PNG {len(base_png) / 2**20:.1f} MB, "
+          f"共 {captures} 张（{mode}）")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            backends = fake_backends()
+            monitor = SmartClipboardMonitor(
+                tmp_dir=Path(tmp_dir),
+                max_size=1920 if decode else None,
+                backends=backends,
+            )
+
+        samples = []
+        # RSS 随分配器复用大块内存而周期性起伏，每张截图后都采样，按窗口取峰值
+        window_rss = 0
+        tracemalloc.start()
+        try:
+            for index, data in enumerate(make_png_variants(base_png, captures)):
+                backends.clipboard.set_content(data)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    monitor.process_clipboard()
+                del data
+                for saved in Path(tmp_dir).glob("clipboard_*"):
+                    saved.unlink()
+                window_rss = max(window_rss, process.memory_info().rss)
+
+                if (index + 1) % window == 0:
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.reset_peak()
+                    samples.append((index + 1, peak, window_rss))
+                    window_rss = 0
+        finally:
+            tracemalloc.stop()
+
+    print(f"{'截图数':>8} {'Python峰值(MB)':>16} {'RSS峰值(MB)':>12}")
+    for count, peak, rss in samples:
+        print(f"{count:>8} {peak / 2**20:>16.1f} {rss / 2**20:>12.1f}")
+
+    # 第一个窗口作为预热后的基线
+    _, base_peak, base_rss = samples[0]
+    _, last_peak, last_rss = samples[-1]
+    peak_growth = (last_peak - base_peak) / 2**20
+    rss_growth = (last_rss - base_rss) / 2**20
+    print(f"📈 Python 峰值增长: {peak_growth:+.1f} MB (容差 {tolerance_mb} MB)")
+    print(f"📈 RSS 增长: {rss_growth:+.1f} MB (容差 {rss_tolerance_mb} MB)")
+    print(f"🗂️ hash→路径映射条目: {len(monitor.image_files)}")
+
+    passed = peak_growth <= tolerance_mb and rss_growth <= rss_tolerance_mb
+    print("✅ 内存稳定" if passed else "❌ 内存持续增长")
+    return passed
+
+
+def benchmark_pipeline(captures=500, width=1920, height=1080, monitor="monitor", **options):
+    """无头全流程基准：内存后端 + 真实磁盘写入，不等待任何轮询间隔
+
+    每次迭代: 剪切板出现新截图 → process_clipboard() 保存 → 交付
+    （monitor: 路径引用写入剪切板；smart: 在 Claude Code 中粘贴并恢复图片；simple: 无交付）。
+    返回每秒处理的截图数。
+    """
+    from .trace import create_monitor, percentile
+    from .backends import fake_backends
+
+    base_png = make_screenshot_png(width, height)
+    print(f"📐 模拟截图: {width}x{height}, PNG {len(base_png) / 1024:.0f} KB, 共 {captures} 张 → {monitor}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        backends = fake_backends()
+        instance = create_monitor(monitor, tmp_dir, backends=backends, **options)
+        latencies = []
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for data in make_png_variants(base_png, captures):
+                begin = time.perf_counter()
+                backends.clipboard.set_content(data)
+                instance.process_clipboard()
+                if monitor == "monitor":
+                    instance.flush_pending()
+                elif monitor == "smart":
+                    instance.handle_paste_in_claude(instance.last_clipboard_hash)
+                    instance.restore_clipboard(instance.restore_on_next_paste)
+                    instance.restore_on_next_paste = None
+                latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+        delivered = sum(1 for kind, value in backends.clipboard.writes
+                        if kind == "text" and "@" in value)
+        if getattr(instance, "recompressor", None):
+            instance.recompressor.shutdown()
+
+    rate = captures / elapsed
+    print(f"⚡ 吞吐: {rate:.1f} 张/秒，共 {elapsed:.2f} s，交付路径引用 {delivered} 次")
+    print(f"⏱️ 单张耗时: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    return rate
+
+
+def benchmark_schedule(hours=24, monitor="monitor", capture_minutes=5, width=640, height=480):
+    """虚拟时钟长时间运行模拟：监听器的 run() 原样执行，sleep 只推进虚拟时间
+
+    每 capture_minutes 分钟剪切板出现一张新截图，每 6 小时中有 1 小时 Claude Code 未运行。
+    统计周期任务的执行次数、循环唤醒次数和截图交付情况。返回实际耗时（秒）。
+    """
+    from .trace import create_monitor
+    from .backends import fake_backends
+    from .scheduler import SimulatedClock, CLEANUP_INTERVAL
+
+    clock = SimulatedClock()
+    backends = fake_backends()
+    duration = hours * 3600
+    captures = int(duration // (capture_minutes * 60))
+    variants = make_png_variants(make_screenshot_png(width, height), captures)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        instance = create_monitor(monitor, tmp_dir, backends=backends, clock=clock)
+        # 模拟运行不订阅真实的电源状态，轮询间隔不受电池影响
+        instance.power.start = lambda: False
+        scheduler = instance.scheduler
+
+        def capture():
+            content = next(variants, None)
+            if content is not None:
+                backends.clipboard.set_content(content)
+
+        def toggle_claude():
+            backends.processes.claude_running = int(clock.now() // 3600) % 6 != 5
+
+        def stop():
+            instance.running = False
+
+        scheduler.every("capture", capture_minutes * 60, capture, delay=capture_minutes * 60)
+        scheduler.every("claude", 3600, toggle_claude)
+        scheduler.after("stop", duration, stop)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            instance.run()
+        elapsed = time.perf_counter() - start
+
+        tasks = scheduler.tasks
+        saved = sum(1 for path in Path(tmp_dir).rglob("*clipboard_*") if path.is_file())
+        delivered = sum(1 for kind, value in backends.clipboard.writes
+                        if kind == "text" and "@" in value)
+        delivered += sum(1 for event in backends.input.events if event[0] == "hotkey")
+
+    print(f"🕒 模拟 {hours:g} 小时（{monitor}），实际耗时 {elapsed:.2f} s，"
+          f"虚拟睡眠 {clock.slept / 3600:.1f} h")
+    print(f"📊 {scheduler.format_stats()}")
+    print(f"🧹 清理 {tasks['cleanup'].runs} 次（理论 {int(duration // CLEANUP_INTERVAL)} 次）")
+    print(f"⏰ 平均每小时唤醒 {scheduler.wakeups / hours:.0f} 次")
+    print(f"📸 截图 {captures} 张，剩余文件 {saved} 个，交付 {delivered} 次")
+    return elapsed
+
+
+def benchmark_deliver(count=20, backend=None, activate_timeout=None):
+    """端到端交付延迟基准：查找窗口 → 写入路径引用 → 激活窗口 → 注入粘贴
+
+    默认使用真实后端，会向 Claude Code 窗口实际粘贴 count 次；
+    backend="fake" 时只测量交付逻辑本身的开销。返回 p50 延迟（毫秒）。
+    """
+    from .backends import get_backends
+    from .drag_simulator import DragSimulator
+    from .trace import percentile
+
+    options = {"activate_timeout": activate_timeout} if activate_timeout else {}
+    simulator = DragSimulator(get_backends(backend), **options)
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "claude_clipboard_bench.png"
+        path.write_bytes(make_screenshot_png(64, 64))
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(count):
+                if not simulator.simulate_drag_to_claude(str(path)):
+                    failures += 1
+
+    latencies = list(simulator.latencies)
+    print(f"🎯 交付 {count} 次，失败 {failures} 次")
+    print(f"⏱️ {simulator.format_stats()}")
+    return percentile(latencies, 0.5)
+
+
+def benchmark_capture(count=20, region=None, display=None, backend=None):
+    """直接截图与剪切板往返的延迟对比（需要 X 显示，可在 Xvfb 中运行）
+
+    直接截图:   抓取 → 编码 → 写盘
+    剪切板往返: 抓取 → 编码（截图工具）→ 写入剪切板 → 读取剪切板 → 写盘（监听器）
+    两条路径使用相同的压缩级别，差值即剪切板往返的开销。剪切板往返需要 xclip 或 wl-clipboard，
+    不可用时只测量直接截图。返回 (直接截图 p50, 剪切板往返 p50)，单位毫秒。
+    """
+    from .capture import ScreenCapture, ScreenGrabber, parse_geometry
+    from .backends import get_backends
+    from .clipboard import encode_png
+    from .storage import save_png
+    from .trace import percentile
+
+    region = parse_geometry(region) if region else None
+    grabber = ScreenGrabber(display, backend)
+    clipboard = get_backends("system").clipboard
+    round_trip = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        capture = ScreenCapture(tmp_dir, deliver=False, grabber=grabber,
+                                backends=get_backends("fake"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(count):
+                capture.capture(region)
+        direct = [sum(stages) for stages in capture.latencies]
+        print(f"🖥️ 抓取方式: {grabber.describe()}")
+        print(f"📸 {capture.format_stats()}")
+
+        for index in range(count):
+            begin = time.perf_counter()
+            data = encode_png(grabber.grab(region), compress_level=capture.compress_level)
+            content = clipboard.read() if clipboard.write_png(data) else None
+            if not isinstance(content, bytes):
+                round_trip = None
+                break
+            save_png(content, Path(tmp_dir) / f"clipboard_round_trip_{index}.png")
+            round_trip.append((time.perf_counter() - begin) * 1000)
+    grabber.close()
+
+    if not round_trip:
+        print("⚠️ 无法读写剪切板（需要 xclip 或 wl-clipboard），跳过剪切板往返")
+        return percentile(direct, 0.5), None
+    print(f"📋 剪切板往返耗时: {count} 次，p50 {percentile(round_trip, 0.5):.1f} ms / "
+          f"p95 {percentile(round_trip, 0.95):.1f} ms")
+    print(f"⚡ 直接截图节省 p50 {percentile(round_trip, 0.5) - percentile(direct, 0.5):.1f} ms")
+    return percentile(direct, 0.5), percentile(round_trip, 0.5)
+
+
+def benchmark_relay(captures=100, width=1920, height=1080, codec=None, address=None):
+    """中继回环基准：本进程内启动服务端，通过 Unix socket（或指定的 TCP 地址）上传
+
+    第一轮上传 captures 张不同的截图，第二轮重复上传同一批以测量去重命中。
+    返回第一轮的上传吞吐（MB/s，按原始字节计）。
+    """
+    import threading
+    from .relay import RelayServer, RelayClient, default_codec
+    from .trace import percentile
+
+    base_png = make_screenshot_png(width, height)
+    variants = list(make_png_variants(base_png, captures))
+    total = sum(len(data) for data in variants)
+    codec = codec or default_codec()
+    print(f"📐 模拟截图: {width}x{height}, PNG {len(base_png) / 1024:.0f} KB, 共 {captures} 张，编码 {codec}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = RelayServer(Path(tmp_dir) / "screenshots")
+        address = address or str(Path(tmp_dir) / "relay.sock")
+        listener = server.bind(address)
+        thread = threading.Thread(target=listener.serve_forever, kwargs={"poll_interval": 0.1},
+                                  daemon=True)
+        thread.start()
+        client = RelayClient(address, codec=codec)
+        try:
+            rounds = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(2):
+                    latencies = []
+                    start = time.perf_counter()
+                    for data in variants:
+                        begin = time.perf_counter()
+                        client.send(data)
+                        latencies.append(time.perf_counter() - begin)
+                    rounds.append((time.perf_counter() - start, latencies))
+        finally:
+            client.close()
+            listener.shutdown()
+            server.close()
+
+    (upload_time, upload_latencies), (dedup_time, dedup_latencies) = rounds
+    throughput = total / upload_time / 2**20
+    stats = client.stats
+    print(f"📤 上传: {throughput:.1f} MB/s，{captures / upload_time:.1f} 张/秒，"
+          f"传输量为原始大小的 {stats['wire_bytes'] / stats['raw_bytes']:.0%}")
+    print(f"⏱️ 单张上传: p50 {percentile(upload_latencies, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(upload_latencies, 0.99) * 1000:.2f} ms")
+    print(f"♻️ 重复上传: 去重 {stats['deduplicated']}/{captures} 张，"
+          f"p50 {percentile(dedup_latencies, 0.5) * 1000:.2f} ms，共 {dedup_time:.2f} s")
+    return throughput
+
+
+def benchmark_tiles(captures=50, width=1920, height=1080):
+    """分块去重存储基准：模拟 IDE 截图序列的存储缩减和按需重建延迟
+
+    返回存储占用与原始 PNG 总大小之比。
+    """
+    from PIL import Image
+    from .cache import LRUCache
+    from .tiles import TileStore
+    from .trace import percentile
+
+    frames = list(make_ide_frames(captures, width, height))
+    total = sum(len(data) for data in frames)
+    print(f"📐 模拟 IDE 截图: {width}x{height}, 共 {captures} 张，PNG 合计 {total / 2**20:.1f} MB")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for index, data in enumerate(frames):
+            path = Path(tmp_dir) / f"clipboard_{index:04d}.png"
+            path.write_bytes(data)
+            paths.append(path)
+
+        store = TileStore(Path(tmp_dir) / "archive")
+        start = time.perf_counter()
+        store.archive_files(paths)
+        ingest = time.perf_counter() - start
+        usage = store.disk_usage()
+
+        latencies = []
+        digests = list(store.entries)
+        for digest in digests:
+            # 每次都从冷缓存开始，测量最坏情况
+            store.tile_cache = LRUCache(max_bytes=store.tile_cache.max_bytes)
+            begin = time.perf_counter()
+            with store.materialize(digest):
+                pass
+            latencies.append(time.perf_counter() - begin)
+
+        # 抽查：重建结果与原图逐像素一致
+        with Image.open(io.BytesIO(frames[-1])) as original, \
+                Image.open(io.BytesIO(store.read(digests[-1]))) as rebuilt:
+            identical = original.tobytes() == rebuilt.tobytes()
+        unique = len(store.chunks)
+        store.close()
+
+    tiles_per_image = -(-width // 64) * -(-height // 64)
+    ratio = usage / total
+    print(f"📦 存储: {usage / 2**20:.2f} MB（原始的 {ratio:.1%}），"
+          f"唯一图片块 {unique} / {tiles_per_image * captures}，归档耗时 {ingest * 1000 / captures:.1f} ms/张")
+    print(f"⏱️ 重建为 PNG（冷缓存）: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms")
+    print("✅ 重建结果与原图一致" if identical else "❌ 重建结果与原图不一致")
+    return ratio
+
+
+def main():
+    """命令行入口点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude Code 剪切板监听器性能基准")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    memory = subparsers.add_parser("memory", help="内存占用基准")
+    memory.add_argument("--captures", type=int, default=1000, help="模拟截图数量（默认1000）")
+    memory.add_argument("--width", type=int, default=3840, help="截图宽度（默认3840）")
+    memory.add_argument("--height", type=int, default=2160, help="截图高度（默认2160）")
+    memory.add_argument("--no-decode", action="store_true",
+                        help="不启用缩放阶段（截图原样保存，不解码）")
+
+    pipeline = subparsers.add_parser("pipeline", help="无头全流程吞吐基准（内存后端）")
+    pipeline.add_argument("--captures", type=int, default=500, help="模拟截图数量（默认500）")
+    pipeline.add_argument("--width", type=int, default=1920, help="截图宽度（默认1920）")
+    pipeline.add_argument("--height", type=int, default=1080, help="截图高度（默认1080）")
+    pipeline.add_argument("--monitor", choices=["monitor", "smart", "simple"],
+                          default="monitor", help="被测监听器（默认 monitor）")
+    pipeline.add_argument("--max-size", type=int, help="图片最长边上限（像素）")
+
+    schedule = subparsers.add_parser("schedule", help="虚拟时钟模拟长时间运行，统计周期任务与唤醒次数")
+    schedule.add_argument("--hours", type=float, default=24, help="模拟时长（小时，默认24）")
+    schedule.add_argument("--monitor", choices=["monitor", "smart", "simple", "drag"],
+                          default="monitor", help="被测监听器（默认 monitor）")
+    schedule.add_argument("--capture-minutes", type=float, default=5,
+                          help="每隔多少分钟出现一张新截图（默认5）")
+
+    deliver = subparsers.add_parser("deliver", help="拖拽模式端到端交付延迟（会实际向 Claude Code 粘贴）")
+    deliver.add_argument("--count", type=int, default=20, help="交付次数（默认20）")
+    deliver.add_argument("--backend", choices=["system", "fake"], help="平台后端（默认 system）")
+    deliver.add_argument("--activate-timeout", type=float, help="等待窗口激活的超时（秒，默认1）")
+
+    capture = subparsers.add_parser("capture", help="直接截图与剪切板往返的延迟对比（需要 X 显示）")
+    capture.add_argument("--count", type=int, default=20, help="截图次数（默认20）")
+    capture.add_argument("--region", metavar="WxH+X+Y", help="抓取区域（默认整个屏幕）")
+    capture.add_argument("--display", help="X 显示（默认 $DISPLAY）")
+    capture.add_argument("--backend", choices=["mss", "pil"], help="抓取方式（默认 mss，未安装时 ImageGrab）")
+
+    relay = subparsers.add_parser("relay", help="中继回环上传吞吐与去重基准")
+    relay.add_argument("--captures", type=int, default=100, help="模拟截图数量（默认100）")
+    relay.add_argument("--width", type=int, default=1920, help="截图宽度（默认1920）")
+    relay.add_argument("--height", type=int, default=1080, help="截图高度（默认1080）")
+    relay.add_argument("--codec", choices=["none", "zlib", "zstd"], help="传输编码（默认 zstd，未安装时 zlib）")
+    relay.add_argument("--address", help="监听地址（默认临时 Unix socket；可指定 [host:]port 测试 TCP）")
+
+    tiles = subparsers.add_parser("tiles", help="分块去重存储的空间缩减与重建延迟")
+    tiles.add_argument("--captures", type=int, default=50, help="模拟截图数量（默认50）")
+    tiles.add_argument("--width", type=int, default=1920, help="截图宽度（默认1920）")
+    tiles.add_argument("--height", type=int, default=1080, help="截图高度（默认1080）")
+
+    record = subparsers.add_parser("record", help="录制剪切板事件轨迹")
+    record.add_argument("trace", help="轨迹文件路径")
+    record.add_argument("--duration", type=float, help="录制时长（秒，默认直到 Ctrl+C）")
+    record.add_argument("--interval", type=float, default=0.1, help="采样间隔（秒，默认0.1）")
+    record.add_argument("--include-images", action="store_true", help="同时保存图片原始数据")
+
+    replay = subparsers.add_parser("replay", help="回放轨迹并统计吞吐、丢失率和延迟")
+    replay.add_argument("trace", help="轨迹文件路径")
+    replay.add_argument("--monitor", choices=["monitor", "smart", "simple", "drag"],
+                        default="monitor", help="被测监听器（默认 monitor）")
+    replay.add_argument("--speed", type=float, default=1.0,
+                        help="时间加速倍数（默认1即实时，0表示不等待）")
+    replay.add_argument("--poll-interval", type=float, default=0.5,
+                        help="监听器轮询间隔（秒，默认0.5）")
+    replay.add_argument("--max-size", type=int, help="图片最长边上限（像素）")
+    replay.add_argument("--lazy", action="store_true", help="懒保存模式（smart）")
+    replay.add_argument("--recompress", action="store_true", help="启用后台重新压缩")
+
+    args = parser.parse_args()
+
+    if args.command == "memory":
+        passed = benchmark_memory(
+            captures=args.captures,
+            width=args.width,
+            height=args.height,
+            decode=not args.no_decode,
+        )
+        return 0 if passed else 1
+    if args.command == "pipeline":
+        benchmark_pipeline(
+            captures=args.captures,
+            width=args.width,
+            height=args.height,
+            monitor=args.monitor,
+            max_size=args.max_size,
+        )
+    elif args.command == "schedule":
+        benchmark_schedule(
+            hours=args.hours,
+            monitor=args.monitor,
+            capture_minutes=args.capture_minutes,
+        )
+    elif args.command == "deliver":
+        benchmark_deliver(
+            count=args.count,
+            backend=args.backend,
+            activate_timeout=args.activate_timeout,
+        )
+    elif args.command == "capture":
+        try:
+            benchmark_capture(
+                count=args.count,
+                region=args.region,
+                display=args.display,
+                backend=args.backend,
+            )
+        except Exception as e:
+            print(f"❌ 截图失败: {e}")
+            return 1
+    elif args.command == "relay":
+        try:
+            benchmark_relay(
+                captures=args.captures,
+                width=args.width,
+                height=args.height,
+                codec=args.codec,
+                address=args.address,
+            )
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+    elif args.command == "tiles":
+        benchmark_tiles(captures=args.captures, width=args.width, height=args.height)
+    elif args.command == "record":
+        from .trace import record_trace
+        record_trace(args.trace, duration=args.duration, interval=args.interval,
+                     include_images=args.include_images)
+    elif args.command == "replay":
+        from .trace import replay_trace
+        result = replay_trace(
+            args.trace,
+            monitor=args.monitor,
+            speed=args.speed,
+            poll_interval=args.poll_interval,
+            max_size=args.max_size,
+            lazy=args.lazy or None,
+            recompress=args.recompress or None,
+        )
+        return 0 if result else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+有界 LRU 缓存
+用于 hash→文件路径 等长期存活的映射，保证进程内存不会随运行时间无限增长
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """按条目数和/或字节数限制大小的 LRU 缓存
+
+    超出任一上限时从最久未使用的条目开始淘汰；
+    sizeof 用于计算单个值的字节数（默认 len），仅在设置 max_bytes 时使用。
+    """
+
+    def __init__(self, max_items=None, max_bytes=None, sizeof=len):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._data = OrderedDict()
+
+    def _size(self, value):
+        return self.sizeof(value) if self.max_bytes is not None else 0
+
+    def get(self, key, default=None):
+        """读取条目并标记为最近使用"""
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        """写入条目，必要时淘汰旧条目；返回被淘汰的 (key, value) 列表"""
+        if key in self._data:
+            self.total_bytes -= self._size(self._data.pop(key))
+        self._data[key] = value
+        self.total_bytes += self._size(value)
+
+        evicted = []
+        while len(self._data) > 1 and (
+            (self.max_items is not None and len(self._data) > self.max_items)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            old_key, old_value = self._data.popitem(last=False)
+            self.total_bytes -= self._size(old_value)
+            evicted.append((old_key, old_value))
+        return evicted
+
+    def pop(self, key, default=None):
+        """移除条目"""
+        if key not in self._data:
+            return default
+        value = self._data.pop(key)
+        self.total_bytes -= self._size(value)
+        return value
+
+    def items(self):
+        return list(self._data.items())
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        if key not in self._data:
+            raise KeyError(key)
+        self.pop(key)
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,306 @@
+"""
+屏幕区域直接截图
+不经过 截图工具 → 剪切板 → ImageGrab.grabclipboard() → 重新编码 的往返，也不占用剪切板：
+直接从 X 服务器抓取区域或窗口，编码后走与剪切板截图相同的保存和交付流程。
+
+- 安装 mss 10+ 时在 X11 上使用 MIT-SHM（XShmGetImage）：像素写入共享内存段，
+  不经过 X 协议套接字复制；扩展不可用时 mss 自动回退到 XGetImage。Windows / macOS 使用原生接口
+- 否则回退到 Pillow 的 ImageGrab.grab()
+
+可以绑定到桌面快捷键单次运行，也可以用 --hotkey 常驻：连接和共享内存段保持打开，抓取更快。
+"""
+
+import sys
+import time
+import shutil
+import platform
+import subprocess
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from .backends import get_backends
+from .clipboard import encode_png
+from .coalescer import format_path_references
+from .recompress import FAST_COMPRESS_LEVEL
+from .storage import atomic_write_bytes
+
+
+def parse_geometry(text):
+    """解析 X 风格的区域 "宽x高+X+Y"，返回 (left, top, width, height)"""
+    try:
+        size, _, offset = text.partition("+")
+        width, height = (int(value) for value in size.lower().split("x"))
+        left, top = (int(value) for value in offset.split("+")) if offset else (0, 0)
+    except ValueError:
+        raise ValueError(f"无法解析区域: {text}（格式为 宽x高+X+Y）")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"区域大小必须为正数: {text}")
+    return left, top, width, height
+
+
+def select_region():
+    """用 slop 交互式框选区域；取消时返回 None"""
+    if not shutil.which("slop"):
+        raise RuntimeError("交互式框选需要 slop（例如 apt install slop）")
+    result = subprocess.run(["slop", "-f", "%wx%h+%x+%y"], capture_output=True, text=True)
+    if result.returncode != 0 or not result.stdout.strip():
+        return None
+    return parse_geometry(result.stdout.strip())
+
+
+def active_window_region(display_name=None):
+    """当前活动窗口在屏幕上的区域（X11，需要 python-xlib）"""
+    try:
+        from Xlib import X, display as xdisplay
+    except ImportError:
+        raise RuntimeError("抓取活动窗口需要: pip install python-xlib")
+
+    display = xdisplay.Display(display_name)
+    try:
+        root = display.screen().root
+        prop = root.get_full_property(display.intern_atom("_NET_ACTIVE_WINDOW"),
+                                      X.AnyPropertyType)
+        if not prop or not len(prop.value) or not prop.value[0]:
+            raise RuntimeError("无法获取活动窗口（窗口管理器不支持 _NET_ACTIVE_WINDOW）")
+        window = display.create_resource_object("window", prop.value[0])
+        geometry = window.get_geometry()
+        origin = window.translate_coords(root, 0, 0)
+        # translate_coords 返回根窗口原点在窗口坐标系中的位置，取反即窗口在屏幕上的位置
+        return -origin.x, -origin.y, geometry.width, geometry.height
+    finally:
+        display.close()
+
+
+class ScreenGrabber:
+    """屏幕抓取器：优先 mss，不可用时回退到 ImageGrab（首次抓取时才选择和连接）"""
+
+    def __init__(self, display_name=None, backend=None):
+        self.display_name = display_name
+        self.backend = backend
+        self._sct = None
+
+    def _open(self):
+        if self.backend in (None, "mss"):
+            try:
+                import mss
+                kwargs = {"display": self.display_name} \
+                    if self.display_name and platform.system() == "Linux" else {}
+                # mss 10.2 起推荐直接使用 mss.MSS
+                factory = getattr(mss, "MSS", None) or mss.mss
+                self._sct = factory(**kwargs)
+                self.backend = "mss"
+                return
+            except ImportError:
+                if self.backend == "mss":
+                    raise RuntimeError("mss 抓取需要: pip install mss")
+        self.backend = "pil"
+
+    def grab(self, region=None):
+        """抓取区域 (left, top, width, height)，None 为整个屏幕；返回 RGB 图片"""
+        if self.backend is None or (self.backend == "mss" and self._sct is None):
+            self._open()
+
+        if self.backend == "mss":
+            from PIL import Image
+            if region is None:
+                monitor = self._sct.monitors[0]
+            else:
+                left, top, width, height = region
+                monitor = {"left": left, "top": top, "width": width, "height": height}
+            shot = self._sct.grab(monitor)
+            # 直接引用 BGRX 原始像素，不经过 shot.bgra / shot.rgb 的额外复制
+            return Image.frombuffer("RGB", shot.size, shot.raw, "raw", "BGRX", 0, 1)
+
+        from PIL import ImageGrab
+        kwargs = {}
+        if region is not None:
+            left, top, width, height = region
+            kwargs["bbox"] = (left, top, left + width, top + height)
+        if self.display_name and platform.system() == "Linux":
+            kwargs["xdisplay"] = self.display_name
+        return ImageGrab.grab(**kwargs).convert("RGB")
+
+    def describe(self):
+        if self.backend == "mss":
+            # 第一次抓取后才知道 MIT-SHM 是否可用
+            notes = getattr(self._sct, "performance_status", None) or []
+            return "mss" + (f"（{'; '.join(notes)}）" if notes else "")
+        return "ImageGrab" if self.backend == "pil" else "未初始化"
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+
+class ScreenCapture:
+    """直接截图 → 保存 → 交付
+
+    交付方式与监听器一致：默认把 @path 引用写入剪切板；terminal 为 True 时直接输入到
+    Claude Code 的终端，失败时回退到剪切板；deliver 为 False 时只保存。
+    """
+
+    def __init__(self, tmp_dir=None, fsync=False, compress_level=FAST_COMPRESS_LEVEL,
+                 deliver=True, terminal=False, display_name=None, grabber=None, backends=None):
+        # 默认使用 ~/.neurora/claude-code/screenshots 目录（与监听器相同，由监听器统一清理）
+        if tmp_dir is None:
+            tmp_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
+
+        self.tmp_dir = Path(tmp_dir)
+        self.fsync = fsync
+        self.compress_level = compress_level
+        self.deliver = deliver
+        self.grabber = grabber or ScreenGrabber(display_name)
+        self.backends = backends or get_backends()
+
+        self.terminal_sink = None
+        if terminal:
+            from .terminal import TerminalSink
+            self.terminal_sink = TerminalSink(self.backends)
+
+        # 最近的分阶段耗时（毫秒）：(抓取, 编码, 写盘, 交付)
+        self.latencies = deque(maxlen=1000)
+
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def save(self, data):
+        """保存 PNG 字节，文件名与剪切板截图相同，可被监听器的清理和归档识别"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filepath = self.tmp_dir / f"clipboard_{timestamp}.png"
+        atomic_write_bytes(filepath, data, fsync=self.fsync)
+        return filepath
+
+    def deliver_paths(self, paths):
+        """交付路径引用，返回是否成功"""
+        if self.terminal_sink and self.terminal_sink.deliver(paths):
+            return True
+        self.backends.clipboard.write_text(format_path_references(paths))
+        print(f"📎 已放入路径引用: {' '.join(str(path) for path in paths)}")
+        return True
+
+    def capture(self, region=None):
+        """抓取一次并交付，返回保存的文件路径"""
+        start = time.perf_counter()
+        image = self.grabber.grab(region)
+        grabbed = time.perf_counter()
+        data = encode_png(image, compress_level=self.compress_level)
+        encoded = time.perf_counter()
+        filepath = self.save(data)
+        saved = time.perf_counter()
+        if self.deliver:
+            self.deliver_paths([filepath])
+        done = time.perf_counter()
+
+        self.latencies.append(tuple((end - begin) * 1000 for begin, end in
+                                    ((start, grabbed), (grabbed, encoded),
+                                     (encoded, saved), (saved, done))))
+        print(f"📸 已截图: {filepath}（{len(data) / 1024:.0f} KB，{(done - start) * 1000:.1f} ms）")
+        return filepath
+
+    def format_stats(self):
+        """分阶段耗时统计"""
+        from .trace import percentile
+        values = list(self.latencies)
+        if not values:
+            return "直接截图耗时: 暂无数据"
+        stages = []
+        for index, name in enumerate(("抓取", "编码", "写盘", "交付")):
+            stages.append(f"{name} {percentile([value[index] for value in values], 0.5):.1f}")
+        total = [sum(value) for value in values]
+        return (f"直接截图耗时: {len(values)} 次，p50 {percentile(total, 0.5):.1f} ms / "
+                f"p95 {percentile(total, 0.95):.1f} ms（p50 分阶段 ms: {'，'.join(stages)}）")
+
+    def close(self):
+        self.grabber.close()
+
+
+def resolve_region(args, display_name=None):
+    """按命令行参数确定抓取区域；框选被取消时返回 False"""
+    if args.select:
+        region = select_region()
+        return region if region is not None else False
+    if args.active_window:
+        return active_window_region(display_name)
+    if args.region:
+        return parse_geometry(args.region)
+    return None
+
+
+def run_hotkey(capture, hotkey, args):
+    """常驻等待快捷键，每次按下都按参数重新确定区域并截图"""
+    import queue
+    try:
+        import keyboard
+    except ImportError:
+        print("❌ 快捷键模式需要: pip install keyboard（Linux 上需要 root 或 input 组权限）")
+        return 1
+
+    requests = queue.Queue()
+    handle = keyboard.add_hotkey(hotkey, lambda: requests.put(True), trigger_on_release=True)
+    print(f"⌨️ 按 {hotkey} 截图，Ctrl+C 停止")
+    try:
+        while True:
+            requests.get()
+            try:
+                region = resolve_region(args, capture.grabber.display_name)
+                if region is not False:
+                    capture.capture(region)
+            except Exception as e:
+                print(f"❌ 截图失败: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        keyboard.remove_hotkey(handle)
+    print(f"📊 {capture.format_stats()}")
+    return 0
+
+
+def main():
+    """命令行入口点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude Code 直接截图（不经过剪切板）")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--region", metavar="WxH+X+Y", help="抓取的屏幕区域（默认整个屏幕）")
+    target.add_argument("--select", action="store_true", help="用 slop 交互式框选区域")
+    target.add_argument("--active-window", action="store_true", help="抓取当前活动窗口（X11）")
+    parser.add_argument("--tmp-dir", type=str, help="自定义存储目录路径")
+    parser.add_argument("--display", help="X 显示（默认 $DISPLAY）")
+    parser.add_argument("--terminal", action="store_true",
+                        help="直接把路径引用输入到 Claude Code 的终端，失败时回退到剪切板")
+    parser.add_argument("--no-deliver", action="store_true", help="只保存并输出文件路径，不交付")
+    parser.add_argument("--compress-level", type=int, default=FAST_COMPRESS_LEVEL,
+                        help=f"PNG 压缩级别（0-9，默认{FAST_COMPRESS_LEVEL}，越小越快）")
+    parser.add_argument("--fsync", action="store_true",
+                        help="保存图片后执行 fsync（更安全但更慢，默认关闭）")
+    parser.add_argument("--hotkey", help="常驻并在按下快捷键时截图，例如 ctrl+shift+s（需要 keyboard）")
+    args = parser.parse_args()
+
+    capture = ScreenCapture(
+        tmp_dir=args.tmp_dir,
+        fsync=args.fsync,
+        compress_level=args.compress_level,
+        deliver=not args.no_deliver,
+        terminal=args.terminal,
+        display_name=args.display,
+    )
+    try:
+        if args.hotkey:
+            return run_hotkey(capture, args.hotkey, args)
+        region = resolve_region(args, args.display)
+        if region is False:
+            print("🚫 已取消框选")
+            return 1
+        capture.capture(region)
+    except Exception as e:
+        # 没有显示器、区域超出屏幕等抓取错误（mss 抛出自己的异常类型）
+        print(f"❌ 截图失败: {e}")
+        return 1
+    finally:
+        capture.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,7 @@ import sys
 import argparse
 from .monitor import ClipboardMonitor
 from .installer import install_claude_code_config
+from .profiler import profiling
 
 
 def main():
@@ -47,6 +48,76 @@ def main():
         help="自定义临时目录路径（默认: ~/.neurora/claude-code/screenshots）"
     )
     
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="保存图片后执行 fsync（更安全但更慢，默认关闭）"
+    )
+    
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        help="图片最长边上限（像素）；默认不缩放，剪切板 PNG 原样保存"
+    )
+    
+    parser.add_argument(
+        "--coalesce-ms",
+        type=int,
+        default=0,
+        help="连拍合并窗口（毫秒，默认0即不合并）：窗口内的多张图片一次性替换为路径引用"
+    )
+    
+    parser.add_argument(
+        "--recompress",
+        action="store_true",
+        help="先快速保存图片，再在低优先级后台进程中重新压缩以节省磁盘空间"
+    )
+    
+    parser.add_argument(
+        "--archive-hours",
+        type=float,
+        help="超过该时间（小时）的截图移入 pack 归档而不是删除；可用 claude-clipboard-archive 恢复"
+    )
+    parser.add_argument(
+        "--archive-engine",
+        choices=["tar", "tiles"],
+        default="tar",
+        help="归档引擎：tar 为 pack 文件（默认），tiles 为分块去重存储（需要 numpy，适合大量相似截图）"
+    )
+    
+    parser.add_argument(
+        "--cpu-budget",
+        type=float,
+        help="CPU 预算（单核百分比，含后台进程）；超出时暂停后台压缩并改用最快编码"
+    )
+    
+    parser.add_argument(
+        "--rss-budget-mb",
+        type=int,
+        help="常驻内存预算（MB，含后台进程）；超出时同样切换到省资源模式"
+    )
+    parser.add_argument(
+        "--text-threshold-kb",
+        type=int,
+        help="剪切板文本超过该大小（KB）时保存为文件，交付 @路径 引用而不是原文"
+    )
+    parser.add_argument(
+        "--ring-mb",
+        type=int,
+        help="在共享内存中保留最近截图（MB 上限），可用 claude-clipboard-ring 直接重新交付"
+    )
+    parser.add_argument(
+        "--terminal",
+        action="store_true",
+        help="直接把路径引用输入到 Claude Code 的终端（tmux send-keys 或 TIOCSTI），失败时回退到剪切板"
+    )
+    
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="启用采样分析器，退出时写入 FILE（.prof 为 cProfile 格式，其他为折叠栈）"
+    )
+    
     args = parser.parse_args()
     
     # 检查依赖
@@ -61,7 +132,7 @@ def main():
     
     # 自动配置 Claude Code
     print("🔧 正在配置 Claude Code...")
-    if not install_claude_code_config():
+    if not install_claude_code_config(force=args.configure):
         print("❌ Claude Code 配置失败")
         return 1
     
@@ -74,9 +145,21 @@ def main():
     try:
         monitor = ClipboardMonitor(
             tmp_dir=args.tmp_dir,
-            cleanup_hours=args.cleanup_hours
+            cleanup_hours=args.cleanup_hours,
+            fsync=args.fsync,
+            max_size=args.max_size,
+            coalesce_ms=args.coalesce_ms,
+            recompress=args.recompress,
+            archive_hours=args.archive_hours,
+            archive_engine=args.archive_engine,
+            cpu_budget=args.cpu_budget,
+            rss_budget_mb=args.rss_budget_mb,
+            text_threshold_kb=args.text_threshold_kb,
+            terminal=args.terminal,
+            ring_mb=args.ring_mb
         )
-        monitor.run()
+        with profiling(args.profile):
+            monitor.run()
     except KeyboardInterrupt:
         print("\n🛑 监听器已停止")
         return 0
@@ -0,0 +1,477 @@
+"""
+剪切板读写工具
+统一处理图片与"复制的文件"两种剪切板内容。
+图片优先直接读取剪切板中已编码的 PNG 字节，避免 解码→重新编码 的开销；
+写回时同样直接使用已编码的字节。
+"""
+
+import os
+import select
+import hashlib
+import platform
+import shutil
+import threading
+import subprocess
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from PIL import Image, ImageGrab
+
+
+# X11 上表示文本的选择目标
+TEXT_TARGETS = ("UTF8_STRING", "text/plain;charset=utf-8", "text/plain", "STRING", "TEXT")
+
+
+def _run_clipboard_tool(args):
+    """运行剪切板命令行工具，失败时返回 None"""
+    try:
+        result = subprocess.run(args, capture_output=True, timeout=2)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _linux_clipboard_command(target=None):
+    """根据会话类型选择 wl-paste 或 xclip 命令"""
+    session_type = os.environ.get("XDG_SESSION_TYPE")
+    if shutil.which("wl-paste") and session_type in ("wayland", None):
+        if target is None:
+            return ["wl-paste", "--list-types"]
+        return ["wl-paste", "--no-newline", "-t", target]
+    if shutil.which("xclip") and session_type in ("x11", None):
+        return ["xclip", "-selection", "clipboard", "-t", target or "TARGETS", "-o"]
+    return None
+
+
+def get_clipboard_targets():
+    """获取剪切板当前提供的 MIME 类型（仅 Linux）"""
+    command = _linux_clipboard_command()
+    if command is None:
+        return []
+    output = _run_clipboard_tool(command)
+    if not output:
+        return []
+    return output.decode("utf-8", "replace").split()
+
+
+def parse_uri_list(data):
+    """解析 text/uri-list 内容为本地文件路径列表"""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", "replace")
+    files = []
+    for line in data.splitlines():
+        line = line.strip()
+        # uri-list 允许以 # 开头的注释行
+        if not line or line.startswith("#"):
+            continue
+        uri = urlparse(line)
+        if uri.scheme == "file":
+            files.append(unquote(uri.path))
+        elif not uri.scheme and line.startswith("/"):
+            files.append(line)
+    return files
+
+
+def _get_windows_png_bytes():
+    """Windows: 读取已注册的 "PNG" 剪切板格式"""
+    try:
+        import win32clipboard
+    except ImportError:
+        return None
+    png_format = win32clipboard.RegisterClipboardFormat("PNG")
+    win32clipboard.OpenClipboard()
+    try:
+        if win32clipboard.IsClipboardFormatAvailable(png_format):
+            return win32clipboard.GetClipboardData(png_format)
+    finally:
+        win32clipboard.CloseClipboard()
+    return None
+
+
+def _get_macos_png_bytes():
+    """macOS: 从 NSPasteboard 读取 public.png 数据"""
+    try:
+        from AppKit import NSPasteboard
+    except ImportError:
+        return None
+    data = NSPasteboard.generalPasteboard().dataForType_("public.png")
+    return bytes(data) if data is not None else None
+
+
+def get_clipboard_png_bytes(targets=None):
+    """读取剪切板中原始的 PNG 编码字节，不可用时返回 None"""
+    system = platform.system()
+    try:
+        if system == "Linux":
+            if targets is None:
+                targets = get_clipboard_targets()
+            if "image/png" not in targets:
+                return None
+            return _run_clipboard_tool(_linux_clipboard_command("image/png"))
+        elif system == "Windows":
+            return _get_windows_png_bytes()
+        elif system == "Darwin":
+            return _get_macos_png_bytes()
+    except Exception:
+        pass
+    return None
+
+
+def encode_png(image, **params):
+    """将 PIL 图片编码为 PNG 字节并立即释放图片（params 为编码参数，例如 compress_level）"""
+    buffer = BytesIO()
+    try:
+        image.save(buffer, format="PNG", **params)
+    finally:
+        image.close()
+    return buffer.getvalue()
+
+
+def fingerprint_image(image):
+    """基于原始像素计算图片指纹，不做 PNG 编码"""
+    digest = hashlib.md5(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def image_md5(image, buffer):
+    """计算 PIL 图片 PNG 编码的 MD5，复用调用方提供的 BytesIO 缓冲区"""
+    buffer.seek(0)
+    buffer.truncate()
+    image.save(buffer, format="PNG")
+    return hashlib.md5(buffer.getbuffer()).hexdigest()
+
+
+def get_clipboard_files(targets=None):
+    """获取剪切板中复制的文件列表（Linux 下读取 text/uri-list）"""
+    if platform.system() != "Linux":
+        return []
+    if targets is None:
+        targets = get_clipboard_targets()
+    if "text/uri-list" not in targets:
+        return []
+    data = _run_clipboard_tool(_linux_clipboard_command("text/uri-list"))
+    return parse_uri_list(data) if data else []
+
+
+def grab_clipboard(encode=True):
+    """读取剪切板内容
+
+    返回 PNG 编码字节、复制的文件路径列表，或 None。
+    剪切板本身提供 image/png 时原样返回字节，不做任何解码；
+    只有在拿不到原始字节时才通过 ImageGrab 解码后重新编码一次
+    （encode=False 时直接返回解码后的 PIL 图片，由调用方决定何时编码）。
+    Windows/macOS 上 ImageGrab 本身就会对复制的文件返回文件名列表；
+    Linux 上文件列表需要单独读取 text/uri-list。
+    """
+    targets = get_clipboard_targets() if platform.system() == "Linux" else None
+
+    data = get_clipboard_png_bytes(targets)
+    if data:
+        return data
+
+    files = get_clipboard_files(targets)
+    if files:
+        return files
+
+    # Linux 上已知剪切板没有任何图片格式时，不必再调用 ImageGrab
+    if targets and not any(t.startswith("image/") for t in targets):
+        return None
+
+    try:
+        content = ImageGrab.grabclipboard()
+    except Exception:
+        return None
+
+    if isinstance(content, Image.Image) and encode:
+        return encode_png(content)
+    return content or None
+
+
+class SelectionChangeCounter:
+    """通过 XFixes 事件统计 CLIPBOARD 所有者的变化次数（X11，需要 python-xlib）
+
+    每次复制都会重新设置所有者，计数不变即剪切板内容未变；读取计数只处理已到达的事件，
+    不发起选择请求，也不启动子进程。
+    """
+
+    def __init__(self, display_name=None):
+        from Xlib import display as xdisplay
+        from Xlib.ext import xfixes
+
+        self.display = xdisplay.Display(display_name)
+        if not self.display.has_extension("XFIXES"):
+            self.display.close()
+            raise RuntimeError("X 服务器不支持 XFIXES 扩展")
+        self.display.xfixes_query_version()
+        self.display.xfixes_select_selection_input(
+            self.display.screen().root, self.display.intern_atom("CLIPBOARD"),
+            xfixes.XFixesSetSelectionOwnerNotifyMask,
+        )
+        self.display.flush()
+        self.count = 0
+
+    def poll(self):
+        while self.display.pending_events():
+            self.display.next_event()
+            self.count += 1
+        return self.count
+
+    def close(self):
+        self.display.close()
+
+
+def clipboard_change_count(counter=None):
+    """剪切板变化计数，内容变化时计数随之改变；平台不支持时返回 None
+
+    Windows 使用剪切板序列号，macOS 使用 NSPasteboard.changeCount，
+    X11 使用 SelectionChangeCounter（由调用方创建并传入）。
+    """
+    system = platform.system()
+    try:
+        if system == "Windows":
+            import win32clipboard
+            return win32clipboard.GetClipboardSequenceNumber()
+        elif system == "Darwin":
+            from AppKit import NSPasteboard
+            return NSPasteboard.generalPasteboard().changeCount()
+        elif counter is not None:
+            return counter.poll()
+    except Exception:
+        pass
+    return None
+
+
+def _linux_copy_command(target, once=False):
+    """根据会话类型选择 wl-copy 或 xclip 写入命令
+
+    target 为 None 时写入 UTF-8 文本；
+    once=True 时进程在前台运行，服务完一次粘贴请求后退出。
+    """
+    session_type = os.environ.get("XDG_SESSION_TYPE")
+    if shutil.which("wl-copy") and session_type in ("wayland", None):
+        command = ["wl-copy", "--type", target or "text/plain;charset=utf-8"]
+        if once:
+            command += ["--paste-once", "--foreground"]
+        return command
+    if shutil.which("xclip") and session_type in ("x11", None):
+        command = ["xclip", "-selection", "clipboard", "-t", target or "UTF8_STRING", "-i"]
+        if once:
+            command += ["-loops", "1", "-quiet"]
+        return command
+    return None
+
+
+def _spawn_clipboard_writer(command, data):
+    """启动剪切板写入进程并通过 stdin 传入数据"""
+    process = subprocess.Popen(
+        command, stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    process.stdin.write(data)
+    process.stdin.close()
+    return process
+
+
+def _set_windows_png(data):
+    import win32clipboard
+    png_format = win32clipboard.RegisterClipboardFormat("PNG")
+    win32clipboard.OpenClipboard()
+    try:
+        win32clipboard.EmptyClipboard()
+        win32clipboard.SetClipboardData(png_format, data)
+    finally:
+        win32clipboard.CloseClipboard()
+
+
+def _set_macos_png(data):
+    from AppKit import NSPasteboard
+    from Foundation import NSData
+    pasteboard = NSPasteboard.generalPasteboard()
+    pasteboard.clearContents()
+    pasteboard.setData_forType_(NSData.dataWithBytes_length_(data, len(data)), "public.png")
+
+
+def set_clipboard_png(data):
+    """将 PNG 编码字节原样写回剪切板，返回是否成功"""
+    system = platform.system()
+    try:
+        if system == "Linux":
+            command = _linux_copy_command("image/png")
+            if command is None:
+                return False
+            # xclip/wl-copy 读完 stdin 后自行转入后台继续持有剪切板
+            return _spawn_clipboard_writer(command, data).wait(timeout=2) == 0
+        elif system == "Windows":
+            _set_windows_png(data)
+            return True
+        elif system == "Darwin":
+            _set_macos_png(data)
+            return True
+    except Exception:
+        pass
+    return False
+
+
+def set_clipboard_files(paths):
+    """将文件列表以 text/uri-list 写回剪切板（仅 Linux），返回是否成功"""
+    if platform.system() != "Linux":
+        return False
+    command = _linux_copy_command("text/uri-list")
+    if command is None:
+        return False
+    data = "".join(Path(path).absolute().as_uri() + "\r\n" for path in paths)
+    try:
+        return _spawn_clipboard_writer(command, data.encode()).wait(timeout=2) == 0
+    except Exception:
+        return False
+
+
+class OneShotTextSelection:
+    """只服务一次文本粘贴的 CLIPBOARD 所有者（X11）
+
+    xclip -loops 1 把任何一次选择请求都算作粘贴，剪切板管理器或终端先请求 TARGETS
+    时文本就被提前消耗。这里 TARGETS / TIMESTAMP 请求可以任意多次，只有文本目标的
+    请求才算作粘贴：提供文本后放弃剪切板，等待者随即恢复原内容。
+
+    与写入进程的接口相同：wait(timeout) 超时抛出 subprocess.TimeoutExpired，kill() 提前结束。
+    """
+
+    def __init__(self, text, display_name=None):
+        try:
+            from Xlib import X, Xatom, display as xdisplay
+        except ImportError:
+            raise RuntimeError("一次性文本需要: pip install python-xlib")
+
+        self.X = X
+        self.Xatom = Xatom
+        self.text = text
+        self.display = xdisplay.Display(display_name)
+        screen = self.display.screen()
+        self.window = screen.root.create_window(0, 0, 1, 1, 0, screen.root_depth)
+
+        atom = self.display.intern_atom
+        self.clipboard_atom = atom("CLIPBOARD")
+        self.targets_atom = atom("TARGETS")
+        self.timestamp_atom = atom("TIMESTAMP")
+        self.text_atoms = {atom(name): name for name in TEXT_TARGETS}
+
+        # 以服务器时间取得所有权，TIMESTAMP 目标需要返回它
+        self.window.change_attributes(event_mask=X.PropertyChangeMask)
+        self.window.change_property(atom("CLAUDE_CLIPBOARD_TRANSFER"), Xatom.STRING, 8, b"")
+        self.display.flush()
+        self.owned_since = X.CurrentTime
+        while True:
+            event = self.display.next_event()
+            if event.type == X.PropertyNotify:
+                self.owned_since = event.time
+                break
+        self.window.change_attributes(event_mask=0)
+        self.window.set_selection_owner(self.clipboard_atom, self.owned_since)
+        self.display.flush()
+        owner = self.display.get_selection_owner(self.clipboard_atom)
+        if getattr(owner, "id", owner) != self.window.id:
+            self.window.destroy()
+            self.display.close()
+            raise RuntimeError("无法取得剪切板所有权")
+
+        self.pasted = False
+        self.finished = False
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _convert(self, target):
+        """按目标类型转换内容，返回 (类型原子, 格式, 数据, 是否为粘贴)；不支持返回 None"""
+        Xatom = self.Xatom
+        if target == self.targets_atom:
+            atoms = [self.targets_atom, self.timestamp_atom] + list(self.text_atoms)
+            return Xatom.ATOM, 32, atoms, False
+        if target == self.timestamp_atom:
+            return Xatom.INTEGER, 32, [self.owned_since], False
+        if target in self.text_atoms:
+            if self.text_atoms[target] == "STRING":
+                return Xatom.STRING, 8, self.text.encode("latin-1", "replace"), True
+            return target, 8, self.text.encode("utf-8"), True
+        return None
+
+    def handle_selection_request(self, event):
+        X = self.X
+        from Xlib.protocol import event as xevent
+
+        prop = event.property if event.property != X.NONE else event.target
+        converted = self._convert(event.target)
+        if converted is None:
+            prop = X.NONE
+        else:
+            prop_type, fmt, data, is_paste = converted
+            event.requestor.change_property(prop, prop_type, fmt, data)
+            self.pasted = self.pasted or is_paste
+
+        notify = xevent.SelectionNotify(
+            time=event.time, requestor=event.requestor, selection=event.selection,
+            target=event.target, property=prop,
+        )
+        event.requestor.send_event(notify)
+        self.display.flush()
+
+    def _serve(self):
+        X = self.X
+        try:
+            while not self.pasted:
+                if not self.display.pending_events():
+                    readable, _, _ = select.select(
+                        [self.display.fileno(), self._wakeup_r], [], []
+                    )
+                    if self._wakeup_r in readable:
+                        return
+                while self.display.pending_events() and not self.pasted:
+                    event = self.display.next_event()
+                    if event.type == X.SelectionRequest:
+                        self.handle_selection_request(event)
+                    elif event.type == X.SelectionClear:
+                        # 其他程序复制了新内容，文本不会再被粘贴
+                        return
+        finally:
+            self.window.destroy()
+            self.display.close()
+
+    def wait(self, timeout=None):
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            raise subprocess.TimeoutExpired("clipboard-text-once", timeout)
+        if not self.finished:
+            self.finished = True
+            os.close(self._wakeup_r)
+            os.close(self._wakeup_w)
+        return 0
+
+    def kill(self):
+        if not self.finished:
+            os.write(self._wakeup_w, b"x")
+
+
+def set_clipboard_text_once(text):
+    """写入只服务一次粘贴请求的文本（仅 Linux）
+
+    返回写入者：某个应用读取文本后 wait() 立即返回，调用方据此得知粘贴已完成。
+    X11 上由 OneShotTextSelection 持有剪切板，TARGETS 等查询不算作粘贴；
+    没有 python-xlib 时回退到 xclip -loops 1 / wl-copy --paste-once 进程。
+    平台不支持时返回 None。
+    """
+    if platform.system() != "Linux":
+        return None
+    if os.environ.get("DISPLAY") and os.environ.get("XDG_SESSION_TYPE") in ("x11", None):
+        try:
+            return OneShotTextSelection(text)
+        except Exception:
+            # 没有 python-xlib 或无法连接 X 服务器
+            pass
+    command = _linux_copy_command(None, once=True)
+    if command is None:
+        return None
+    try:
+        return _spawn_clipboard_writer(command, text.encode("utf-8"))
+    except OSError:
+        return None
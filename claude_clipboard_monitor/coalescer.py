@@ -0,0 +1,46 @@
+"""
+截图合并器
+连续截图时，窗口期内到达的多张图片合并为一批，一次粘贴/拖拽交付
+"""
+
+import time
+
+
+def format_path_references(paths):
+    """将多个文件路径格式化为一段 @path 引用文本"""
+    return " " + " ".join(f"@{path}" for path in paths) + " "
+
+
+class CaptureCoalescer:
+    """截图合并器
+
+    每次 add() 都会重新开始计时；距最后一张截图超过 window_ms 后批次就绪。
+    window_ms 为 0 时每张截图立即就绪，行为与不合并时相同。
+    """
+
+    def __init__(self, window_ms=0, clock=time.monotonic):
+        self.window = max(window_ms, 0) / 1000.0
+        self.clock = clock
+        self.pending = []
+        self.last_arrival = None
+
+    def add(self, item):
+        """加入一张截图"""
+        self.pending.append(item)
+        self.last_arrival = self.clock()
+
+    def ready(self):
+        """当前批次是否可以交付"""
+        if not self.pending:
+            return False
+        return self.clock() - self.last_arrival >= self.window
+
+    def drain(self):
+        """取出当前批次并清空"""
+        batch = self.pending
+        self.pending = []
+        self.last_arrival = None
+        return batch
+
+    def __len__(self):
+        return len(self.pending)
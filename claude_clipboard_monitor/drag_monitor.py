@@ -9,28 +9,71 @@ import sys
 import time
 import hashlib
 import tempfile
+from io import BytesIO
+from collections import deque
 from datetime import datetime, timedelta
 from pathlib import Path
-import psutil
 
 try:
-    from PIL import Image, ImageGrab
-    import pyperclip
+    from PIL import Image
 except ImportError:
     print("请安装依赖: pip install pillow pyperclip psutil")
     sys.exit(1)
 
+from .profiler import profiling
 from .drag_simulator import DragSimulator
+from .terminal import TerminalSink
+from .power import PowerState
+from .backends import get_backends
+from .storage import (
+    atomic_save_image, save_png, ingest_file, filter_image_files, file_list_hash,
+    stored_file_time,
+)
+from .clipboard import image_md5
+from .coalescer import CaptureCoalescer
+from .scheduler import (
+    Scheduler, POLL_INTERVAL, IDLE_POLL_INTERVAL, PROCESS_CHECK_INTERVAL, CLEANUP_INTERVAL,
+    WINDOW_REFRESH_INTERVAL, STATS_INTERVAL,
+)
+
+
+# 交付后保留临时文件的时间（秒），确保 Claude 有时间读取
+DELETE_DELAY = 2
 
 
 class DragClipboardMonitor:
     """拖拽式剪切板监听器"""
     
-    def __init__(self, cleanup_hours=1):
+    def __init__(self, cleanup_hours=1, fsync=False, coalesce_ms=200, max_size=None,
+                 terminal=False, backends=None, clock=None):
         self.cleanup_hours = cleanup_hours
+        self.fsync = fsync
+        self.max_size = max_size
         self.last_clipboard_hash = None
         self.running = False
-        self.drag_simulator = DragSimulator()
+        self.claude_running = False
+        
+        # 周期任务按单调时钟调度（测试和基准时可注入虚拟时钟）
+        self.scheduler = Scheduler(clock)
+        
+        # 剪切板、进程、窗口和输入注入的平台实现（测试和基准时可替换为内存实现）
+        self.backends = backends or get_backends()
+        
+        # 会话锁定/空闲/休眠时暂停，使用电池时降低轮询频率
+        self.power = PowerState()
+        self.drag_simulator = DragSimulator(self.backends)
+        
+        # 终端直接交付：不操作窗口，直接把路径引用输入到 Claude Code 的终端
+        self.terminal_sink = TerminalSink(self.backends) if terminal else None
+        
+        # 已交付、等待删除的临时文件 [(删除时间, [文件, ...]), ...]
+        self.delivered = deque()
+        
+        # 连拍截图合并：窗口期内的多张图片一次拖拽交付
+        self.coalescer = CaptureCoalescer(coalesce_ms, clock=self.scheduler.now)
+        
+        # 复用的 PNG 编码缓冲区（仅 ImageGrab 回退路径计算哈希时使用）
+        self._png_buffer = BytesIO()
         
         # 创建临时目录
         self.temp_dir = Path(tempfile.gettempdir()) / "claude_clipboard_temp"
@@ -38,23 +81,21 @@ class DragClipboardMonitor:
     
     def is_claude_code_running(self):
         """检测 Claude Code 是否在运行"""
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                name = proc.info.get('name', '')
-                cmdline = proc.info.get('cmdline', [])
-                # 检查进程名或命令行中是否包含 claude
-                if (name and 'claude' in name.lower()) or \
-                   (cmdline and any('claude' in str(cmd).lower() for cmd in cmdline)):
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return False
+        return self.backends.processes.is_claude_running()
+    
+    def check_claude(self):
+        """刷新 Claude Code 运行状态（由调度器按固定间隔执行，不在每次轮询时遍历进程）"""
+        self.claude_running = self.is_claude_code_running()
+    
+    def refresh_window(self):
+        """刷新缓存的 Claude Code 窗口，交付时不再现场查找"""
+        if self.claude_running and not self.terminal_sink:
+            self.drag_simulator.refresh_window()
     
     def get_clipboard_image(self):
-        """获取剪切板中的图片"""
+        """获取剪切板中的图片（复制的文件返回文件路径列表）"""
         try:
-            # 使用 PIL 的 ImageGrab 跨平台获取剪切板图片
-            return ImageGrab.grabclipboard()
+            return self.backends.clipboard.read()
         except Exception:
             pass
         return None
@@ -62,35 +103,50 @@ class DragClipboardMonitor:
     def get_clipboard_hash(self, image=None):
         """获取剪切板内容的哈希值"""
         try:
-            if image:
-                # 对图片数据计算哈希
-                from io import BytesIO
-                img_bytes = BytesIO()
-                image.save(img_bytes, format='PNG')
-                return hashlib.md5(img_bytes.getvalue()).hexdigest()
+            if isinstance(image, bytes):
+                # 剪切板原始 PNG 字节直接计算哈希
+                return hashlib.md5(image).hexdigest()
+            elif image:
+                # 对图片数据计算哈希（复用缓冲区，不复制编码结果）
+                return image_md5(image, self._png_buffer)
             else:
                 # 对文本内容计算哈希
-                text = pyperclip.paste()
+                text = self.backends.clipboard.read_text()
                 return hashlib.md5(text.encode()).hexdigest()
         except Exception:
             return None
     
     def save_temp_image(self, image):
         """保存图片到临时文件"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"claude_clipboard_{timestamp}.png"
         filepath = self.temp_dir / filename
         
-        image.save(filepath, "PNG")
+        if isinstance(image, bytes):
+            # PNG 字节原样写入，仅在启用缩放时解码
+            save_png(image, filepath, max_size=self.max_size, fsync=self.fsync)
+        else:
+            atomic_save_image(image, filepath, "PNG", fsync=self.fsync)
         return filepath
+
+    def ingest_files(self, paths):
+        """零拷贝导入剪切板中复制的图片文件（不解码像素）"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        stored = []
+        for index, src in enumerate(filter_image_files(paths)):
+            filepath = self.temp_dir / f"claude_clipboard_{timestamp}_{index}{src.suffix.lower()}"
+            method = ingest_file(src, filepath, fsync=self.fsync)
+            print(f"📎 已导入文件 ({method}): {src}")
+            stored.append(filepath)
+        return stored
     
     def cleanup_temp_files(self):
         """清理过期的临时文件"""
         cutoff_time = datetime.now() - timedelta(hours=self.cleanup_hours)
         
-        for file_path in self.temp_dir.glob("claude_clipboard_*.png"):
+        for file_path in self.temp_dir.glob("claude_clipboard_*"):
             try:
-                file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
+                file_time = datetime.fromtimestamp(stored_file_time(file_path.stat()))
                 if file_time < cutoff_time:
                     file_path.unlink()
                     print(f"🧹 清理临时文件: {file_path.name}")
@@ -98,37 +154,123 @@ class DragClipboardMonitor:
                 print(f"⚠️ 清理文件失败 {file_path}: {e}")
     
     def process_clipboard_image(self, image):
-        """处理剪切板图片：保存并拖拽到Claude"""
+        """处理剪切板图片：保存并加入待拖拽批次"""
         try:
-            # 1. 保存到临时文件
+            # 保存到临时文件（原子写入，文件出现即完整，无需等待）
             temp_file = self.save_temp_image(image)
             print(f"💾 图片已保存到临时文件: {temp_file.name}")
+            self.coalescer.add(temp_file)
+            return True
+        except Exception as e:
+            print(f"❌ 处理图片失败: {e}")
+            return False
+    
+    def deliver_pending(self):
+        """将当前批次的图片一次性拖拽到Claude"""
+        temp_files = self.coalescer.drain()
+        if not temp_files:
+            return True
+        
+        try:
+            if self.terminal_sink:
+                # 直接输入到 Claude Code 的终端，不操作窗口
+                success = self.terminal_sink.deliver(temp_files)
+            else:
+                # 模拟拖拽到Claude Code窗口（整批只点击、粘贴一次）
+                if len(temp_files) > 1:
+                    print(f"🎯 正在拖拽 {len(temp_files)} 张图片到 Claude Code...")
+                else:
+                    print("🎯 正在拖拽到 Claude Code...")
+                success = self.drag_simulator.simulate_drag_to_claude(
+                    [str(f) for f in temp_files]
+                )
             
-            # 2. 短暂延迟确保文件完全写入
-            time.sleep(0.2)
-            
-            # 3. 模拟拖拽到Claude Code窗口
-            print("🎯 正在拖拽到 Claude Code...")
-            success = self.drag_simulator.simulate_drag_to_claude(str(temp_file))
-            
-            if success:
+            if success and self.terminal_sink:
+                # 引用只是输入到了提示符中，发送前文件必须存在，留给定期清理删除
+                print("✅ 路径引用已输入到 Claude Code")
+            elif success:
                 print("✅ 图片已成功拖拽到 Claude Code")
-                # 延迟删除，确保Claude有时间处理文件
-                time.sleep(2)
-                try:
-                    temp_file.unlink()
-                    print(f"🗑️ 临时文件已删除: {temp_file.name}")
-                except Exception as e:
-                    print(f"⚠️ 删除临时文件失败: {e}")
+                # 延迟删除，确保Claude有时间处理文件；由调度器到期删除，不阻塞交付
+                self.delivered.append((self.scheduler.now() + DELETE_DELAY, temp_files))
+                self.scheduler.after("delete", DELETE_DELAY, self.delete_delivered)
             else:
                 print("❌ 拖拽失败，临时文件保留")
+                print("💡 提示: 也可以手动拖拽图片文件到 Claude Code 窗口")
                 
             return success
             
         except Exception as e:
-            print(f"❌ 处理图片失败: {e}")
+            print(f"❌ 拖拽图片失败: {e}")
             return False
     
+    def delete_delivered(self, force=False):
+        """删除已交付且超过保留时间的临时文件"""
+        now = self.scheduler.now()
+        while self.delivered and (force or self.delivered[0][0] <= now):
+            _, temp_files = self.delivered.popleft()
+            for temp_file in temp_files:
+                try:
+                    temp_file.unlink()
+                    print(f"🗑️ 临时文件已删除: {temp_file.name}")
+                except Exception as e:
+                    print(f"⚠️ 删除临时文件失败: {e}")
+    
+    def process_clipboard(self):
+        """检查一次剪切板，保存新出现的图片并加入待拖拽批次
+
+        图片数据只在本方法内存活，不会跨越轮询间隔的 sleep 常驻内存。
+        """
+        image = self.get_clipboard_image()
+        if isinstance(image, list):
+            # 复制的图片文件：按 stat 指纹去重，直接导入不解码
+            current_hash = file_list_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                for temp_file in self.ingest_files(image):
+                    self.coalescer.add(temp_file)
+                self.last_clipboard_hash = current_hash
+        elif image:
+            # 检查是否是新的内容
+            current_hash = self.get_clipboard_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                print(f"\n📋 检测到新图片 (hash: {current_hash[:8]}...)")
+                
+                # 处理图片：保存并加入待拖拽批次
+                self.process_clipboard_image(image)
+                self.last_clipboard_hash = current_hash
+    
+    def poll(self):
+        """轮询一次剪切板，合并窗口结束后整批拖拽"""
+        if not self.claude_running:
+            return
+        
+        # 检查剪切板是否有图片
+        self.process_clipboard()
+        
+        # 合并窗口结束后整批拖拽
+        if self.coalescer.ready():
+            self.deliver_pending()
+    
+    def poll_interval(self):
+        """当前轮询间隔：Claude Code 未运行或使用电池时降低频率"""
+        interval = POLL_INTERVAL if self.claude_running else IDLE_POLL_INTERVAL
+        return self.power.poll_interval(interval)
+    
+    def print_stats(self):
+        """输出交付延迟统计"""
+        sink = self.terminal_sink or self.drag_simulator
+        print(f"📊 {sink.format_stats()}")
+    
+    def schedule_tasks(self):
+        """注册周期任务（进程检测排在轮询之前，启动时先确定运行状态）"""
+        scheduler = self.scheduler
+        scheduler.every("process", lambda: self.power.poll_interval(PROCESS_CHECK_INTERVAL),
+                        self.check_claude)
+        scheduler.every("poll", self.poll_interval, self.poll)
+        scheduler.every("window", WINDOW_REFRESH_INTERVAL, self.refresh_window)
+        scheduler.every("cleanup", CLEANUP_INTERVAL, self.cleanup_temp_files,
+                        delay=CLEANUP_INTERVAL)
+        scheduler.every("stats", STATS_INTERVAL, self.print_stats, delay=STATS_INTERVAL)
+    
     def run(self):
         """运行监听器"""
         print("🚀 Claude Code 拖拽式剪切板监听器已启动")
@@ -138,53 +280,40 @@ class DragClipboardMonitor:
         
         # 检查依赖
         try:
-            self.drag_simulator.get_active_claude_window()
+            if not self.terminal_sink:
+                self.drag_simulator.get_active_claude_window()
         except Exception as e:
             print(f"⚠️ 拖拽功能初始化失败: {e}")
             print("将使用备用方案（保存文件但不拖拽）")
         
         self.running = True
-        cleanup_counter = 0
+        self.power.start()
+        self.schedule_tasks()
         
         while self.running:
             try:
-                # 每50次循环清理一次临时文件
-                cleanup_counter += 1
-                if cleanup_counter >= 50:
-                    self.cleanup_temp_files()
-                    cleanup_counter = 0
-                
-                # 检查 Claude Code 是否运行
-                if not self.is_claude_code_running():
-                    time.sleep(2)
-                    continue
-                
-                # 检查剪切板是否有图片
-                image = self.get_clipboard_image()
-                if image:
-                    # 检查是否是新的内容
-                    current_hash = self.get_clipboard_hash(image)
-                    if current_hash != self.last_clipboard_hash:
-                        print(f"\n📋 检测到新图片 (hash: {current_hash[:8]}...)")
-                        
-                        # 处理图片：保存并拖拽
-                        success = self.process_clipboard_image(image)
-                        self.last_clipboard_hash = current_hash
-                        
-                        if not success:
-                            print("💡 提示: 也可以手动拖拽图片文件到 Claude Code 窗口")
+                # 会话锁定、空闲或休眠期间阻塞等待，不轮询也不计时
+                if self.power.paused:
+                    print(f"💤 {self.power.describe()}，暂停监听")
+                    self.power.wait_active()
+                    print("▶️ 会话已恢复，继续监听")
                 
-                time.sleep(0.5)
+                # 执行到期的任务，然后睡到下一个截止时间
+                self.scheduler.run_pending()
+                if self.running:
+                    self.scheduler.wait()
                 
             except KeyboardInterrupt:
                 print("\n🛑 正在停止监听器...")
                 self.running = False
             except Exception as e:
                 print(f"❌ 错误: {e}")
-                time.sleep(1)
         
         # 清理退出
+        self.delete_delivered(force=True)
         self.cleanup_temp_files()
+        self.print_stats()
+        self.power.stop()
         print("👋 监听器已停止")
 
 
@@ -204,6 +333,32 @@ def main():
         action="store_true",
         help="测试拖拽功能"
     )
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="保存图片后执行 fsync（更安全但更慢，默认关闭）"
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        help="图片最长边上限（像素）；默认不缩放，剪切板 PNG 原样保存"
+    )
+    parser.add_argument(
+        "--coalesce-ms",
+        type=int,
+        default=200,
+        help="连拍合并窗口（毫秒，默认200，0为不合并）：窗口内的多张图片一次拖拽"
+    )
+    parser.add_argument(
+        "--terminal",
+        action="store_true",
+        help="不操作窗口，直接把路径引用输入到 Claude Code 的终端（tmux send-keys 或 TIOCSTI）"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="启用采样分析器，退出时写入 FILE（.prof 为 cProfile 格式，其他为折叠栈）"
+    )
     
     args = parser.parse_args()
     
@@ -220,8 +375,15 @@ def main():
         print("请运行: pip install pillow pyperclip psutil pyautogui")
         return
     
-    monitor = DragClipboardMonitor(cleanup_hours=args.cleanup_hours)
-    monitor.run()
+    monitor = DragClipboardMonitor(
+        cleanup_hours=args.cleanup_hours,
+        fsync=args.fsync,
+        max_size=args.max_size,
+        coalesce_ms=args.coalesce_ms,
+        terminal=args.terminal
+    )
+    with profiling(args.profile):
+        monitor.run()
 
 
 if __name__ == "__main__":
@@ -3,40 +3,15 @@
 """
 
 import os
-import sys
 import time
+import subprocess
 import tempfile
+from collections import deque
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union
 import platform
 
-try:
-    import pyautogui
-    import psutil
-except ImportError:
-    print("请安装额外依赖: pip install pyautogui")
-    sys.exit(1)
-
-# 平台特定的窗口操作
-if platform.system() == "Windows":
-    try:
-        import win32gui
-        import win32con
-    except ImportError:
-        print("Windows平台需要: pip install pywin32")
-        sys.exit(1)
-elif platform.system() == "Darwin":  # macOS
-    try:
-        from AppKit import NSWorkspace, NSApplication
-        import Quartz
-    except ImportError:
-        print("macOS平台需要: pip install pyobjc-framework-Quartz pyobjc-framework-Cocoa")
-        sys.exit(1)
-elif platform.system() == "Linux":
-    try:
-        import subprocess
-    except ImportError:
-        pass
+from .backends import get_backends, ACTIVATE_TIMEOUT
 
 
 class ClaudeCodeWindowFinder:
@@ -58,6 +33,11 @@ class ClaudeCodeWindowFinder:
     
     def _find_windows_claude(self) -> List[dict]:
         """Windows 平台查找 Claude Code 窗口"""
+        try:
+            import win32gui
+        except ImportError:
+            print("Windows平台需要: pip install pywin32")
+            return []
         windows = []
         
         def enum_window_callback(hwnd, windows):
@@ -80,6 +60,11 @@ class ClaudeCodeWindowFinder:
     
     def _find_macos_claude(self) -> List[dict]:
         """macOS 平台查找 Claude Code 窗口"""
+        try:
+            import Quartz
+        except ImportError:
+            print("macOS平台需要: pip install pyobjc-framework-Quartz pyobjc-framework-Cocoa")
+            return []
         windows = []
         
         # 获取所有窗口信息
@@ -110,16 +95,22 @@ class ClaudeCodeWindowFinder:
         windows = []
         
         try:
-            # 使用 wmctrl 或 xdotool 查找窗口
-            result = subprocess.run(['wmctrl', '-l'], capture_output=True, text=True)
+            # 使用 wmctrl 或 xdotool 查找窗口；-G 同时输出几何信息，
+            # 激活请求无法确认时可以点击窗口中心
+            result = subprocess.run(['wmctrl', '-lG'], capture_output=True, text=True)
             if result.returncode == 0:
                 for line in result.stdout.strip().split('\n'):
                     if 'claude' in line.lower():
-                        parts = line.split(None, 3)
-                        if len(parts) >= 4:
+                        # id 桌面 x y 宽 高 主机名 标题
+                        parts = line.split(None, 7)
+                        if len(parts) >= 8:
                             windows.append({
-                                'title': parts[3],
-                                'id': parts[0]
+                                'title': parts[7],
+                                'id': parts[0],
+                                'x': int(parts[2]),
+                                'y': int(parts[3]),
+                                'width': int(parts[4]),
+                                'height': int(parts[5])
                             })
         except FileNotFoundError:
             # 尝试使用 xdotool
@@ -141,114 +132,119 @@ class ClaudeCodeWindowFinder:
 class DragSimulator:
     """拖拽模拟器"""
     
-    def __init__(self):
-        self.window_finder = ClaudeCodeWindowFinder()
-        # 禁用 pyautogui 的安全特性（在自动化中很重要）
-        pyautogui.FAILSAFE = False
-        pyautogui.PAUSE = 0.1
+    def __init__(self, backends=None, activate_timeout=ACTIVATE_TIMEOUT):
+        # 窗口查找、输入注入和剪切板写入都通过平台后端完成
+        self.backends = backends or get_backends()
+        self.activate_timeout = activate_timeout
+        
+        # 最近的端到端交付延迟（毫秒）
+        self.latencies = deque(maxlen=1000)
+        
+        # 缓存的 Claude Code 窗口：查找窗口需要启动外部命令，交付时不重复查找
+        self.window = None
     
-    def get_active_claude_window(self) -> Optional[dict]:
-        """获取活动的 Claude Code 窗口"""
-        windows = self.window_finder.find_claude_windows()
+    def refresh_window(self) -> Optional[dict]:
+        """重新查找并缓存 Claude Code 窗口"""
+        windows = self.backends.windows.find_claude_windows()
         
         # 优先返回可见且在前台的窗口
+        self.window = None
         for window in windows:
             if window.get('width', 0) > 100 and window.get('height', 0) > 100:
-                return window
-        
-        return windows[0] if windows else None
+                self.window = window
+                break
+        else:
+            self.window = windows[0] if windows else None
+        return self.window
+    
+    def get_active_claude_window(self) -> Optional[dict]:
+        """获取活动的 Claude Code 窗口（优先使用缓存）"""
+        return self.window or self.refresh_window()
     
-    def simulate_drag_to_claude(self, file_path: str) -> bool:
-        """模拟拖拽文件到 Claude Code 窗口"""
+    def simulate_drag_to_claude(self, file_path: Union[str, List[str]]) -> bool:
+        """模拟拖拽文件到 Claude Code 窗口
+
+        file_path 可以是多个路径组成的列表，此时整批只激活、粘贴一次。
+        不使用固定等待：确认窗口已激活后立即注入粘贴按键，超时则放弃本次交付。
+        """
+        start = time.perf_counter()
         claude_window = self.get_active_claude_window()
         if not claude_window:
             print("❌ 未找到 Claude Code 窗口")
             return False
         
         try:
-            # 计算窗口中心位置（聊天区域）
-            center_x = claude_window['x'] + claude_window['width'] // 2
-            center_y = claude_window['y'] + claude_window['height'] // 2
+            if isinstance(file_path, (list, tuple)):
+                from .coalescer import format_path_references
+                file_path = format_path_references(file_path)
             
-            print(f"🎯 拖拽到窗口位置: ({center_x}, {center_y})")
+            # 先将路径放入剪切板，写入完成后才会注入粘贴按键
+            self.backends.clipboard.write_text(file_path)
             
-            # 模拟拖拽操作
-            if platform.system() == "Windows":
-                return self._drag_windows(file_path, center_x, center_y)
-            elif platform.system() == "Darwin":
-                return self._drag_macos(file_path, center_x, center_y)
-            elif platform.system() == "Linux":
-                return self._drag_linux(file_path, center_x, center_y)
+            if not self._activate(claude_window):
+                # 缓存的窗口可能已经关闭，下次交付时重新查找
+                self.window = None
+                print(f"❌ {self.activate_timeout:.1f} 秒内未能激活 Claude Code 窗口")
+                return False
             
+            paste_key = 'cmd' if platform.system() == "Darwin" else 'ctrl'
+            self.backends.input.hotkey(paste_key, 'v')
         except Exception as e:
             print(f"❌ 拖拽失败: {e}")
             return False
         
-        return False
+        elapsed = (time.perf_counter() - start) * 1000
+        self.latencies.append(elapsed)
+        print(f"⚡ 交付耗时 {elapsed:.1f} ms")
+        return True
     
-    def _drag_windows(self, file_path: str, x: int, y: int) -> bool:
-        """Windows 拖拽实现"""
-        # 在Windows上，我们可以使用更直接的方法
-        # 比如模拟从文件管理器拖拽，或者使用剪切板+粘贴
-        
-        # 方案1: 尝试模拟Ctrl+V粘贴
-        try:
-            # 先将文件路径复制到剪切板
-            import pyperclip
-            pyperclip.copy(file_path)
-            
-            # 点击Claude窗口激活
-            pyautogui.click(x, y)
-            time.sleep(0.2)
-            
-            # 模拟Ctrl+V
-            pyautogui.hotkey('ctrl', 'v')
-            time.sleep(0.5)
-            
-            return True
-        except Exception as e:
-            print(f"Windows拖拽失败: {e}")
-            return False
+    def _is_foreground(self, window: dict) -> bool:
+        """窗口（macOS 上为其所属应用）是否已在前台"""
+        windows = self.backends.windows
+        if window.get('hwnd') is not None:
+            return windows.active_window_id() == window['hwnd']
+        active_id = windows.active_window_id()
+        if window.get('id') is not None and isinstance(active_id, int):
+            # X11 上能读取 _NET_ACTIVE_WINDOW 时按 id 比较
+            return active_id == int(str(window['id']), 0)
+        title = windows.active_window_title()
+        expected = window.get('owner') or window.get('title')
+        return title == expected if expected else 'claude' in title.lower()
     
-    def _drag_macos(self, file_path: str, x: int, y: int) -> bool:
-        """macOS 拖拽实现"""
-        try:
-            # macOS上可以使用AppleScript来模拟拖拽
-            script = f'''
-            tell application "System Events"
-                set theFile to POSIX file "{file_path}"
-                -- 这里需要更复杂的拖拽脚本
-            end tell
-            '''
-            
-            # 暂时使用简单的点击+粘贴方法
-            pyautogui.click(x, y)
-            time.sleep(0.2)
-            
-            # 在macOS上尝试使用 Cmd+V
-            pyautogui.hotkey('cmd', 'v')
-            time.sleep(0.5)
-            
+    def _activate(self, window: dict) -> bool:
+        """激活窗口并确认；无法确认时（macOS 等）点击窗口中心作为回退
+
+        没有几何信息的窗口（xdotool 查找结果）只能按 id 请求激活。点击或请求后同样在
+        activate_timeout 内等待窗口出现在前台，无法确认时不注入粘贴按键，
+        以免把路径粘贴到其他应用中。
+        """
+        if self.backends.input.activate(window, self.activate_timeout):
             return True
-        except Exception as e:
-            print(f"macOS拖拽失败: {e}")
+        if 'width' in window:
+            # 计算窗口中心位置（聊天区域）
+            center_x = window['x'] + window['width'] // 2
+            center_y = window['y'] + window['height'] // 2
+            print(f"🎯 点击窗口位置: ({center_x}, {center_y})")
+            self.backends.input.click(center_x, center_y)
+        elif window.get('id') is None:
             return False
+        
+        deadline = time.monotonic() + self.activate_timeout
+        while not self._is_foreground(window):
+            if time.monotonic() >= deadline:
+                print("⚠️ 点击后未能确认 Claude Code 窗口在前台，路径已在剪切板中，可手动粘贴")
+                return False
+            time.sleep(0.005)
+        return True
     
-    def _drag_linux(self, file_path: str, x: int, y: int) -> bool:
-        """Linux 拖拽实现"""
-        try:
-            # Linux上可以使用xdotool或类似工具
-            pyautogui.click(x, y)
-            time.sleep(0.2)
-            
-            # 尝试Ctrl+V
-            pyautogui.hotkey('ctrl', 'v')
-            time.sleep(0.5)
-            
-            return True
-        except Exception as e:
-            print(f"Linux拖拽失败: {e}")
-            return False
+    def format_stats(self) -> str:
+        """交付延迟统计"""
+        from .trace import percentile
+        values = list(self.latencies)
+        if not values:
+            return "交付延迟: 暂无数据"
+        return (f"交付延迟: {len(values)} 次，p50 {percentile(values, 0.5):.1f} ms / "
+                f"p95 {percentile(values, 0.95):.1f} ms / 最大 {max(values):.1f} ms")
 
 
 def test_drag_simulator():
@@ -256,7 +252,7 @@ def test_drag_simulator():
     simulator = DragSimulator()
     
     # 查找Claude窗口
-    windows = simulator.window_finder.find_claude_windows()
+    windows = simulator.backends.windows.find_claude_windows()
     print(f"找到 {len(windows)} 个Claude窗口:")
     for i, window in enumerate(windows):
         print(f"  {i+1}. {window}")
@@ -270,6 +266,7 @@ def test_drag_simulator():
         # 测试拖拽
         success = simulator.simulate_drag_to_claude(test_file)
         print(f"拖拽测试: {'✅ 成功' if success else '❌ 失败'}")
+        print(simulator.format_stats())
     finally:
         # 清理测试文件
         os.unlink(test_file)
@@ -0,0 +1,115 @@
+"""
+资源预算
+监听器定期检查自身（含后台工作进程）的 CPU 和 RSS，超出预算时进入省资源模式：
+暂停后台重新压缩、改用最快的编码参数；连续多次回到预算以内后恢复正常。
+"""
+
+import time
+
+import psutil
+
+
+# 恢复正常前需要连续低于预算的检查次数，以及视为"回到预算以内"的比例
+RECOVER_CHECKS = 5
+RECOVER_RATIO = 0.8
+
+
+class ResourceGovernor:
+    """进程自身的 CPU / RSS 预算
+
+    cpu_percent 以单核百分比计（100 表示占满一个核心），rss_mb 为常驻内存上限；
+    任一项为 None 表示不限制。check() 返回本次检查是否切换了模式。
+    """
+
+    def __init__(self, cpu_percent=None, rss_mb=None):
+        self.cpu_budget = cpu_percent
+        self.rss_budget = rss_mb * 1024 * 1024 if rss_mb else None
+        self.process = psutil.Process()
+        self.process.cpu_percent(None)
+        self._children = {}
+        self.degraded = False
+        self._under_budget = 0
+        self._degraded_since = None
+        self.cpu = 0.0
+        self.rss = 0
+        self.stats = {
+            "cpu_breaches": 0,
+            "rss_breaches": 0,
+            "degraded_seconds": 0.0,
+            "peak_cpu": 0.0,
+            "peak_rss": 0,
+        }
+
+    def _sample(self):
+        """采样自身和子进程（重新压缩进程池）的 CPU 与 RSS"""
+        processes = [self.process]
+        try:
+            children = self.process.children()
+        except psutil.Error:
+            children = []
+        alive = {}
+        for child in children:
+            # 复用 Process 对象，cpu_percent 才能计算两次采样之间的增量
+            cached = self._children.get(child.pid, child)
+            alive[child.pid] = cached
+            processes.append(cached)
+        self._children = alive
+
+        cpu = 0.0
+        rss = 0
+        for process in processes:
+            try:
+                cpu += process.cpu_percent(None)
+                rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return cpu, rss
+
+    def check(self):
+        """采样一次并根据预算切换模式，返回是否发生切换"""
+        self.cpu, self.rss = self._sample()
+        self.stats["peak_cpu"] = max(self.stats["peak_cpu"], self.cpu)
+        self.stats["peak_rss"] = max(self.stats["peak_rss"], self.rss)
+
+        cpu_over = self.cpu_budget is not None and self.cpu > self.cpu_budget
+        rss_over = self.rss_budget is not None and self.rss > self.rss_budget
+        if cpu_over:
+            self.stats["cpu_breaches"] += 1
+        if rss_over:
+            self.stats["rss_breaches"] += 1
+
+        if cpu_over or rss_over:
+            self._under_budget = 0
+            if not self.degraded:
+                self.degraded = True
+                self._degraded_since = time.monotonic()
+                return True
+            return False
+
+        if not self.degraded:
+            return False
+
+        # 留出余量，避免在预算边界反复切换
+        comfortable = (
+            (self.cpu_budget is None or self.cpu <= self.cpu_budget * RECOVER_RATIO)
+            and (self.rss_budget is None or self.rss <= self.rss_budget * RECOVER_RATIO)
+        )
+        self._under_budget = self._under_budget + 1 if comfortable else 0
+        if self._under_budget >= RECOVER_CHECKS:
+            self.degraded = False
+            self.stats["degraded_seconds"] += time.monotonic() - self._degraded_since
+            self._degraded_since = None
+            return True
+        return False
+
+    def describe(self):
+        return f"CPU {self.cpu:.0f}%，RSS {self.rss / 2**20:.0f} MB"
+
+    def format_stats(self):
+        stats = self.stats
+        degraded = stats["degraded_seconds"]
+        if self._degraded_since is not None:
+            degraded += time.monotonic() - self._degraded_since
+        return (f"资源预算: CPU 超限 {stats['cpu_breaches']} 次，RSS 超限 {stats['rss_breaches']} 次，"
+                f"省资源模式 {degraded:.0f} 秒，峰值 CPU {stats['peak_cpu']:.0f}% / "
+                f"RSS {stats['peak_rss'] / 2**20:.0f} MB")
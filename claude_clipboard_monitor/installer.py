@@ -5,78 +5,152 @@ Claude Code 配置安装器
 
 import json
 import os
+import time
 from pathlib import Path
 
+from .storage import atomic_write_bytes, file_lock
 
-def install_claude_code_config():
-    """安装和配置 Claude Code 设置"""
-    print("🔧 配置 Claude Code...")
-    
-    # 创建必要的目录
-    claude_dir = Path.home() / ".claude"
-    screenshot_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
-    
-    # 创建目录
-    claude_dir.mkdir(exist_ok=True)
-    screenshot_dir.mkdir(parents=True, exist_ok=True)
-    print(f"✅ 目录已创建: {screenshot_dir}")
-    
-    # 配置文件路径
-    settings_file = claude_dir / "settings.json"
-    
-    # 读取或创建配置文件
-    if settings_file.exists():
-        try:
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            print("⚠️  配置文件格式错误，重新创建")
-            settings = {}
-    else:
-        settings = {}
-        print("✅ 创建 Claude Code 配置文件")
+
+# 必要的目录列表
+REQUIRED_DIRS = ["~/.claude", "~/.neurora/claude-code"]
+
+# 上次确认配置正确时 settings.json 的 stat 签名，用于启动时快速跳过
+STATE_FILE = Path.home() / ".neurora" / "claude-code" / ".settings_state.json"
+
+# 读取到半截文件或写入冲突时的重试次数
+MAX_ATTEMPTS = 5
+
+
+def _settings_signature(settings_file):
+    """settings.json 的 stat 签名；文件不存在时返回 None"""
+    try:
+        st = settings_file.stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def _is_up_to_date(settings_file):
+    """快速路径：settings.json 自上次确认后未被修改"""
+    signature = _settings_signature(settings_file)
+    if signature is None:
+        return False
+    try:
+        state = json.loads(STATE_FILE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    return state == {"settings": str(settings_file), "signature": signature}
+
+
+def _save_state(settings_file):
+    try:
+        state = {"settings": str(settings_file), "signature": _settings_signature(settings_file)}
+        atomic_write_bytes(STATE_FILE, json.dumps(state).encode('utf-8'))
+    except OSError:
+        pass
+
+
+def _apply_required_settings(settings):
+    """补全必要的配置项，返回是否有修改"""
+    updated = False
     
     # 确保必要的键存在
     if "permissions" not in settings:
         settings["permissions"] = {}
         print("✅ 创建 permissions 配置")
+        updated = True
     
     if "additionalDirectories" not in settings["permissions"]:
         settings["permissions"]["additionalDirectories"] = []
         print("✅ 创建 additionalDirectories 配置")
-    
-    # 必要的目录列表
-    required_dirs = ["~/.claude", "~/.neurora/claude-code"]
+        updated = True
     
     # 添加缺失的目录
     additional_dirs = settings["permissions"]["additionalDirectories"]
-    updated = False
-    
-    for dir_path in required_dirs:
+    for dir_path in REQUIRED_DIRS:
         if dir_path not in additional_dirs:
             additional_dirs.append(dir_path)
             print(f"✅ 添加目录: {dir_path}")
             updated = True
     
-    # 如果有更新，保存配置文件
-    if updated or not settings_file.exists():
-        try:
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=2, ensure_ascii=False)
-            print("✅ Claude Code 配置已保存")
-        except Exception as e:
-            print(f"❌ 保存配置失败: {e}")
-            return False
-    else:
+    return updated
+
+
+def install_claude_code_config(force=False):
+    """安装和配置 Claude Code 设置
+
+    settings.json 自上次确认后未变化时直接返回（仅一次 stat 和一次小文件读取）；
+    需要修改时持有文件锁，重新读取后原子替换，避免与 Claude Code
+    或其他监听器实例并发写入时损坏配置。
+    """
+    # 配置文件路径
+    claude_dir = Path.home() / ".claude"
+    screenshot_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
+    # settings.json 可能是指向 dotfiles 仓库的符号链接：原子替换链接本身会把它变成普通文件，
+    # 因此先解析出真实路径，锁和写入都针对链接目标
+    settings_file = Path(os.path.realpath(claude_dir / "settings.json"))
+    
+    if not force and screenshot_dir.is_dir() and _is_up_to_date(settings_file):
         print("✅ Claude Code 配置已是最新")
+        return True
+    
+    print("🔧 配置 Claude Code...")
+    
+    # 创建目录
+    claude_dir.mkdir(exist_ok=True)
+    settings_file.parent.mkdir(parents=True, exist_ok=True)
+    screenshot_dir.mkdir(parents=True, exist_ok=True)
+    print(f"✅ 目录已创建: {screenshot_dir}")
+    
+    with file_lock(settings_file.with_name(f".{settings_file.name}.lock")):
+        for attempt in range(MAX_ATTEMPTS):
+            last_attempt = attempt == MAX_ATTEMPTS - 1
+            signature = _settings_signature(settings_file)
+            
+            # 读取或创建配置文件
+            if signature is not None:
+                try:
+                    with open(settings_file, 'r', encoding='utf-8') as f:
+                        settings = json.load(f)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    if not last_attempt:
+                        # 可能读到了其他程序写了一半的文件，稍后重试
+                        time.sleep(0.05)
+                        continue
+                    print("⚠️  配置文件格式错误，重新创建")
+                    settings = {}
+            else:
+                settings = {}
+                print("✅ 创建 Claude Code 配置文件")
+            
+            updated = _apply_required_settings(settings)
+            
+            # 如果有更新，保存配置文件
+            if updated or signature is None:
+                # 读取之后文件又被修改：重新读取合并，避免覆盖别人的改动
+                if _settings_signature(settings_file) != signature and not last_attempt:
+                    continue
+                try:
+                    mode = settings_file.stat().st_mode & 0o777 if signature else None
+                    data = json.dumps(settings, indent=2, ensure_ascii=False).encode('utf-8')
+                    atomic_write_bytes(settings_file, data, fsync=True, mode=mode)
+                    print("✅ Claude Code 配置已保存")
+                except Exception as e:
+                    print(f"❌ 保存配置失败: {e}")
+                    return False
+            else:
+                print("✅ Claude Code 配置已是最新")
+            
+            _save_state(settings_file)
+            return True
     
-    return True
+    return False
 
 
 def main():
     """命令行入口点"""
     try:
-        success = install_claude_code_config()
+        success = install_claude_code_config(force=True)
         if success:
             print("\n🎉 配置完成！")
             print("现在可以启动剪切板监听器了:")
@@ -9,50 +9,104 @@ import sys
 import time
 import hashlib
 import platform
+from io import BytesIO
 from datetime import datetime, timedelta
 from pathlib import Path
-import psutil
 
 try:
-    from PIL import Image, ImageGrab
-    import pyperclip
+    from PIL import Image
 except ImportError:
     print("请安装依赖: pip install pillow pyperclip psutil")
     sys.exit(1)
 
+from .power import PowerState
+from .backends import get_backends
+from .storage import (
+    atomic_save_image, save_png, ingest_file, filter_image_files, file_list_hash,
+    stored_file_time, save_text, text_md5, text_exceeds,
+)
+from .archive import open_archive
+from .ring import CaptureRing
+from .governor import ResourceGovernor
+from .recompress import BackgroundRecompressor, FAST_COMPRESS_LEVEL
+from .clipboard import image_md5
+from .coalescer import CaptureCoalescer, format_path_references
+from .terminal import TerminalSink
+from .scheduler import (
+    Scheduler, POLL_INTERVAL, IDLE_POLL_INTERVAL, PROCESS_CHECK_INTERVAL, CLEANUP_INTERVAL,
+    STATS_INTERVAL,
+)
+
 class ClipboardMonitor:
-    def __init__(self, tmp_dir=None, cleanup_hours=24):
+    def __init__(self, tmp_dir=None, cleanup_hours=24, fsync=False, coalesce_ms=0,
+                 max_size=None, recompress=False, archive_hours=None, archive_engine="tar",
+                 cpu_budget=None, rss_budget_mb=None, text_threshold_kb=None, terminal=False,
+                 ring_mb=None, backends=None, clock=None):
         # 默认使用 ~/.neurora/claude-code/screenshots 目录
         if tmp_dir is None:
             tmp_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
         
         self.tmp_dir = Path(tmp_dir)
         self.cleanup_hours = cleanup_hours
+        self.fsync = fsync
+        self.max_size = max_size
+        
+        # 两阶段保存：快速写盘后在低优先级进程池中重新压缩
+        self.recompressor = BackgroundRecompressor() if recompress else None
+        
+        # 分层存储：超过 archive_hours 的截图移入 pack 归档，而不是直接删除
+        self.archive_hours = archive_hours
+        self.archive = open_archive(Path(tmp_dir) / "archive", fsync=fsync,
+                                    engine=archive_engine) if archive_hours else None
+        
+        # 自身资源预算：超出时暂停后台重新压缩并改用最快的编码参数
+        self.governor = ResourceGovernor(cpu_budget, rss_budget_mb) \
+            if cpu_budget or rss_budget_mb else None
+        
+        # 超过阈值的剪切板文本保存为文件，交付 @路径 引用而不是原文
+        self.text_threshold = text_threshold_kb * 1024 if text_threshold_kb else None
+        # 上次读取文本时的剪切板变化计数
+        self.text_change_count = None
         self.last_clipboard_hash = None
         self.running = False
+        self.claude_running = False
+        
+        # 周期任务按单调时钟调度（测试和基准时可注入虚拟时钟）
+        self.scheduler = Scheduler(clock)
+        
+        # 最近截图的内存环形缓冲区：claude-clipboard-ring 可直接重新交付，同样的图片不重复保存
+        self.ring = CaptureRing.create(ring_mb) if ring_mb else None
+        
+        # 剪切板、进程、窗口和输入注入的平台实现（测试和基准时可替换为内存实现）
+        self.backends = backends or get_backends()
+        
+        # 会话锁定/空闲/休眠时暂停，使用电池时降低轮询频率
+        self.power = PowerState()
+        
+        # 连拍截图合并：窗口期内的多张图片一次性替换到剪切板
+        self.coalescer = CaptureCoalescer(coalesce_ms, clock=self.scheduler.now)
+        
+        # 终端直接交付：路径引用直接输入到 Claude Code 的终端，失败时回退到剪切板
+        self.terminal_sink = TerminalSink(self.backends) if terminal else None
+        
+        # 复用的 PNG 编码缓冲区（仅 ImageGrab 回退路径计算哈希时使用）
+        self._png_buffer = BytesIO()
         
         # 创建临时目录
         self.tmp_dir.mkdir(parents=True, exist_ok=True)
     
     def is_claude_code_running(self):
         """检测 Claude Code 是否在运行"""
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                name = proc.info.get('name', '')
-                cmdline = proc.info.get('cmdline', [])
-                # 检查进程名或命令行中是否包含 claude
-                if (name and 'claude' in name.lower()) or \
-                   (cmdline and any('claude' in str(cmd).lower() for cmd in cmdline)):
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return False
+        return self.backends.processes.is_claude_running()
+    
+    def check_claude(self):
+        """刷新 Claude Code 运行状态（由调度器按固定间隔执行，不在每次轮询时遍历进程）"""
+        self.claude_running = self.is_claude_code_running()
     
     def get_clipboard_image(self):
-        """获取剪切板中的图片"""
+        """获取剪切板中的图片（复制的文件返回文件路径列表）"""
         try:
-            # 使用 PIL 的 ImageGrab 跨平台获取剪切板图片
-            return ImageGrab.grabclipboard()
+            return self.backends.clipboard.read()
         except Exception:
             pass
         return None
@@ -60,40 +114,223 @@ class ClipboardMonitor:
     def get_clipboard_hash(self, image=None):
         """获取剪切板内容的哈希值"""
         try:
-            if image:
-                # 对图片数据计算哈希
-                from io import BytesIO
-                img_bytes = BytesIO()
-                image.save(img_bytes, format='PNG')
-                return hashlib.md5(img_bytes.getvalue()).hexdigest()
+            if isinstance(image, bytes):
+                # 剪切板原始 PNG 字节直接计算哈希
+                return hashlib.md5(image).hexdigest()
+            elif image:
+                # 对图片数据计算哈希（复用缓冲区，不复制编码结果）
+                return image_md5(image, self._png_buffer)
             else:
                 # 对文本内容计算哈希
-                text = pyperclip.paste()
-                return hashlib.md5(text.encode()).hexdigest()
+                text = self.backends.clipboard.read_text()
+                return text_md5(text)
         except Exception:
             return None
     
     def save_image(self, image):
         """保存图片到临时目录"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"clipboard_{timestamp}.png"
         filepath = self.tmp_dir / filename
         
-        image.save(filepath, "PNG")
+        # 启用后台重新压缩或超出资源预算时，使用最快的压缩级别写盘
+        degraded = self.governor is not None and self.governor.degraded
+        params = {"compress_level": FAST_COMPRESS_LEVEL} if self.recompressor or degraded else {}
+        if isinstance(image, bytes):
+            # PNG 字节原样写入，仅在启用缩放时解码
+            save_png(image, filepath, max_size=self.max_size, fsync=self.fsync, **params)
+        else:
+            atomic_save_image(image, filepath, "PNG", fsync=self.fsync, **params)
+        
+        if self.recompressor:
+            self.recompressor.submit(filepath)
         return filepath
     
+    def collect_recompressed(self):
+        """收集后台重新压缩的结果"""
+        if not self.recompressor:
+            return
+        for filepath, saved in self.recompressor.poll():
+            print(f"🗜️ 已重新压缩: {filepath.name}，节省 {saved / 1024:.0f} KB")
+    
+    def apply_budget(self):
+        """检查资源预算，在正常模式和省资源模式之间切换"""
+        if not self.governor or not self.governor.check():
+            return
+        if self.governor.degraded:
+            print(f"⚠️ 超出资源预算（{self.governor.describe()}），切换到省资源模式")
+        else:
+            print(f"✅ 资源占用已恢复（{self.governor.describe()}）")
+        if self.recompressor:
+            self.recompressor.set_concurrency(
+                0 if self.governor.degraded else self.recompressor.workers
+            )
+    
+    def print_stats(self):
+        """输出运行统计"""
+        if self.recompressor:
+            print(f"📊 {self.recompressor.format_stats()}")
+        if self.governor:
+            print(f"📊 {self.governor.format_stats()}")
+        if self.terminal_sink:
+            print(f"📊 {self.terminal_sink.format_stats()}")
+
+    def ingest_files(self, paths):
+        """零拷贝导入剪切板中复制的图片文件（不解码像素）"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        stored = []
+        for index, src in enumerate(filter_image_files(paths)):
+            filepath = self.tmp_dir / f"clipboard_{timestamp}_{index}{src.suffix.lower()}"
+            method = ingest_file(src, filepath, fsync=self.fsync)
+            print(f"📎 已导入文件 ({method}): {src}")
+            stored.append(filepath)
+        return stored
+    
     def cleanup_old_files(self):
-        """清理过期的临时文件"""
-        cutoff_time = datetime.now() - timedelta(hours=self.cleanup_hours)
+        """清理过期的文件；启用归档时改为移入 pack 归档"""
+        hours = self.archive_hours or self.cleanup_hours
+        cutoff_time = datetime.now() - timedelta(hours=hours)
         
-        for file_path in self.tmp_dir.glob("clipboard_*.png"):
+        aged = []
+        for file_path in self.tmp_dir.glob("clipboard_*"):
             try:
-                file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
+                file_time = datetime.fromtimestamp(stored_file_time(file_path.stat()))
                 if file_time < cutoff_time:
-                    file_path.unlink()
-                    print(f"已清理过期文件: {file_path}")
+                    aged.append(file_path)
             except Exception as e:
                 print(f"清理文件失败 {file_path}: {e}")
+        
+        if self.archive:
+            if aged:
+                try:
+                    count = self.archive.archive_files(aged)
+                    print(f"📦 已归档 {count} 个截图到 {self.archive.archive_dir}")
+                except Exception as e:
+                    print(f"归档失败: {e}")
+                    return
+        else:
+            for file_path in aged:
+                try:
+                    file_path.unlink()
+                    print(f"已清理过期文件: {file_path}")
+                except Exception as e:
+                    print(f"清理文件失败 {file_path}: {e}")
+    
+    def flush_pending(self):
+        """将待交付的图片一次性替换为剪切板中的路径引用"""
+        paths = self.coalescer.drain()
+        if not paths:
+            return
+        
+        if self.terminal_sink and self.terminal_sink.deliver(paths):
+            return
+        self.backends.clipboard.write_text(format_path_references(paths))
+        if len(paths) > 1:
+            print(f"📎 已合并 {len(paths)} 张图片的路径引用到剪切板")
+    
+    def recent_capture(self, image_hash):
+        """同样的图片仍在最近截图缓冲区中且文件还在时，返回已保存的文件路径"""
+        if self.ring is None:
+            return None
+        entry = self.ring.find(image_hash)
+        if entry is not None and entry.path and Path(entry.path).exists():
+            return Path(entry.path)
+        return None
+    
+    def record_capture(self, image, filepath):
+        """把已编码的截图写入最近截图缓冲区"""
+        if self.ring is not None and isinstance(image, bytes):
+            self.ring.add(image, filepath)
+    
+    def process_clipboard(self):
+        """检查一次剪切板，保存新出现的图片并加入待交付批次
+
+        图片数据只在本方法内存活，不会跨越轮询间隔的 sleep 常驻内存。
+        """
+        image = self.get_clipboard_image()
+        if isinstance(image, list):
+            # 复制的图片文件：按 stat 指纹去重，直接导入不解码
+            current_hash = file_list_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                for filepath in self.ingest_files(image):
+                    self.coalescer.add(filepath)
+                self.last_clipboard_hash = current_hash
+        elif image:
+            # 检查是否是新的内容（对图片数据计算哈希）
+            current_hash = self.get_clipboard_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                # 保存图片，加入待交付批次（从最近截图重新放回剪切板的图片复用原文件）
+                filepath = self.recent_capture(current_hash)
+                if filepath:
+                    print(f"♻️ 最近截图，复用已保存的文件: {filepath}")
+                else:
+                    filepath = self.save_image(image)
+                    self.record_capture(image, filepath)
+                    print(f"✅ 图片已保存: {filepath}")
+                self.coalescer.add(filepath)
+                self.last_clipboard_hash = current_hash
+        elif image is None and self.text_threshold:
+            self.process_text()
+    
+    def read_large_text(self):
+        """读取剪切板文本，未超过阈值时返回 None"""
+        try:
+            text = self.backends.clipboard.read_text()
+        except Exception:
+            return None
+        if not text or not text_exceeds(text, self.text_threshold):
+            return None
+        return text
+    
+    def process_text(self):
+        """超大文本写入文件，加入待交付批次；剪切板变化计数不变时不重新读取和哈希"""
+        change = self.backends.clipboard.change_count()
+        if change is not None and change == self.text_change_count:
+            return
+        self.text_change_count = change
+        text = self.read_large_text()
+        if text is None:
+            return
+        current_hash = text_md5(text)
+        if current_hash == self.last_clipboard_hash:
+            return
+        
+        # 按内容命名，同样的文本只保存一份
+        filepath, created = save_text(text, self.tmp_dir, fsync=self.fsync)
+        self.coalescer.add(filepath)
+        self.last_clipboard_hash = current_hash
+        
+        state = "已保存" if created else "已存在"
+        print(f"📝 大段文本{state}: {filepath}（{len(text)} 字符）")
+    
+    def poll(self):
+        """轮询一次剪切板，交付合并窗口已结束的批次"""
+        if not self.claude_running:
+            return
+        
+        # 检查剪切板是否有图片
+        self.process_clipboard()
+        self.collect_recompressed()
+        self.apply_budget()
+        
+        # 合并窗口结束后，替换剪切板内容为格式化的文件路径
+        if self.coalescer.ready():
+            self.flush_pending()
+    
+    def poll_interval(self):
+        """当前轮询间隔：Claude Code 未运行或使用电池时降低频率"""
+        interval = POLL_INTERVAL if self.claude_running else IDLE_POLL_INTERVAL
+        return self.power.poll_interval(interval)
+    
+    def schedule_tasks(self):
+        """注册周期任务（进程检测排在轮询之前，启动时先确定运行状态）"""
+        scheduler = self.scheduler
+        scheduler.every("process", lambda: self.power.poll_interval(PROCESS_CHECK_INTERVAL),
+                        self.check_claude)
+        scheduler.every("poll", self.poll_interval, self.poll)
+        scheduler.every("cleanup", CLEANUP_INTERVAL, self.cleanup_old_files,
+                        delay=CLEANUP_INTERVAL)
+        scheduler.every("stats", STATS_INTERVAL, self.print_stats, delay=STATS_INTERVAL)
     
     def run(self):
         """运行监听器"""
@@ -103,44 +340,32 @@ class ClipboardMonitor:
         print("🛑 按 Ctrl+C 停止")
         
         self.running = True
-        cleanup_counter = 0
+        self.power.start()
+        self.schedule_tasks()
         
         while self.running:
             try:
-                # 每100次循环清理一次文件
-                cleanup_counter += 1
-                if cleanup_counter >= 100:
-                    self.cleanup_old_files()
-                    cleanup_counter = 0
-                
-                # 检查 Claude Code 是否运行
-                if not self.is_claude_code_running():
-                    time.sleep(2)
-                    continue
-                
-                # 检查剪切板是否有图片
-                image = self.get_clipboard_image()
-                if image:
-                    # 检查是否是新的内容（对图片数据计算哈希）
-                    current_hash = self.get_clipboard_hash(image)
-                    if current_hash != self.last_clipboard_hash:
-                        # 保存图片
-                        filepath = self.save_image(image)
-                        
-                        # 替换剪切板内容为格式化的文件路径
-                        formatted_path = f" @{filepath} "
-                        pyperclip.copy(formatted_path)
-                        self.last_clipboard_hash = current_hash
-                        
-                        print(f"✅ 图片已保存: {filepath}")
+                # 会话锁定、空闲或休眠期间阻塞等待，不轮询也不计时
+                if self.power.paused:
+                    print(f"💤 {self.power.describe()}，暂停监听")
+                    self.power.wait_active()
+                    print("▶️ 会话已恢复，继续监听")
                 
-                time.sleep(0.5)
+                # 执行到期的任务，然后睡到下一个截止时间
+                self.scheduler.run_pending()
+                if self.running:
+                    self.scheduler.wait()
                 
             except KeyboardInterrupt:
                 print("\n🛑 正在停止监听器...")
                 self.running = False
             except Exception as e:
                 print(f"❌ 错误: {e}")
-                time.sleep(1)
         
+        # 退出前交付尚未替换的图片
+        self.flush_pending()
+        if self.recompressor:
+            self.recompressor.shutdown()
+        self.print_stats()
+        self.power.stop()
         print("👋 监听器已停止")
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+粘贴快捷键监听器
+基于输入事件检测 Ctrl+V / Cmd+V：按键之间线程完全阻塞，没有任何轮询唤醒。
+
+- Linux: 通过 evdev 直接读取键盘设备（需要 /dev/input 读权限，通常加入 input 组）
+- 其他平台或 evdev 不可用时: 使用 keyboard 库的 add_hotkey 回调
+"""
+
+import os
+import time
+import platform
+import selectors
+import threading
+
+
+# 所有键盘都被拔出后重新扫描设备的间隔（秒）
+RESCAN_INTERVAL = 2
+
+
+class EvdevPasteListener:
+    """Linux evdev 粘贴监听器"""
+
+    def __init__(self, callback):
+        import evdev
+        from evdev import ecodes
+
+        self.callback = callback
+        self.evdev = evdev
+        self.ecodes = ecodes
+        self.ctrl_keys = {ecodes.KEY_LEFTCTRL, ecodes.KEY_RIGHTCTRL}
+        self.devices = self._scan_devices()
+
+        if not self.devices:
+            raise RuntimeError("未找到可读取的键盘设备（需要 /dev/input 读权限）")
+
+        self.ctrl_pressed = set()
+        self.thread = None
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
+    def _scan_devices(self):
+        """打开所有带 Ctrl 和 V 键的输入设备"""
+        ecodes = self.ecodes
+        devices = []
+        for path in self.evdev.list_devices():
+            try:
+                device = self.evdev.InputDevice(path)
+                keys = device.capabilities().get(ecodes.EV_KEY, [])
+            except OSError:
+                continue
+            if ecodes.KEY_V in keys and ecodes.KEY_LEFTCTRL in keys:
+                devices.append(device)
+            else:
+                device.close()
+        return devices
+
+    def _drop_device(self, selector, device):
+        """移除已失效的设备；否则 select 会一直报告它可读，线程空转"""
+        selector.unregister(device.fd)
+        try:
+            device.close()
+        except OSError:
+            pass
+        self.devices.remove(device)
+        self.ctrl_pressed = {key for key in self.ctrl_pressed if key[0] != device.path}
+
+    def _handle_event(self, device, event):
+        """处理单个按键事件；只在 V 键按下（非自动重复）时触发一次"""
+        ecodes = self.ecodes
+        if event.type != ecodes.EV_KEY:
+            return
+        # value: 0 松开, 1 按下, 2 自动重复
+        if event.code in self.ctrl_keys:
+            key = (device.path, event.code)
+            if event.value:
+                self.ctrl_pressed.add(key)
+            else:
+                self.ctrl_pressed.discard(key)
+        elif event.code == ecodes.KEY_V and event.value == 1 and self.ctrl_pressed:
+            self.callback()
+
+    def _listen(self):
+        selector = selectors.DefaultSelector()
+        for device in self.devices:
+            selector.register(device.fd, selectors.EVENT_READ, device)
+        selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+        try:
+            while True:
+                # 键盘全部被拔出时定期重新扫描，等待重新插入
+                ready = selector.select(None if self.devices else RESCAN_INTERVAL)
+                if not self.devices:
+                    for device in self._scan_devices():
+                        selector.register(device.fd, selectors.EVENT_READ, device)
+                        self.devices.append(device)
+                for key, _ in ready:
+                    device = key.data
+                    if device is None:
+                        return
+                    try:
+                        for event in device.read():
+                            self._handle_event(device, event)
+                    except BlockingIOError:
+                        # 暂时无数据
+                        continue
+                    except OSError:
+                        # 设备被拔出（ENODEV）等
+                        self._drop_device(selector, device)
+        finally:
+            selector.close()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._listen, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        os.write(self._wakeup_w, b"x")
+        if self.thread:
+            self.thread.join(timeout=1)
+        for device in self.devices:
+            device.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+
+class HotkeyPasteListener:
+    """keyboard 库热键回调监听器"""
+
+    def __init__(self, callback):
+        import keyboard
+
+        self.keyboard = keyboard
+        self.callback = callback
+        self.hotkey = "command+v" if platform.system() == "Darwin" else "ctrl+v"
+        self.handle = None
+
+    def start(self):
+        # trigger_on_release: 长按时只触发一次
+        self.handle = self.keyboard.add_hotkey(
+            self.hotkey, self.callback, trigger_on_release=True
+        )
+
+    def stop(self):
+        if self.handle is not None:
+            self.keyboard.remove_hotkey(self.handle)
+            self.handle = None
+
+
+def create_paste_listener(callback):
+    """按平台选择可用的事件驱动粘贴监听器，均不可用时返回 None"""
+    if platform.system() == "Linux":
+        try:
+            return EvdevPasteListener(callback)
+        except Exception:
+            pass
+
+    try:
+        return HotkeyPasteListener(callback)
+    except Exception:
+        return None
+
+
+def test_paste_listener(timeout=2.0):
+    """通过 uinput 虚拟键盘测试粘贴监听（Linux，需要 /dev/uinput 写权限）"""
+    try:
+        from evdev import UInput, ecodes
+    except ImportError:
+        print("❌ 需要 evdev: pip install evdev")
+        return False
+
+    detected = threading.Event()
+    timestamps = {}
+
+    def on_paste():
+        timestamps['detected'] = time.perf_counter()
+        detected.set()
+
+    # 先创建虚拟键盘，监听器启动时才能枚举到它
+    virtual = UInput({ecodes.EV_KEY: [ecodes.KEY_LEFTCTRL, ecodes.KEY_V]},
+                     name="claude-clipboard-virtual-keyboard")
+    try:
+        time.sleep(0.5)  # 等待 udev 创建设备节点
+        listener = EvdevPasteListener(on_paste)
+        listener.start()
+        try:
+            timestamps['sent'] = time.perf_counter()
+            for code, value in [(ecodes.KEY_LEFTCTRL, 1), (ecodes.KEY_V, 1),
+                                (ecodes.KEY_V, 0), (ecodes.KEY_LEFTCTRL, 0)]:
+                virtual.write(ecodes.EV_KEY, code, value)
+                virtual.syn()
+
+            if detected.wait(timeout):
+                latency = (timestamps['detected'] - timestamps['sent']) * 1000
+                print(f"✅ 检测到粘贴，延迟 {latency:.1f} ms")
+                return True
+            print("❌ 未检测到粘贴事件")
+            return False
+        finally:
+            listener.stop()
+    finally:
+        virtual.close()
@@ -0,0 +1,163 @@
+"""
+会话与电源状态感知
+通过 D-Bus 订阅 logind（锁屏、空闲、休眠）和 UPower（是否使用电池）的状态变化：
+会话锁定、空闲或即将休眠时监听循环完全阻塞，不再轮询；使用电池时切换到低频轮询。
+
+使用 gdbus 命令行工具（glib 自带）监听信号，不需要额外的 Python 依赖；
+gdbus 不可用或没有系统总线时（非 Linux、容器等）视为始终处于活动状态。
+"""
+
+import os
+import re
+import shutil
+import platform
+import threading
+import subprocess
+
+
+LOGIND = "org.freedesktop.login1"
+UPOWER = "org.freedesktop.UPower"
+
+# 使用电池时的轮询间隔倍数
+BATTERY_INTERVAL_FACTOR = 4
+
+_BOOL_PROPERTY = re.compile(r"'(LockedHint|IdleHint|OnBattery)': <(true|false)>")
+_PREPARE_FOR_SLEEP = re.compile(r"PrepareForSleep \((true|false),\)")
+_OBJECT_PATH = re.compile(r"objectpath '([^']+)'")
+
+
+class PowerState:
+    """logind / UPower 状态订阅
+
+    wait_active() 在会话锁定、空闲或休眠期间阻塞，恢复活动后立即返回；
+    poll_interval() 根据是否使用电池返回实际轮询间隔。
+    address 为 None 时连接系统总线，测试时可指向独立启动的 dbus-daemon。
+    """
+
+    def __init__(self, address=None):
+        self.address = address
+        self.locked = False
+        self.idle = False
+        self.sleeping = False
+        self.on_battery = False
+        self.session_path = None
+        self.processes = []
+        self._active = threading.Event()
+        self._active.set()
+        self._lock = threading.Lock()
+
+    def _bus_args(self):
+        return ["--address", self.address] if self.address else ["--system"]
+
+    def _call(self, dest, path, method, *args):
+        """同步调用 D-Bus 方法，失败时返回 None"""
+        command = ["gdbus", "call", *self._bus_args(), "--dest", dest,
+                   "--object-path", path, "--method", method, *args]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout if result.returncode == 0 else None
+
+    def _get_bool(self, dest, path, interface, name):
+        output = self._call(dest, path, "org.freedesktop.DBus.Properties.Get", interface, name)
+        return output is not None and "true" in output
+
+    def _update(self, **changes):
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            paused = self.locked or self.idle or self.sleeping
+        if paused:
+            self._active.clear()
+        else:
+            self._active.set()
+
+    def _handle_line(self, line):
+        """解析 gdbus monitor 输出的一行信号"""
+        sleep = _PREPARE_FOR_SLEEP.search(line)
+        if sleep:
+            self._update(sleeping=sleep.group(1) == "true")
+            return
+
+        path = line.split(":", 1)[0]
+        changes = {}
+        for name, value in _BOOL_PROPERTY.findall(line):
+            if name == "OnBattery":
+                changes["on_battery"] = value == "true"
+            elif self.session_path is None or path == self.session_path:
+                # 只关心当前进程所在的会话
+                changes["locked" if name == "LockedHint" else "idle"] = value == "true"
+        if changes:
+            self._update(**changes)
+
+    def _watch(self, dest):
+        try:
+            process = subprocess.Popen(
+                ["gdbus", "monitor", *self._bus_args(), "--dest", dest],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+        except OSError:
+            return
+        self.processes.append(process)
+
+        def read():
+            for line in process.stdout:
+                self._handle_line(line)
+
+        threading.Thread(target=read, daemon=True).start()
+
+    def start(self):
+        """读取初始状态并开始订阅，返回是否成功连接到总线"""
+        if platform.system() != "Linux" or not shutil.which("gdbus"):
+            return False
+
+        # 先订阅再读取初始状态，避免错过两者之间发生的变化
+        self._watch(LOGIND)
+        self._watch(UPOWER)
+
+        output = self._call(LOGIND, "/org/freedesktop/login1",
+                            "org.freedesktop.login1.Manager.GetSessionByPID", str(os.getpid()))
+        match = _OBJECT_PATH.search(output or "")
+        if match:
+            self.session_path = match.group(1)
+            session = "org.freedesktop.login1.Session"
+            self._update(
+                locked=self._get_bool(LOGIND, self.session_path, session, "LockedHint"),
+                idle=self._get_bool(LOGIND, self.session_path, session, "IdleHint"),
+            )
+        self._update(on_battery=self._get_bool(
+            UPOWER, "/org/freedesktop/UPower", UPOWER, "OnBattery"
+        ))
+        return match is not None
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        self._active.set()
+
+    @property
+    def paused(self):
+        return not self._active.is_set()
+
+    def describe(self):
+        if self.sleeping:
+            return "系统休眠"
+        if self.locked:
+            return "会话已锁定"
+        if self.idle:
+            return "会话空闲"
+        return "使用电池" if self.on_battery else "活动"
+
+    def wait_active(self, timeout=None):
+        """阻塞直到会话恢复活动；返回是否处于活动状态"""
+        return self._active.wait(timeout)
+
+    def poll_interval(self, interval):
+        """根据电源状态返回实际轮询间隔"""
+        return interval * BATTERY_INTERVAL_FACTOR if self.on_battery else interval
@@ -0,0 +1,152 @@
+"""
+采样分析器
+长时间运行时排查 CPU 占用：按进程 CPU 时间定时（ITIMER_PROF / SIGPROF）采样所有线程的调用栈，
+开销只与采样频率有关，空闲时几乎没有采样。
+
+输出格式由文件扩展名决定:
+  .prof / .pstats  cProfile 兼容的统计数据，可用 python -m pstats 或 snakeviz 查看
+  其他             折叠栈（每行 "线程;文件:函数;... 次数"），可直接交给 flamegraph.pl / speedscope
+
+运行中发送 SIGUSR2 可暂停/恢复采样，暂停时立即写出一次当前结果。
+"""
+
+import sys
+import signal
+import marshal
+import threading
+import contextlib
+from collections import Counter
+
+from .storage import atomic_write_bytes
+
+
+# 默认采样间隔（秒，按进程 CPU 时间计）
+DEFAULT_INTERVAL = 0.01
+
+
+class SamplingProfiler:
+    """基于 SIGPROF 的采样分析器（仅 POSIX）"""
+
+    def __init__(self, output, interval=DEFAULT_INTERVAL):
+        self.output = output
+        self.interval = interval
+        self.samples = Counter()
+        self.enabled = False
+        self._thread_names = {}
+
+    @staticmethod
+    def available():
+        return hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+    def _thread_name(self, ident):
+        name = self._thread_names.get(ident)
+        if name is None:
+            self._thread_names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._thread_names.get(ident, str(ident))
+        return name
+
+    def _sample(self, signum, frame):
+        """SIGPROF 处理函数：记录每个线程当前的调用栈（从根到叶）"""
+        main_ident = threading.main_thread().ident
+        for ident, thread_frame in sys._current_frames().items():
+            if ident == main_ident:
+                # 主线程当前正在执行本处理函数，使用被中断的帧
+                thread_frame = frame
+            stack = []
+            while thread_frame is not None:
+                code = thread_frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                thread_frame = thread_frame.f_back
+            if stack:
+                stack.append(self._thread_name(ident))
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+
+    def _toggle(self, signum, frame):
+        if self.enabled:
+            self.stop()
+            self.write()
+            print(f"⏸️ 采样已暂停，结果已写入 {self.output}")
+        else:
+            self.start()
+            print("⏺️ 采样已恢复")
+
+    def start(self):
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.enabled = True
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_IGN)
+        self.enabled = False
+
+    def install_toggle(self):
+        """注册 SIGUSR2：暂停/恢复采样"""
+        signal.signal(signal.SIGUSR2, self._toggle)
+
+    def collapsed(self):
+        """折叠栈格式"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            thread, frames = stack[0], stack[1:]
+            names = [thread] + [f"{filename}:{name}" for filename, _, name in frames]
+            lines.append(f"{';'.join(names)} {count}\n")
+        return "".join(lines).encode("utf-8")
+
+    def pstats(self):
+        """cProfile 兼容的统计数据（pstats.Stats 可直接加载的 marshal 字典）
+
+        调用次数为函数出现在栈中的样本数，耗时为样本数乘以采样间隔；
+        递归出现的函数在同一个样本中只计一次。
+        """
+        stats = {}
+        for stack, count in self.samples.items():
+            frames = stack[1:]
+            elapsed = count * self.interval
+            seen = set()
+            for index, key in enumerate(frames):
+                entry = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+                is_leaf = index == len(frames) - 1
+                if key not in seen:
+                    seen.add(key)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += elapsed
+                if is_leaf:
+                    entry[2] += elapsed
+                if index:
+                    caller = frames[index - 1]
+                    nc, cc, tt, ct = entry[4].get(caller, (0, 0, 0.0, 0.0))
+                    entry[4][caller] = (nc + count, cc + count,
+                                        tt + (elapsed if is_leaf else 0.0), ct + elapsed)
+        return marshal.dumps({key: tuple(value) for key, value in stats.items()})
+
+    def write(self):
+        suffix = str(self.output).rsplit(".", 1)[-1].lower()
+        data = self.pstats() if suffix in ("prof", "pstats") else self.collapsed()
+        atomic_write_bytes(self.output, data)
+
+
+@contextlib.contextmanager
+def profiling(output, interval=DEFAULT_INTERVAL):
+    """在 with 块内运行采样分析器，退出时写出结果；output 为 None 时不做任何事"""
+    if not output:
+        yield None
+        return
+    if not SamplingProfiler.available():
+        print("⚠️ 当前平台不支持 SIGPROF 采样，--profile 被忽略")
+        yield None
+        return
+
+    profiler = SamplingProfiler(output, interval)
+    profiler.install_toggle()
+    profiler.start()
+    print(f"🔬 采样分析已启用（kill -USR2 暂停/恢复），退出时写入 {output}")
+    try:
+        yield profiler
+    finally:
+        if profiler.enabled:
+            profiler.stop()
+        profiler.write()
+        print(f"🔬 采样结果已写入 {output}（{sum(profiler.samples.values())} 个样本）")
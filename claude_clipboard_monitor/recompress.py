@@ -0,0 +1,137 @@
+"""
+后台重新压缩
+截图先以最快速度写盘（低压缩级别或剪切板原始字节），Claude Code 可以立即读取；
+之后在低优先级的进程池中用最高压缩级别重新编码，结果更小时原子替换原文件。
+"""
+
+import os
+from io import BytesIO
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .storage import atomic_write_bytes
+
+
+# 启用后台重新压缩时，首次保存使用的 PNG 压缩级别：编码最快，体积稍大
+FAST_COMPRESS_LEVEL = 1
+
+
+def _lower_priority():
+    """进程池初始化：将工作进程降到最低的 CPU 和 IO 优先级"""
+    try:
+        import psutil
+        process = psutil.Process()
+        if hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+            process.ionice(psutil.IOPRIO_CLASS_IDLE)
+        if hasattr(psutil, "IDLE_PRIORITY_CLASS"):
+            process.nice(psutil.IDLE_PRIORITY_CLASS)
+    except Exception:
+        pass
+    if hasattr(os, "nice"):
+        try:
+            os.nice(19)
+        except OSError:
+            pass
+
+
+def recompress_png(filepath):
+    """用最高压缩级别重新编码 PNG，结果更小时原子替换
+
+    返回 (原始字节数, 新字节数)；文件不是 PNG、编码期间被清理或替换、
+    或结果没有变小时，两者相等。保留原文件的 mtime 和权限，不影响过期清理。
+    """
+    from PIL import Image
+
+    try:
+        before = os.stat(filepath)
+        buffer = BytesIO()
+        with Image.open(filepath) as image:
+            if image.format != "PNG":
+                return before.st_size, before.st_size
+            image.save(buffer, format="PNG", optimize=True, compress_level=9)
+
+        current = os.stat(filepath)
+        if (buffer.tell() >= before.st_size
+                or (current.st_ino, current.st_mtime_ns) != (before.st_ino, before.st_mtime_ns)):
+            return before.st_size, before.st_size
+
+        atomic_write_bytes(filepath, buffer.getbuffer(), mode=before.st_mode & 0o777)
+        os.utime(filepath, ns=(before.st_atime_ns, before.st_mtime_ns))
+        return before.st_size, buffer.tell()
+    except FileNotFoundError:
+        return 0, 0
+
+
+class BackgroundRecompressor:
+    """低优先级进程池中的重新压缩队列
+
+    submit() 只提交任务不等待；主循环定期调用 poll() 收集已完成的结果并更新统计。
+    同时进行的任务数受 concurrency 限制，超出的文件在队列中等待；
+    concurrency 为 0 时暂停提交新任务（资源超出预算时使用）。
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.concurrency = workers
+        self.executor = None
+        self.queue = deque()
+        self.pending = []
+        self.stats = {"recompressed": 0, "bytes_before": 0, "bytes_saved": 0}
+
+    def submit(self, filepath):
+        """将已保存的 PNG 加入重新压缩队列"""
+        self.queue.append(filepath)
+        self._dispatch()
+
+    def set_concurrency(self, concurrency):
+        """调整同时进行的任务数（不超过进程池大小）"""
+        self.concurrency = max(0, min(concurrency, self.workers))
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.queue and len(self.pending) < self.concurrency:
+            if self.executor is None:
+                # 首次使用时才创建进程池
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_lower_priority
+                )
+            filepath = self.queue.popleft()
+            self.pending.append((filepath, self.executor.submit(recompress_png, str(filepath))))
+
+    def poll(self):
+        """收集已完成的任务，返回 [(文件路径, 节省字节数), ...]"""
+        finished = []
+        still_pending = []
+        for filepath, future in self.pending:
+            if not future.done():
+                still_pending.append((filepath, future))
+                continue
+            try:
+                before, after = future.result()
+            except Exception:
+                continue
+            if after < before:
+                self.stats["recompressed"] += 1
+                self.stats["bytes_before"] += before
+                self.stats["bytes_saved"] += before - after
+                finished.append((filepath, before - after))
+        self.pending = still_pending
+        self._dispatch()
+        return finished
+
+    def shutdown(self):
+        """停止进程池，丢弃尚未开始的任务（文件保持首次保存的版本）"""
+        if self.executor is not None:
+            for _, future in self.pending:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.queue.clear()
+        self.poll()
+        self.pending = []
+
+    def format_stats(self):
+        stats = self.stats
+        ratio = stats["bytes_saved"] / stats["bytes_before"] * 100 if stats["bytes_before"] else 0
+        return (f"重新压缩 {stats['recompressed']} 张图片，"
+                f"节省 {stats['bytes_saved'] / 1024:.0f} KB ({ratio:.0f}%)")
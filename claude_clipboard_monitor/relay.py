@@ -0,0 +1,522 @@
+"""
+远程开发机中继
+Claude Code 运行在 SSH 远端、截图在本地剪切板时使用：
+
+- 远端运行 serve：在 Unix socket（或仅监听本机的 TCP 端口）上接收图片，写入同一个截图目录
+- 本地运行 client：监听剪切板，把新截图上传到经 SSH 转发的 socket，
+  再把远端返回的 @path 引用放入本地剪切板，粘贴到 SSH 终端即可
+
+  ssh -L /tmp/claude-relay.sock:/home/me/.neurora/claude-code/relay.sock devbox
+  claude-clipboard-relay client --connect /tmp/claude-relay.sock
+
+协议（大端）:
+  请求   REQUEST 结构: 魔数, MD5, 编码, 原始大小, 扩展名长度 + 扩展名
+  应答   RESPONSE 结构: 状态, 数据长度 + 数据（路径或错误信息）
+  服务端已有相同内容时直接应答 EXISTS，不传输数据；否则应答 READY，
+  客户端按块发送压缩数据（每块 4 字节长度前缀，长度 0 表示结束），服务端流式解压写盘。
+"""
+
+import os
+import re
+import sys
+import time
+import struct
+import socket
+import hashlib
+import threading
+import socketserver
+import zlib
+from pathlib import Path
+
+from .storage import atomic_write, stored_file_time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+RELAY_MAGIC = b"CCR1"
+
+# 魔数, MD5, 编码, 原始大小, 扩展名长度
+REQUEST = struct.Struct(">4s16sBQB")
+# 状态, 数据长度
+RESPONSE = struct.Struct(">BI")
+CHUNK_HEADER = struct.Struct(">I")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+STATUS_EXISTS = 0
+STATUS_READY = 1
+STATUS_STORED = 2
+STATUS_ERROR = 3
+
+# 上传分块大小，以及服务端接受的单块和单个文件上限
+CHUNK_SIZE = 256 * 1024
+MAX_CHUNK = 8 * 1024 * 1024
+MAX_UPLOAD = 256 * 1024 * 1024
+
+DEFAULT_SOCKET = Path.home() / ".neurora" / "claude-code" / "relay.sock"
+
+_SUFFIX = re.compile(r"^\.[a-z0-9]{1,5}$")
+
+
+def default_codec():
+    """有 zstandard 时使用 zstd，否则回退到 zlib"""
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compressor(codec):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(1)
+    return None
+
+
+class _OutputLimitReached(Exception):
+    pass
+
+
+class _ZstdDecompressor:
+    """与 zlib 解压对象相同的 decompress(data, max_length) 接口
+
+    zstandard 的 decompressobj() 不支持 max_length，这里通过 stream_writer 分段取得输出，
+    达到上限后立即停止解压，单个数据块无法在内存中展开成超过声明大小的数据。
+    """
+
+    def __init__(self):
+        self._output = bytearray()
+        self._limit = 0
+        self._writer = zstandard.ZstdDecompressor().stream_writer(self)
+
+    def write(self, data):
+        self._output += data
+        if len(self._output) >= self._limit:
+            raise _OutputLimitReached()
+        return len(data)
+
+    def decompress(self, data, max_length):
+        self._output = bytearray()
+        self._limit = max_length
+        try:
+            self._writer.write(data)
+        except _OutputLimitReached:
+            pass
+        return bytes(self._output[:max_length])
+
+
+def _decompressor(codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("服务端未安装 zstandard")
+        return _ZstdDecompressor()
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    if codec == CODEC_NONE:
+        return None
+    raise ValueError(f"未知的编码: {codec}")
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _send_response(sock, status, payload=b""):
+    sock.sendall(RESPONSE.pack(status, len(payload)) + payload)
+
+
+def _recv_response(sock):
+    status, size = RESPONSE.unpack(_recv_exact(sock, RESPONSE.size))
+    return status, _recv_exact(sock, size).decode("utf-8")
+
+
+def parse_address(address):
+    """解析地址: "host:port" 或纯端口为 TCP，其余视为 Unix socket 路径"""
+    address = str(address)
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[5:]
+    if address.isdigit():
+        return socket.AF_INET, ("127.0.0.1", int(address))
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+class _RelayHandler(socketserver.BaseRequestHandler):
+    """一个连接上可以连续发送多张图片"""
+
+    def handle(self):
+        while True:
+            try:
+                header = self.request.recv(REQUEST.size, socket.MSG_WAITALL)
+            except OSError:
+                return
+            if len(header) < REQUEST.size:
+                return
+            try:
+                self.server.relay.handle_request(self.request, header)
+            except (ConnectionError, OSError):
+                return
+
+
+class RelayServer:
+    """远端中继服务：接收上传并写入截图目录"""
+
+    def __init__(self, tmp_dir=None, fsync=False, cleanup_hours=24):
+        # 默认使用 ~/.neurora/claude-code/screenshots 目录
+        if tmp_dir is None:
+            tmp_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
+
+        self.tmp_dir = Path(tmp_dir)
+        self.fsync = fsync
+        self.cleanup_hours = cleanup_hours
+        self.server = None
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"stored": 0, "deduplicated": 0, "errors": 0,
+                      "wire_bytes": 0, "stored_bytes": 0}
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    def target_path(self, digest, suffix):
+        """按内容命名，同样的图片只保存一份"""
+        return self.tmp_dir / f"clipboard_{digest.hex()[:16]}{suffix}"
+
+    def handle_request(self, sock, header):
+        magic, digest, codec, size, suffix_len = REQUEST.unpack(header)
+        suffix = _recv_exact(sock, suffix_len).decode("ascii", "replace") if suffix_len else ""
+        if magic != RELAY_MAGIC or not _SUFFIX.match(suffix) or size > MAX_UPLOAD:
+            _send_response(sock, STATUS_ERROR, "无效的请求".encode("utf-8"))
+            raise ConnectionError("无效的请求")
+
+        filepath = self.target_path(digest, suffix)
+        if filepath.exists():
+            # 已有相同内容：刷新 mtime，推迟过期清理
+            os.utime(filepath)
+            self._count(deduplicated=1)
+            _send_response(sock, STATUS_EXISTS, str(filepath).encode("utf-8"))
+            return
+
+        try:
+            decompressor = _decompressor(codec)
+        except ValueError as e:
+            _send_response(sock, STATUS_ERROR, str(e).encode("utf-8"))
+            return
+        _send_response(sock, STATUS_READY)
+
+        received = {"wire": 0, "raw": 0}
+        hasher = hashlib.md5()
+
+        def write_chunks(f):
+            while True:
+                (length,) = CHUNK_HEADER.unpack(_recv_exact(sock, CHUNK_HEADER.size))
+                if length == 0:
+                    return
+                if length > MAX_CHUNK:
+                    raise ConnectionError("数据块过大")
+                data = _recv_exact(sock, length)
+                received["wire"] += length
+                if decompressor is not None:
+                    # 最多只解压到刚好超过声明大小，压缩炸弹不会在内存中完整展开
+                    data = decompressor.decompress(data, size - received["raw"] + 1)
+                received["raw"] += len(data)
+                if received["raw"] > size:
+                    raise ValueError("数据超过声明的大小")
+                hasher.update(data)
+                f.write(data)
+
+        def write_verified(f):
+            write_chunks(f)
+            # 校验失败时 atomic_write 会删除临时文件，目录中不会出现错误内容
+            if received["raw"] != size or hasher.digest() != digest:
+                raise ValueError("数据校验失败")
+
+        try:
+            atomic_write(filepath, write_verified, fsync=self.fsync)
+        except ConnectionError:
+            self._count(errors=1)
+            raise
+        except Exception as e:
+            # 校验或解压失败；剩余的数据块已无法同步，应答后关闭连接
+            self._count(errors=1)
+            _send_response(sock, STATUS_ERROR, str(e).encode("utf-8"))
+            raise ConnectionError(str(e))
+
+        self._count(stored=1, wire_bytes=received["wire"], stored_bytes=received["raw"])
+        _send_response(sock, STATUS_STORED, str(filepath).encode("utf-8"))
+        print(f"📥 已接收: {filepath.name}（{size / 1024:.0f} KB，传输 {received['wire'] / 1024:.0f} KB）")
+
+    def cleanup_old_files(self):
+        """清理过期的文件"""
+        cutoff = time.time() - self.cleanup_hours * 3600
+        for file_path in self.tmp_dir.glob("clipboard_*"):
+            try:
+                if stored_file_time(file_path.stat()) < cutoff:
+                    file_path.unlink()
+                    print(f"已清理过期文件: {file_path}")
+            except Exception as e:
+                print(f"清理文件失败 {file_path}: {e}")
+
+    def bind(self, address):
+        """创建监听 socket（Unix socket 权限为 0600，TCP 默认只监听 127.0.0.1）"""
+        family, target = parse_address(address)
+        relay = self
+
+        if family == socket.AF_UNIX:
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.unlink(target)
+            except FileNotFoundError:
+                pass
+            base = socketserver.ThreadingUnixStreamServer
+        else:
+            base = socketserver.ThreadingTCPServer
+
+        class Server(base):
+            daemon_threads = True
+            allow_reuse_address = True
+
+            def service_actions(self):
+                # 每小时清理一次过期文件
+                now = time.monotonic()
+                if now - relay._last_cleanup >= 3600:
+                    relay._last_cleanup = now
+                    relay.cleanup_old_files()
+
+        old_umask = os.umask(0o177) if family == socket.AF_UNIX else None
+        try:
+            self.server = Server(target, _RelayHandler)
+        finally:
+            if old_umask is not None:
+                os.umask(old_umask)
+        self.server.relay = self
+        return self.server
+
+    def serve_forever(self, address):
+        server = self.bind(address)
+        print("🚀 Claude Code 剪切板中继已启动")
+        print(f"🔌 监听地址: {address}")
+        print(f"📁 文件保存目录: {self.tmp_dir.absolute()}")
+        print("🛑 按 Ctrl+C 停止")
+        try:
+            server.serve_forever(poll_interval=1.0)
+        except KeyboardInterrupt:
+            print("\n🛑 正在停止中继...")
+        finally:
+            self.close()
+        print(f"📊 {self.format_stats()}")
+
+    def close(self):
+        if self.server is not None:
+            self.server.server_close()
+            if self.server.address_family == socket.AF_UNIX:
+                try:
+                    os.unlink(self.server.server_address)
+                except OSError:
+                    pass
+            self.server = None
+
+    def format_stats(self):
+        stats = self.stats
+        return (f"中继: 接收 {stats['stored']} 张，去重 {stats['deduplicated']} 张，失败 {stats['errors']} 次，"
+                f"传输 {stats['wire_bytes'] / 2**20:.1f} MB / 写入 {stats['stored_bytes'] / 2**20:.1f} MB")
+
+
+class RelayClient:
+    """本地中继客户端：保持一个连接，按需上传"""
+
+    def __init__(self, address, codec=None):
+        self.address = address
+        self.codec = CODECS[codec or default_codec()]
+        if self.codec == CODEC_ZSTD and zstandard is None:
+            raise RuntimeError("zstd 编码需要: pip install zstandard")
+        self.sock = None
+        self.stats = {"uploaded": 0, "deduplicated": 0, "raw_bytes": 0, "wire_bytes": 0}
+
+    def connect(self):
+        family, target = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(target)
+        except OSError:
+            sock.close()
+            raise
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _send(self, data, suffix):
+        digest = hashlib.md5(data).digest()
+        suffix_bytes = suffix.encode("ascii")
+        self.sock.sendall(REQUEST.pack(RELAY_MAGIC, digest, self.codec, len(data),
+                                       len(suffix_bytes)) + suffix_bytes)
+        status, message = _recv_response(self.sock)
+        if status == STATUS_EXISTS:
+            self.stats["deduplicated"] += 1
+            return message
+        if status != STATUS_READY:
+            raise RuntimeError(f"中继拒绝上传: {message}")
+
+        compressor = _compressor(self.codec)
+        view = memoryview(data)
+        wire = 0
+        for start in range(0, len(data), CHUNK_SIZE):
+            chunk = view[start:start + CHUNK_SIZE]
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            self.sock.sendall(CHUNK_HEADER.pack(len(chunk)) + chunk)
+            wire += len(chunk)
+        if compressor is not None:
+            tail = compressor.flush()
+            if tail:
+                self.sock.sendall(CHUNK_HEADER.pack(len(tail)) + tail)
+                wire += len(tail)
+        self.sock.sendall(CHUNK_HEADER.pack(0))
+
+        status, message = _recv_response(self.sock)
+        if status != STATUS_STORED:
+            self.close()
+            raise RuntimeError(f"上传失败: {message}")
+        self.stats["uploaded"] += 1
+        self.stats["raw_bytes"] += len(data)
+        self.stats["wire_bytes"] += wire
+        return message
+
+    def send(self, data, suffix=".png"):
+        """上传一张图片，返回远端文件路径；连接断开时重连一次"""
+        for attempt in range(2):
+            if self.sock is None:
+                self.connect()
+            try:
+                return self._send(data, suffix)
+            except (ConnectionError, BrokenPipeError, socket.timeout):
+                self.close()
+                if attempt:
+                    raise
+
+    def watch(self, backends=None, interval=0.5):
+        """监听本地剪切板，上传新截图并把远端 @path 引用放入剪切板"""
+        from .backends import get_backends
+        from .coalescer import format_path_references
+        from .storage import filter_image_files, file_list_hash
+
+        backends = backends or get_backends()
+        last_hash = None
+        print("🚀 Claude Code 剪切板中继客户端已启动")
+        print(f"🔌 中继地址: {self.address}（编码: {[k for k, v in CODECS.items() if v == self.codec][0]}）")
+        print("🛑 按 Ctrl+C 停止")
+        while True:
+            try:
+                content = backends.clipboard.read()
+                if isinstance(content, list):
+                    current_hash = file_list_hash(content)
+                    items = [(p.read_bytes(), p.suffix.lower()) for p in filter_image_files(content)]
+                elif content:
+                    current_hash = hashlib.md5(content).hexdigest()
+                    items = [(content, ".png")]
+                else:
+                    current_hash, items = None, []
+
+                if items and current_hash != last_hash:
+                    start = time.perf_counter()
+                    paths = [self.send(data, suffix) for data, suffix in items]
+                    backends.clipboard.write_text(format_path_references(paths))
+                    # 路径已放入剪切板后才记录；上传失败时下一次轮询会重试
+                    last_hash = current_hash
+                    elapsed = (time.perf_counter() - start) * 1000
+                    print(f"📤 已上传 {len(paths)} 张图片 ({elapsed:.0f} ms)，剪切板已替换为远端路径")
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                print("\n🛑 正在停止客户端...")
+                break
+            except (OSError, RuntimeError) as e:
+                print(f"❌ 中继错误: {e}")
+                self.close()
+                time.sleep(2)
+        self.close()
+        print(f"📊 {self.format_stats()}")
+
+    def format_stats(self):
+        stats = self.stats
+        ratio = stats["wire_bytes"] / stats["raw_bytes"] if stats["raw_bytes"] else 1.0
+        return (f"中继客户端: 上传 {stats['uploaded']} 张，远端已有 {stats['deduplicated']} 张，"
+                f"原始 {stats['raw_bytes'] / 2**20:.1f} MB，传输 {stats['wire_bytes'] / 2**20:.1f} MB"
+                f"（{ratio:.0%}）")
+
+
+def main():
+    """命令行入口点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude Code 剪切板中继（远程开发机）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="在远端接收截图")
+    serve.add_argument("--listen", default=str(DEFAULT_SOCKET),
+                       help=f"Unix socket 路径或 [host:]port（默认 {DEFAULT_SOCKET}）")
+    serve.add_argument("--tmp-dir", type=str, help="截图目录（默认: ~/.neurora/claude-code/screenshots）")
+    serve.add_argument("--cleanup-hours", type=int, default=24, help="文件清理时间（小时，默认24）")
+    serve.add_argument("--fsync", action="store_true", help="保存图片后执行 fsync")
+
+    client = subparsers.add_parser("client", help="在本地监听剪切板并上传")
+    client.add_argument("--connect", required=True, help="转发到本地的 Unix socket 路径或 [host:]port")
+    client.add_argument("--codec", choices=list(CODECS), help=f"传输编码（默认 {default_codec()}）")
+    client.add_argument("--interval", type=float, default=0.5, help="轮询间隔（秒，默认0.5）")
+
+    send = subparsers.add_parser("send", help="上传指定文件并输出远端 @path 引用")
+    send.add_argument("files", nargs="+", help="图片文件")
+    send.add_argument("--connect", required=True, help="转发到本地的 Unix socket 路径或 [host:]port")
+    send.add_argument("--codec", choices=list(CODECS), help=f"传输编码（默认 {default_codec()}）")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        RelayServer(args.tmp_dir, fsync=args.fsync,
+                    cleanup_hours=args.cleanup_hours).serve_forever(args.listen)
+        return 0
+
+    try:
+        relay = RelayClient(args.connect, codec=args.codec)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    if args.command == "client":
+        relay.watch(interval=args.interval)
+        return 0
+
+    from .coalescer import format_path_references
+    try:
+        paths = [relay.send(Path(f).read_bytes(), Path(f).suffix.lower()) for f in args.files]
+    except (OSError, RuntimeError) as e:
+        print(f"❌ 上传失败: {e}")
+        return 1
+    finally:
+        relay.close()
+    print(format_path_references(paths).strip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
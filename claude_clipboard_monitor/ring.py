@@ -0,0 +1,276 @@
+"""
+最近截图环形缓冲区
+监听器把最近的截图（已编码的 PNG 字节）写入一块共享内存映射，
+另一个进程（命令行或桌面快捷键）可以直接从内存取出第 k 张重新交付，不读盘也不重新编码。
+
+布局（大端，单写多读）:
+  HEADER        魔数, 版本, 槽位数, 数据区容量, 已写入总字节数, 已写入条目数, 代数
+  SLOT × 槽位数  序号, 数据逻辑偏移, 长度, 时间, 类型, MD5, 路径长度, 文件路径
+  数据区         按逻辑偏移对容量取模循环写入，条目可以跨越末尾
+
+数据区按字节数限制：新条目覆盖最旧的数据，被覆盖的条目自动失效。
+写入前后各递增一次代数（写入期间为奇数），读者发现代数变化时重试。
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+from pathlib import Path
+
+
+RING_MAGIC = b"CCMRING\0"
+RING_VERSION = 2
+
+# 魔数, 版本, 槽位数, 容量, 已写入总字节数, 已写入条目数, 代数
+HEADER = struct.Struct(">8sIIQQQQ")
+# 序号, 逻辑偏移, 长度, 时间, 类型, MD5, 路径字节数, 文件路径（UTF-8，0 填充）
+# 路径按完整字节数保存，不截断：超过 PATH_BYTES（PATH_MAX）的路径不记录
+PATH_BYTES = 4096
+SLOT = struct.Struct(f">QQIdB16sH{PATH_BYTES}s")
+
+KIND_PNG = 1
+
+DEFAULT_SLOTS = 64
+DEFAULT_RING_MB = 64
+
+# 读者遇到并发写入时的最大重试次数
+READ_RETRIES = 100
+
+
+def default_ring_path():
+    """优先放在 /dev/shm（内存文件系统），否则放在临时目录"""
+    name = f"claude_clipboard_ring_{os.getuid() if hasattr(os, 'getuid') else 'user'}"
+    shm = Path("/dev/shm")
+    return (shm if shm.is_dir() else Path(tempfile.gettempdir())) / name
+
+
+class RingEntry:
+    """环形缓冲区中的一条截图记录"""
+
+    __slots__ = ("seq", "offset", "size", "time", "kind", "digest", "path")
+
+    def __init__(self, seq, offset, size, time, kind, digest, path):
+        self.seq = seq
+        self.offset = offset
+        self.size = size
+        self.time = time
+        self.kind = kind
+        self.digest = digest
+        self.path = path
+
+    @classmethod
+    def unpack_from(cls, buffer, offset):
+        seq, offset, size, created, kind, digest, length, path = SLOT.unpack_from(buffer, offset)
+        return cls(seq, offset, size, created, kind, digest.hex(), path[:length].decode("utf-8"))
+
+
+class CaptureRing:
+    """截图环形缓冲区（共享内存映射）"""
+
+    def __init__(self, mapped, path):
+        self.map = mapped
+        self.path = path
+        _, _, self.slots, self.capacity, _, _, _ = HEADER.unpack_from(mapped, 0)
+        self.data_start = HEADER.size + self.slots * SLOT.size
+
+    @classmethod
+    def create(cls, capacity_mb=DEFAULT_RING_MB, path=None, slots=DEFAULT_SLOTS):
+        """创建（或复用容量相同的已有）缓冲区，供监听器写入"""
+        path = Path(path or default_ring_path())
+        capacity = int(capacity_mb * 1024 * 1024)
+        total = HEADER.size + slots * SLOT.size + capacity
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            reuse = os.fstat(fd).st_size == total
+            if not reuse:
+                os.ftruncate(fd, total)
+            mapped = mmap.mmap(fd, total)
+        finally:
+            os.close(fd)
+
+        header = HEADER.unpack_from(mapped, 0)
+        # 代数为奇数说明上一个写入者在 add() 中途退出：最旧的截图可能已被部分覆盖，
+        # 而 head 尚未前移，这些条目仍显示为有效，只能一并清空
+        if not reuse or header[:4] != (RING_MAGIC, RING_VERSION, slots, capacity) or header[6] % 2:
+            # 新建、布局不同或写入中断：清空槽位表，保留的历史截图失效
+            mapped[:HEADER.size + slots * SLOT.size] = bytes(HEADER.size + slots * SLOT.size)
+            HEADER.pack_into(mapped, 0, RING_MAGIC, RING_VERSION, slots, capacity, 0, 0, 0)
+        return cls(mapped, path)
+
+    @classmethod
+    def attach(cls, path=None):
+        """以只读方式打开监听器创建的缓冲区；不存在时返回 None"""
+        path = Path(path or default_ring_path())
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if HEADER.unpack_from(mapped, 0)[:2] != (RING_MAGIC, RING_VERSION):
+            mapped.close()
+            return None
+        return cls(mapped, path)
+
+    def close(self):
+        self.map.close()
+
+    def _header(self):
+        return HEADER.unpack_from(self.map, 0)
+
+    def _set_counters(self, head, seq, generation):
+        struct.pack_into(">QQQ", self.map, HEADER.size - 24, head, seq, generation)
+
+    def _copy_in(self, position, data):
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        base = self.data_start
+        self.map[base + start:base + start + first] = data[:first]
+        if first < len(data):
+            self.map[base:base + len(data) - first] = data[first:]
+
+    def _copy_out(self, position, size):
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        base = self.data_start
+        data = self.map[base + start:base + start + first]
+        if first < size:
+            data += self.map[base:base + size - first]
+        return data
+
+    def add(self, data, path="", kind=KIND_PNG):
+        """写入一张截图，超过整个数据区容量时忽略并返回 False
+
+        路径超过 PATH_BYTES 时不记录（截断可能切开多字节字符，得到一个不存在的路径），
+        该截图只能恢复图片。
+        """
+        if len(data) > self.capacity:
+            return False
+        path_bytes = str(path).encode("utf-8")
+        if len(path_bytes) > PATH_BYTES:
+            path_bytes = b""
+        _, _, _, _, head, seq, generation = self._header()
+        self._set_counters(head, seq, generation + 1)
+
+        seq += 1
+        self._copy_in(head, data)
+        SLOT.pack_into(self.map, HEADER.size + (seq % self.slots) * SLOT.size,
+                       seq, head, len(data), time.time(), kind,
+                       hashlib.md5(data).digest(), len(path_bytes), path_bytes)
+        self._set_counters(head + len(data), seq, generation + 2)
+        return True
+
+    def _snapshot(self):
+        """读取一致的 (代数, 条目列表)；条目按从新到旧排列，只包含未被覆盖的"""
+        for _ in range(READ_RETRIES):
+            _, _, _, _, head, seq, generation = self._header()
+            if generation % 2:
+                time.sleep(0.001)
+                continue
+            entries = []
+            for current in range(seq, max(seq - self.slots, 0), -1):
+                entry = RingEntry.unpack_from(
+                    self.map, HEADER.size + (current % self.slots) * SLOT.size
+                )
+                if entry.seq != current or entry.offset < head - self.capacity:
+                    break
+                entries.append(entry)
+            if self._header()[6] == generation:
+                return generation, entries
+        raise RuntimeError("环形缓冲区持续被写入，读取失败")
+
+    def entries(self):
+        """最近的截图，从新到旧"""
+        return self._snapshot()[1]
+
+    def get(self, index):
+        """取出第 index 张（0 为最新），返回 (条目, 数据)；不存在时返回 None"""
+        for _ in range(READ_RETRIES):
+            generation, entries = self._snapshot()
+            if index >= len(entries):
+                return None
+            entry = entries[index]
+            data = self._copy_out(entry.offset, entry.size)
+            if self._header()[6] == generation:
+                return entry, data
+        raise RuntimeError("环形缓冲区持续被写入，读取失败")
+
+    def find(self, digest):
+        """按 MD5 查找仍在缓冲区中的截图"""
+        for entry in self.entries():
+            if entry.digest == digest:
+                return entry
+        return None
+
+
+def main():
+    """命令行入口点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude Code 最近截图（内存环形缓冲区）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="列出缓冲区中的截图（0 为最新）")
+
+    paste = subparsers.add_parser("paste", help="把第 k 张截图重新放入剪切板")
+    paste.add_argument("index", type=int, nargs="?", default=0,
+                       help="第几张（0 为最新，默认0）")
+    paste.add_argument("--path", action="store_true", help="放入 @path 引用而不是图片")
+    paste.add_argument("--terminal", action="store_true",
+                       help="直接把 @path 引用输入到 Claude Code 的终端")
+
+    args = parser.parse_args()
+
+    ring = CaptureRing.attach()
+    if ring is None:
+        print("❌ 未找到截图缓冲区，请使用 --ring-mb 启动监听器")
+        return 1
+
+    try:
+        if args.command == "list":
+            entries = ring.entries()
+            for index, entry in enumerate(entries):
+                when = time.strftime("%H:%M:%S", time.localtime(entry.time))
+                print(f"{index:3d}  {when}  {entry.size / 1024:8.0f} KB  {entry.digest[:12]}  {entry.path}")
+            used = sum(entry.size for entry in entries)
+            print(f"🧠 共 {len(entries)} 张，{used / 2**20:.1f} / {ring.capacity / 2**20:.0f} MB")
+            return 0
+
+        found = ring.get(args.index)
+        if found is None:
+            print(f"❌ 缓冲区中没有第 {args.index} 张截图")
+            return 1
+        entry, data = found
+
+        from .backends import get_backends
+        backends = get_backends()
+        if args.path or args.terminal:
+            if not entry.path:
+                print("❌ 该截图没有记录文件路径（未保存为文件或路径过长），只能恢复图片")
+                return 1
+            if args.terminal:
+                from .terminal import TerminalSink
+                return 0 if TerminalSink(backends).deliver([entry.path]) else 1
+            from .coalescer import format_path_references
+            backends.clipboard.write_text(format_path_references([entry.path]))
+            print(f"📎 已放入路径引用: {entry.path}")
+        elif backends.clipboard.write_png(data):
+            print(f"📋 已放入剪切板: 第 {args.index} 张（{entry.size / 1024:.0f} KB）")
+        else:
+            print("❌ 无法写入剪切板")
+            return 1
+    except RuntimeError as e:
+        # 监听器持续写入或写入中断时读取不到一致的快照
+        print(f"❌ {e}")
+        return 1
+    finally:
+        ring.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+周期任务调度器
+监听循环中的剪切板轮询、进程检测、文件清理、窗口缓存刷新和统计输出都注册到同一个调度器，
+按单调时钟上的截止时间执行，而不是按循环次数计数；两次执行之间直接睡到最近的截止时间。
+
+时钟可以替换：SimulatedClock 的 sleep() 只推进虚拟时间，24 小时的运行几秒内即可跑完。
+"""
+
+import time
+import heapq
+import itertools
+
+
+# 剪切板轮询间隔（秒）
+POLL_INTERVAL = 0.5
+# Claude Code 未运行时的轮询间隔（秒）
+IDLE_POLL_INTERVAL = 2
+# 进程检测间隔（秒）：遍历进程表较重，不需要每次轮询都执行
+PROCESS_CHECK_INTERVAL = 2
+# 过期文件清理间隔（秒）
+CLEANUP_INTERVAL = 60
+# Claude Code 窗口缓存刷新间隔（秒）
+WINDOW_REFRESH_INTERVAL = 5
+# 运行统计输出间隔（秒）
+STATS_INTERVAL = 3600
+
+
+class SystemClock:
+    """真实的单调时钟"""
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class SimulatedClock:
+    """虚拟时钟：sleep() 立即返回，只推进虚拟时间"""
+
+    def __init__(self, start=0.0):
+        self.time = start
+        self.slept = 0.0
+
+    def now(self):
+        return self.time
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.time += seconds
+            self.slept += seconds
+
+
+class ScheduledTask:
+    """一个已注册的任务；interval 为 None 时只执行一次"""
+
+    __slots__ = ("name", "func", "interval", "deadline", "entry", "runs", "errors")
+
+    def __init__(self, name, func, interval, deadline):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.deadline = deadline
+        self.entry = None
+        self.runs = 0
+        self.errors = 0
+
+    def next_interval(self):
+        # 间隔可以是函数，每次执行后重新取值（例如随电源状态变化）
+        return self.interval() if callable(self.interval) else self.interval
+
+
+class Scheduler:
+    """基于最小堆的任务调度器
+
+    任务在执行前就排好下一次的截止时间，任务抛出的异常会继续传给调用方，
+    不会让任务从调度中消失。循环阻塞（休眠、暂停）后错过的多次执行合并为一次，
+    之后按原来的间隔继续，不会集中补跑。
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or SystemClock()
+        self.tasks = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self.wakeups = 0
+
+    def now(self):
+        return self.clock.now()
+
+    def _push(self, task, deadline):
+        task.deadline = deadline
+        task.entry = next(self._sequence)
+        heapq.heappush(self._heap, (deadline, task.entry, task))
+
+    def every(self, name, interval, func, delay=0.0):
+        """注册周期任务，delay 秒后首次执行；同名任务会被替换"""
+        self.cancel(name)
+        task = ScheduledTask(name, func, interval, 0.0)
+        self.tasks[name] = task
+        self._push(task, self.now() + delay)
+        return task
+
+    def after(self, name, delay, func):
+        """注册只执行一次的任务"""
+        return self.every(name, None, func, delay)
+
+    def cancel(self, name):
+        """取消任务；堆中的旧条目在弹出时丢弃"""
+        task = self.tasks.pop(name, None)
+        if task is not None:
+            task.entry = None
+
+    def trigger(self, name):
+        """让任务在下一次 run_pending() 时立即执行"""
+        task = self.tasks.get(name)
+        if task is not None:
+            self._push(task, self.now())
+
+    def _discard_stale(self):
+        while self._heap and self._heap[0][1] != self._heap[0][2].entry:
+            heapq.heappop(self._heap)
+
+    def time_until_next(self):
+        """距离最近的截止时间还有多少秒；没有任务时返回 None"""
+        self._discard_stale()
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - self.now(), 0.0)
+
+    def run_pending(self):
+        """执行所有已到期的任务，返回执行的任务数"""
+        now = self.now()
+        count = 0
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return count
+            deadline, _, task = heapq.heappop(self._heap)
+
+            interval = task.next_interval()
+            if interval is None:
+                self.tasks.pop(task.name, None)
+                task.entry = None
+            else:
+                # 按截止时间而不是执行完成时间排下一次，错过的执行合并为一次
+                deadline += interval
+                self._push(task, deadline if deadline > now else now + interval)
+
+            task.runs += 1
+            count += 1
+            try:
+                task.func()
+            except Exception:
+                task.errors += 1
+                raise
+
+    def wait(self, timeout=None):
+        """睡到最近的截止时间（最多 timeout 秒）"""
+        delay = self.time_until_next()
+        if timeout is not None:
+            delay = timeout if delay is None else min(delay, timeout)
+        if delay is None:
+            raise RuntimeError("没有已注册的任务，wait() 会永久阻塞")
+        self.wakeups += 1
+        self.clock.sleep(delay)
+
+    def format_stats(self):
+        """各任务的执行次数"""
+        parts = []
+        for task in sorted(self.tasks.values(), key=lambda task: -task.runs):
+            errors = f"（失败 {task.errors}）" if task.errors else ""
+            parts.append(f"{task.name} {task.runs}{errors}")
+        return f"调度: 唤醒 {self.wakeups} 次，" + "，".join(parts)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Claude Code 剪切板选择服务（X11）
+监听器自己持有 CLIPBOARD 选择，同时提供图片和文本两类目标：
+- 图片应用请求 image/png 时拿到原始 PNG 字节，剪切板行为与截图工具完全一致
+- 终端（Claude Code）请求文本时拿到 " @path " 引用，此时才把图片写入文件
+
+剪切板变化通过 XFixes 事件通知，不轮询；图片不被当作文本粘贴就不写盘。
+"""
+
+import sys
+import time
+import select
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .clipboard import TEXT_TARGETS
+from .storage import atomic_write_bytes, stored_file_time
+from .scheduler import Scheduler
+
+
+IMAGE_TARGET = "image/png"
+URI_TARGETS = ("text/uri-list",)
+
+# 从其他程序读取选择内容的超时时间（秒）
+FETCH_TIMEOUT = 2.0
+
+# 过期文件清理间隔（秒）：选择服务由事件驱动，不需要频繁唤醒
+CLEANUP_INTERVAL = 3600
+
+
+class SelectionClipboardMonitor:
+    """X11 剪切板选择服务"""
+
+    def __init__(self, tmp_dir=None, cleanup_hours=24, fsync=False, display_name=None):
+        try:
+            from Xlib import X, Xatom, display as xdisplay
+            from Xlib.ext import xfixes
+        except ImportError:
+            raise RuntimeError("选择服务模式需要: pip install python-xlib")
+
+        # 默认使用 ~/.neurora/claude-code/screenshots 目录
+        if tmp_dir is None:
+            tmp_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
+
+        self.tmp_dir = Path(tmp_dir)
+        self.cleanup_hours = cleanup_hours
+        self.fsync = fsync
+        self.running = False
+        self.scheduler = Scheduler()
+        self.X = X
+        self.Xatom = Xatom
+
+        self.display = xdisplay.Display(display_name)
+        if not self.display.has_extension("XFIXES"):
+            raise RuntimeError("X 服务器不支持 XFIXES 扩展")
+        self.display.xfixes_query_version()
+
+        screen = self.display.screen()
+        self.window = screen.root.create_window(
+            0, 0, 1, 1, 0, screen.root_depth, event_mask=X.PropertyChangeMask
+        )
+
+        atom = self.display.intern_atom
+        self.clipboard_atom = atom("CLIPBOARD")
+        self.targets_atom = atom("TARGETS")
+        self.timestamp_atom = atom("TIMESTAMP")
+        self.incr_atom = atom("INCR")
+        self.transfer_atom = atom("CLAUDE_CLIPBOARD_TRANSFER")
+        self.image_atom = atom(IMAGE_TARGET)
+        self.text_atoms = {atom(name): name for name in TEXT_TARGETS}
+        self.uri_atoms = {atom(name): name for name in URI_TARGETS}
+
+        # 单个属性一次最多写入的字节数，超出后使用 INCR 分段传输
+        self.chunk_size = min(256 * 1024, self.display.info.max_request_length * 4 - 1024)
+
+        # 当前持有的图片
+        self.png_data = None
+        self.png_hash = None
+        self.saved_path = None
+        self.owned_since = X.CurrentTime
+
+        # 进行中的 INCR 发送 {(requestor_id, property): [requestor, type, data, offset]}
+        self.incr_sends = {}
+
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.display.xfixes_select_selection_input(
+            self.window, self.clipboard_atom, xfixes.XFixesSetSelectionOwnerNotifyMask
+        )
+
+    # ---------- 读取其他程序的选择内容 ----------
+
+    def _wait_event(self, predicate, timeout):
+        """等待满足条件的事件；期间的其他事件照常分发"""
+        deadline = time.monotonic() + timeout
+        while True:
+            while self.display.pending_events():
+                event = self.display.next_event()
+                if predicate(event):
+                    return event
+                self.dispatch(event)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            select.select([self.display.fileno()], [], [], remaining)
+
+    def _read_property(self, delete=True):
+        prop = self.window.get_full_property(self.transfer_atom, self.X.AnyPropertyType)
+        if delete:
+            self.window.delete_property(self.transfer_atom)
+            self.display.flush()
+        return prop
+
+    def fetch_selection(self, target, timestamp):
+        """向当前所有者请求指定目标，支持 INCR 分段接收；失败返回 None"""
+        X = self.X
+        self.window.convert_selection(
+            self.clipboard_atom, target, self.transfer_atom, timestamp
+        )
+        self.display.flush()
+
+        event = self._wait_event(
+            lambda e: e.type == X.SelectionNotify and e.requestor.id == self.window.id,
+            FETCH_TIMEOUT,
+        )
+        if event is None or event.property == X.NONE:
+            return None
+
+        prop = self._read_property()
+        if prop is None:
+            return None
+        if prop.property_type != self.incr_atom:
+            return prop
+
+        # INCR：每删除一次属性，所有者写入下一段，空段表示结束
+        chunks = []
+        while True:
+            event = self._wait_event(
+                lambda e: (e.type == X.PropertyNotify and e.window.id == self.window.id
+                           and e.atom == self.transfer_atom
+                           and e.state == X.PropertyNewValue),
+                FETCH_TIMEOUT,
+            )
+            if event is None:
+                return None
+            chunk = self._read_property()
+            if chunk is None or not chunk.value:
+                break
+            chunks.append(bytes(chunk.value))
+        prop.value = b"".join(chunks)
+        return prop
+
+    def capture_owner(self, timestamp):
+        """剪切板所有者变化：如果新内容包含 PNG，读取后接管剪切板"""
+        targets = self.fetch_selection(self.targets_atom, timestamp)
+        if targets is None or self.image_atom not in list(targets.value):
+            return
+
+        prop = self.fetch_selection(self.image_atom, timestamp)
+        if prop is None or not prop.value:
+            return
+
+        data = bytes(prop.value)
+        image_hash = hashlib.md5(data).hexdigest()
+        if image_hash == self.png_hash:
+            # 剪切板管理器转存了我们提供的图片，不再反复抢占
+            return
+
+        self.png_data = data
+        self.png_hash = image_hash
+        self.saved_path = None
+        self.take_ownership(timestamp)
+        print(f"📋 已接管剪切板图片 (hash: {image_hash[:8]}..., {len(data) / 1024:.0f} KB)")
+
+    def take_ownership(self, timestamp):
+        self.window.set_selection_owner(self.clipboard_atom, timestamp)
+        self.display.flush()
+        owner = self.display.get_selection_owner(self.clipboard_atom)
+        if getattr(owner, "id", owner) != self.window.id:
+            print("⚠️ 接管剪切板失败")
+            self.png_data = None
+            return
+        self.owned_since = timestamp
+
+    # ---------- 为其他程序提供选择内容 ----------
+
+    def materialize(self):
+        """文本目标被请求时才把图片写入文件"""
+        if self.saved_path is None or not self.saved_path.exists():
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            filepath = self.tmp_dir / f"clipboard_{timestamp}.png"
+            atomic_write_bytes(filepath, self.png_data, fsync=self.fsync)
+            self.saved_path = filepath
+            print(f"💾 图片已保存: {filepath}")
+        return self.saved_path
+
+    def _convert(self, target):
+        """按目标类型转换内容，返回 (类型原子, 格式, 数据)；不支持返回 None"""
+        Xatom = self.Xatom
+        if target == self.targets_atom:
+            atoms = [self.targets_atom, self.timestamp_atom, self.image_atom]
+            atoms += list(self.text_atoms) + list(self.uri_atoms)
+            return Xatom.ATOM, 32, atoms
+        if target == self.timestamp_atom:
+            return Xatom.INTEGER, 32, [self.owned_since]
+        if target == self.image_atom:
+            return self.image_atom, 8, self.png_data
+        if target in self.text_atoms:
+            text = f" @{self.materialize()} "
+            print(f"🎯 文本粘贴，提供文件引用: {text.strip()}")
+            if self.text_atoms[target] == "STRING":
+                return Xatom.STRING, 8, text.encode("latin-1", "replace")
+            return target, 8, text.encode("utf-8")
+        if target in self.uri_atoms:
+            return target, 8, (self.materialize().as_uri() + "\r\n").encode()
+        return None
+
+    def handle_selection_request(self, event):
+        X = self.X
+        from Xlib.protocol import event as xevent
+
+        prop = event.property if event.property != X.NONE else event.target
+        converted = self._convert(event.target) if self.png_data else None
+
+        if converted is None:
+            prop = X.NONE
+        else:
+            prop_type, fmt, data = converted
+            requestor = event.requestor
+            if fmt == 8 and len(data) > self.chunk_size:
+                # 大图片使用 INCR：先告知总长度，对方每删除一次属性就发送下一段
+                requestor.change_attributes(event_mask=X.PropertyChangeMask)
+                requestor.change_property(prop, self.incr_atom, 32, [len(data)])
+                self.incr_sends[(requestor.id, prop)] = [requestor, prop_type, data, 0]
+            else:
+                requestor.change_property(prop, prop_type, fmt, data)
+
+        notify = xevent.SelectionNotify(
+            time=event.time, requestor=event.requestor, selection=event.selection,
+            target=event.target, property=prop,
+        )
+        event.requestor.send_event(notify)
+        self.display.flush()
+
+    def continue_incr_send(self, event):
+        key = (event.window.id, event.atom)
+        transfer = self.incr_sends.get(key)
+        if transfer is None:
+            return
+        requestor, prop_type, data, offset = transfer
+        chunk = data[offset:offset + self.chunk_size]
+        requestor.change_property(event.atom, prop_type, 8, chunk)
+        if chunk:
+            transfer[3] = offset + len(chunk)
+        else:
+            # 写入空段表示传输结束
+            del self.incr_sends[key]
+            # 同一窗口可能还有其他属性的传输在进行（例如同时请求了多个目标），
+            # 最后一个传输结束后才停止接收它的属性事件
+            if not any(window_id == requestor.id for window_id, _ in self.incr_sends):
+                requestor.change_attributes(event_mask=0)
+        self.display.flush()
+
+    # ---------- 事件循环 ----------
+
+    def dispatch(self, event):
+        X = self.X
+        if (event.type, getattr(event, "sub_code", None)) == \
+                self.display.extension_event.SetSelectionOwnerNotify:
+            owner = getattr(event.owner, "id", event.owner)
+            if owner not in (self.window.id, X.NONE):
+                self.capture_owner(event.selection_timestamp)
+        elif event.type == X.SelectionRequest:
+            self.handle_selection_request(event)
+        elif event.type == X.SelectionClear:
+            # 其他程序复制了新内容，接下来会收到 XFixes 通知
+            self.png_data = None
+        elif event.type == X.PropertyNotify and event.state == X.PropertyDelete:
+            self.continue_incr_send(event)
+
+    def cleanup_old_files(self):
+        """清理过期的文件"""
+        cutoff_time = datetime.now() - timedelta(hours=self.cleanup_hours)
+
+        for file_path in self.tmp_dir.glob("clipboard_*"):
+            try:
+                file_time = datetime.fromtimestamp(stored_file_time(file_path.stat()))
+                if file_time < cutoff_time:
+                    file_path.unlink()
+                    print(f"🧹 已清理过期文件: {file_path}")
+            except Exception as e:
+                print(f"清理文件失败 {file_path}: {e}")
+
+    def run(self):
+        """运行选择服务"""
+        print("🚀 Claude Code 剪切板选择服务已启动")
+        print(f"📁 文件保存目录: {self.tmp_dir.absolute()}")
+        print("💡 工作模式: 图片应用粘贴得到图片，终端粘贴得到 @path 引用")
+        print("🛑 按 Ctrl+C 停止")
+
+        self.running = True
+        self.scheduler.every("cleanup", CLEANUP_INTERVAL, self.cleanup_old_files)
+
+        while self.running:
+            try:
+                self.scheduler.run_pending()
+
+                # 没有事件时阻塞在 X 连接上直到下一个任务到期，不轮询
+                if not self.display.pending_events():
+                    select.select([self.display.fileno()], [], [],
+                                  self.scheduler.time_until_next())
+                while self.display.pending_events():
+                    self.dispatch(self.display.next_event())
+
+            except KeyboardInterrupt:
+                print("\n🛑 正在停止选择服务...")
+                self.running = False
+            except Exception as e:
+                print(f"❌ 错误: {e}")
+                time.sleep(1)
+
+        self.window.destroy()
+        self.display.close()
+        print("👋 选择服务已停止")
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude Code 剪切板选择服务（X11）")
+    parser.add_argument(
+        "--cleanup-hours",
+        type=int,
+        default=24,
+        help="文件清理时间（小时，默认24）"
+    )
+    parser.add_argument(
+        "--tmp-dir",
+        type=str,
+        help="自定义存储目录路径"
+    )
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="保存图片后执行 fsync（更安全但更慢，默认关闭）"
+    )
+    parser.add_argument(
+        "--display",
+        type=str,
+        help="X 显示（默认使用 $DISPLAY）"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        monitor = SelectionClipboardMonitor(
+            tmp_dir=args.tmp_dir,
+            cleanup_hours=args.cleanup_hours,
+            fsync=args.fsync,
+            display_name=args.display
+        )
+    except Exception as e:
+        print(f"❌ 启动失败: {e}")
+        return 1
+
+    monitor.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,52 +8,73 @@ import os
 import sys
 import time
 import hashlib
+from io import BytesIO
 from datetime import datetime, timedelta
 from pathlib import Path
-import psutil
 
 try:
-    from PIL import Image, ImageGrab
-    import pyperclip
+    from PIL import Image
 except ImportError:
     print("请安装依赖: pip install pillow pyperclip psutil")
     sys.exit(1)
 
+from .profiler import profiling
+from .power import PowerState
+from .backends import get_backends
+from .storage import (
+    atomic_save_image, save_png, ingest_file, filter_image_files, file_list_hash,
+    stored_file_time,
+)
+from .clipboard import image_md5
+from .scheduler import (
+    Scheduler, POLL_INTERVAL, IDLE_POLL_INTERVAL, PROCESS_CHECK_INTERVAL, CLEANUP_INTERVAL,
+)
+
 
 class SimpleClipboardMonitor:
     """简单剪切板监听器 - 只保存图片，不干扰剪切板"""
     
-    def __init__(self, tmp_dir=None, cleanup_hours=24):
+    def __init__(self, tmp_dir=None, cleanup_hours=24, fsync=False, max_size=None,
+                 backends=None, clock=None):
         # 默认使用 ~/.neurora/claude-code/screenshots 目录
         if tmp_dir is None:
             tmp_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
         
         self.tmp_dir = Path(tmp_dir)
         self.cleanup_hours = cleanup_hours
+        self.fsync = fsync
+        self.max_size = max_size
         self.last_clipboard_hash = None
         self.running = False
+        self.claude_running = False
+        
+        # 周期任务按单调时钟调度（测试和基准时可注入虚拟时钟）
+        self.scheduler = Scheduler(clock)
+        
+        # 剪切板、进程、窗口和输入注入的平台实现（测试和基准时可替换为内存实现）
+        self.backends = backends or get_backends()
+        
+        # 会话锁定/空闲/休眠时暂停，使用电池时降低轮询频率
+        self.power = PowerState()
+        
+        # 复用的 PNG 编码缓冲区（仅 ImageGrab 回退路径计算哈希时使用）
+        self._png_buffer = BytesIO()
         
         # 创建目录
         self.tmp_dir.mkdir(parents=True, exist_ok=True)
     
     def is_claude_code_running(self):
         """检测 Claude Code 是否在运行"""
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                name = proc.info.get('name', '')
-                cmdline = proc.info.get('cmdline', [])
-                # 检查进程名或命令行中是否包含 claude
-                if (name and 'claude' in name.lower()) or \
-                   (cmdline and any('claude' in str(cmd).lower() for cmd in cmdline)):
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return False
+        return self.backends.processes.is_claude_running()
+    
+    def check_claude(self):
+        """刷新 Claude Code 运行状态（由调度器按固定间隔执行，不在每次轮询时遍历进程）"""
+        self.claude_running = self.is_claude_code_running()
     
     def get_clipboard_image(self):
-        """获取剪切板中的图片"""
+        """获取剪切板中的图片（复制的文件返回文件路径列表）"""
         try:
-            return ImageGrab.grabclipboard()
+            return self.backends.clipboard.read()
         except Exception:
             pass
         return None
@@ -61,35 +82,95 @@ class SimpleClipboardMonitor:
     def get_clipboard_hash(self, image):
         """获取图片内容的哈希值"""
         try:
-            from io import BytesIO
-            img_bytes = BytesIO()
-            image.save(img_bytes, format='PNG')
-            return hashlib.md5(img_bytes.getvalue()).hexdigest()
+            if isinstance(image, bytes):
+                # 剪切板原始 PNG 字节直接计算哈希
+                return hashlib.md5(image).hexdigest()
+            # 复用缓冲区，不复制编码结果
+            return image_md5(image, self._png_buffer)
         except Exception:
             return None
     
     def save_image(self, image):
         """保存图片到目录"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"clipboard_{timestamp}.png"
         filepath = self.tmp_dir / filename
         
-        image.save(filepath, "PNG")
+        if isinstance(image, bytes):
+            # PNG 字节原样写入，仅在启用缩放时解码
+            save_png(image, filepath, max_size=self.max_size, fsync=self.fsync)
+        else:
+            atomic_save_image(image, filepath, "PNG", fsync=self.fsync)
         return filepath
+
+    def ingest_files(self, paths):
+        """零拷贝导入剪切板中复制的图片文件（不解码像素）"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        stored = []
+        for index, src in enumerate(filter_image_files(paths)):
+            filepath = self.tmp_dir / f"clipboard_{timestamp}_{index}{src.suffix.lower()}"
+            method = ingest_file(src, filepath, fsync=self.fsync)
+            print(f"📎 已导入文件 ({method}): {src}")
+            stored.append(filepath)
+        return stored
     
     def cleanup_old_files(self):
         """清理过期的文件"""
         cutoff_time = datetime.now() - timedelta(hours=self.cleanup_hours)
         
-        for file_path in self.tmp_dir.glob("clipboard_*.png"):
+        for file_path in self.tmp_dir.glob("clipboard_*"):
             try:
-                file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
+                file_time = datetime.fromtimestamp(stored_file_time(file_path.stat()))
                 if file_time < cutoff_time:
                     file_path.unlink()
                     print(f"🧹 已清理过期文件: {file_path}")
             except Exception as e:
                 print(f"清理文件失败 {file_path}: {e}")
     
+    def process_clipboard(self):
+        """检查一次剪切板，保存新出现的图片
+
+        图片数据只在本方法内存活，不会跨越轮询间隔的 sleep 常驻内存。
+        """
+        image = self.get_clipboard_image()
+        if isinstance(image, list):
+            # 复制的图片文件：按 stat 指纹去重，直接导入不解码
+            current_hash = file_list_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                for filepath in self.ingest_files(image):
+                    print(f"🎯 在 Claude Code 中可使用: @{filepath}")
+                self.last_clipboard_hash = current_hash
+        elif image:
+            # 检查是否是新的内容
+            current_hash = self.get_clipboard_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                # 保存图片但不修改剪切板
+                filepath = self.save_image(image)
+                self.last_clipboard_hash = current_hash
+                
+                print(f"💾 图片已保存: {filepath}")
+                print(f"📋 剪切板图片保持不变")
+                print(f"🎯 在 Claude Code 中可使用: @{filepath}")
+    
+    def poll(self):
+        """轮询一次剪切板"""
+        if self.claude_running:
+            self.process_clipboard()
+    
+    def poll_interval(self):
+        """当前轮询间隔：Claude Code 未运行或使用电池时降低频率"""
+        interval = POLL_INTERVAL if self.claude_running else IDLE_POLL_INTERVAL
+        return self.power.poll_interval(interval)
+    
+    def schedule_tasks(self):
+        """注册周期任务（进程检测排在轮询之前，启动时先确定运行状态）"""
+        scheduler = self.scheduler
+        scheduler.every("process", lambda: self.power.poll_interval(PROCESS_CHECK_INTERVAL),
+                        self.check_claude)
+        scheduler.every("poll", self.poll_interval, self.poll)
+        scheduler.every("cleanup", CLEANUP_INTERVAL, self.cleanup_old_files,
+                        delay=CLEANUP_INTERVAL)
+    
     def run(self):
         """运行监听器"""
         print("🚀 Claude Code 简单剪切板监听器已启动")
@@ -100,44 +181,29 @@ class SimpleClipboardMonitor:
         print("🛑 按 Ctrl+C 停止")
         
         self.running = True
-        cleanup_counter = 0
+        self.power.start()
+        self.schedule_tasks()
         
         while self.running:
             try:
-                # 每100次循环清理一次文件
-                cleanup_counter += 1
-                if cleanup_counter >= 100:
-                    self.cleanup_old_files()
-                    cleanup_counter = 0
-                
-                # 检查 Claude Code 是否运行
-                if not self.is_claude_code_running():
-                    time.sleep(2)
-                    continue
+                # 会话锁定、空闲或休眠期间阻塞等待，不轮询也不计时
+                if self.power.paused:
+                    print(f"💤 {self.power.describe()}，暂停监听")
+                    self.power.wait_active()
+                    print("▶️ 会话已恢复，继续监听")
                 
-                # 检查剪切板是否有图片
-                image = self.get_clipboard_image()
-                if image:
-                    # 检查是否是新的内容
-                    current_hash = self.get_clipboard_hash(image)
-                    if current_hash != self.last_clipboard_hash:
-                        # 保存图片但不修改剪切板
-                        filepath = self.save_image(image)
-                        self.last_clipboard_hash = current_hash
-                        
-                        print(f"💾 图片已保存: {filepath}")
-                        print(f"📋 剪切板图片保持不变")
-                        print(f"🎯 在 Claude Code 中可使用: @{filepath}")
-                
-                time.sleep(0.5)
+                # 执行到期的任务，然后睡到下一个截止时间
+                self.scheduler.run_pending()
+                if self.running:
+                    self.scheduler.wait()
                 
             except KeyboardInterrupt:
                 print("\n🛑 正在停止监听器...")
                 self.running = False
             except Exception as e:
                 print(f"❌ 错误: {e}")
-                time.sleep(1)
         
+        self.power.stop()
         print("👋 监听器已停止")
 
 
@@ -157,6 +223,21 @@ def main():
         type=str,
         help="自定义存储目录路径"
     )
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="保存图片后执行 fsync（更安全但更慢，默认关闭）"
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        help="图片最长边上限（像素）；默认不缩放，剪切板 PNG 原样保存"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="启用采样分析器，退出时写入 FILE（.prof 为 cProfile 格式，其他为折叠栈）"
+    )
     
     args = parser.parse_args()
     
@@ -170,9 +251,12 @@ def main():
     
     monitor = SimpleClipboardMonitor(
         tmp_dir=args.tmp_dir,
-        cleanup_hours=args.cleanup_hours
+        cleanup_hours=args.cleanup_hours,
+        fsync=args.fsync,
+        max_size=args.max_size
     )
-    monitor.run()
+    with profiling(args.profile):
+        monitor.run()
 
 
 if __name__ == "__main__":
@@ -8,36 +8,125 @@ import os
 import sys
 import time
 import hashlib
-import platform
 from datetime import datetime, timedelta
 from pathlib import Path
-import psutil
 import threading
 import queue
+import subprocess
+from io import BytesIO
 
 try:
-    from PIL import Image, ImageGrab
-    import pyperclip
+    from PIL import Image
 except ImportError:
     print("请安装依赖: pip install pillow pyperclip psutil")
     sys.exit(1)
 
+from .profiler import profiling
+from .power import PowerState
+from .backends import get_backends
+from .storage import (
+    atomic_save_image, save_png, ingest_file, filter_image_files, file_list_hash,
+    stored_file_time, save_text, text_md5, text_exceeds,
+)
+from .archive import open_archive
+from .ring import CaptureRing
+from .governor import ResourceGovernor
+from .recompress import BackgroundRecompressor, FAST_COMPRESS_LEVEL
+from .clipboard import (
+    image_md5, fingerprint_image, encode_png,
+)
+from .cache import LRUCache
+from .paste_listener import create_paste_listener
+from .coalescer import format_path_references
+from .scheduler import (
+    Scheduler, POLL_INTERVAL, IDLE_POLL_INTERVAL, PROCESS_CHECK_INTERVAL, CLEANUP_INTERVAL,
+    STATS_INTERVAL,
+)
+
+
+# 路径引用一直未被粘贴时，最多等待多久恢复剪切板图片（秒）
+RESTORE_TIMEOUT = 10
+
+
+def _payload_size(image):
+    """内存中图片数据的字节数"""
+    if isinstance(image, Image.Image):
+        return image.width * image.height * len(image.getbands())
+    return len(image)
+
 
 class SmartClipboardMonitor:
     """智能剪切板监听器"""
     
-    def __init__(self, tmp_dir=None, cleanup_hours=24):
+    def __init__(self, tmp_dir=None, cleanup_hours=24, fsync=False, max_size=None,
+                 max_tracked_images=256, lazy=False, lazy_cache_mb=64,
+                 recompress=False, archive_hours=None, archive_engine="tar",
+                 cpu_budget=None, rss_budget_mb=None, text_threshold_kb=None, ring_mb=None,
+                 backends=None, clock=None):
         # 默认使用 ~/.neurora/claude-code/screenshots 目录
         if tmp_dir is None:
             tmp_dir = Path.home() / ".neurora" / "claude-code" / "screenshots"
         
         self.tmp_dir = Path(tmp_dir)
         self.cleanup_hours = cleanup_hours
+        self.fsync = fsync
+        self.max_size = max_size
+        
+        # 两阶段保存：快速写盘后在低优先级进程池中重新压缩
+        self.recompressor = BackgroundRecompressor() if recompress else None
+        
+        # 分层存储：超过 archive_hours 的截图移入 pack 归档，而不是直接删除
+        self.archive_hours = archive_hours
+        self.archive = open_archive(Path(tmp_dir) / "archive", fsync=fsync,
+                                    engine=archive_engine) if archive_hours else None
+        
+        # 自身资源预算：超出时暂停后台重新压缩并改用最快的编码参数
+        self.governor = ResourceGovernor(cpu_budget, rss_budget_mb) \
+            if cpu_budget or rss_budget_mb else None
+        
+        # 超过阈值的剪切板文本保存为文件，在 Claude Code 中粘贴 @路径 引用而不是原文
+        self.text_threshold = text_threshold_kb * 1024 if text_threshold_kb else None
+        self.pending_text = None
+        # 上次读取剪切板 / 文本时的剪切板变化计数，以及等待替换期间上次检查过的前台窗口
+        self.clipboard_change_count = None
+        self.text_change_count = None
+        self.pending_focus = None
+        self.lazy = lazy
         self.last_clipboard_hash = None
         self.running = False
+        self.claude_running = False
         
-        # 存储图片文件映射 {hash: file_path}
-        self.image_files = {}
+        # 周期任务按单调时钟调度（测试和基准时可注入虚拟时钟）
+        self.scheduler = Scheduler(clock)
+        
+        # 最近截图的内存环形缓冲区：claude-clipboard-ring 可直接重新交付，同样的图片不重复保存
+        self.ring = CaptureRing.create(ring_mb) if ring_mb else None
+        
+        # 剪切板、进程、窗口和输入注入的平台实现（测试和基准时可替换为内存实现）
+        self.backends = backends or get_backends()
+        
+        # 会话锁定/空闲/休眠时暂停，使用电池时降低轮询频率
+        self.power = PowerState()
+        
+        # 存储图片文件映射 {hash: [file_path, ...]}（复制多个文件时对应多个路径）
+        # 使用有界 LRU，长时间运行时内存不会随截图数量增长
+        self.image_files = LRUCache(max_items=max_tracked_images)
+        
+        # 懒保存模式：复制时只记录指纹和原始数据 {hash: PNG 字节或 PIL 图片}，
+        # 在 Claude Code 中粘贴时才写入文件；按字节数限制内存占用
+        self.pending_images = LRUCache(
+            max_bytes=lazy_cache_mb * 1024 * 1024, sizeof=_payload_size
+        )
+        
+        # 当前剪切板内容的已编码数据 (hash, 'png' | 'files' | 'text', 数据)，
+        # 粘贴路径引用后直接用它恢复剪切板，无需读盘或重新编码
+        self.restore_cache = None
+        self.restoring = False
+        self.restore_completed_at = 0.0
+        self.restore_on_next_paste = None
+        
+        # 复用的 PNG 编码缓冲区（仅 ImageGrab 回退路径计算哈希时使用）
+        self._png_buffer = BytesIO()
         
         # 创建临时目录
         self.tmp_dir.mkdir(parents=True, exist_ok=True)
@@ -48,80 +137,43 @@ class SmartClipboardMonitor:
     def setup_keyboard_listener(self):
         """设置键盘监听器（检测粘贴操作）"""
         self.paste_queue = queue.Queue()
-        self.keyboard_thread = None
         
-        try:
-            # 尝试导入键盘监听库
-            import keyboard
-            self.keyboard_available = True
-        except ImportError:
-            print("⚠️  键盘监听功能不可用，建议安装: pip install keyboard")
-            self.keyboard_available = False
+        # 事件驱动：只有真正按下粘贴快捷键时才会唤醒
+        self.paste_listener = create_paste_listener(
+            lambda: self.paste_queue.put(time.monotonic())
+        )
+        self.keyboard_available = self.paste_listener is not None
+        if not self.keyboard_available:
+            print("⚠️  键盘监听功能不可用，建议安装: pip install evdev (Linux) 或 pip install keyboard")
     
     def start_keyboard_listener(self):
-        """启动键盘监听线程"""
+        """启动键盘监听"""
         if not self.keyboard_available:
             return
         
-        def keyboard_listener():
-            import keyboard
-            
-            while self.running:
-                try:
-                    # 检测 Ctrl+V 或 Cmd+V
-                    if platform.system() == "Darwin":
-                        # macOS 使用 Cmd+V
-                        if keyboard.is_pressed('cmd') and keyboard.is_pressed('v'):
-                            self.paste_queue.put('paste_detected')
-                            time.sleep(0.1)  # 防止重复触发
-                    else:
-                        # Windows/Linux 使用 Ctrl+V
-                        if keyboard.is_pressed('ctrl') and keyboard.is_pressed('v'):
-                            self.paste_queue.put('paste_detected')
-                            time.sleep(0.1)  # 防止重复触发
-                    
-                    time.sleep(0.05)  # 降低CPU占用
-                except Exception:
-                    pass
+        self.paste_listener.start()
+    
+    def stop_keyboard_listener(self):
+        """停止键盘监听"""
+        if not self.keyboard_available:
+            return
         
-        self.keyboard_thread = threading.Thread(target=keyboard_listener, daemon=True)
-        self.keyboard_thread.start()
+        try:
+            self.paste_listener.stop()
+        except Exception:
+            pass
     
     def is_claude_code_running(self):
         """检测 Claude Code 是否在运行"""
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                name = proc.info.get('name', '')
-                cmdline = proc.info.get('cmdline', [])
-                # 检查进程名或命令行中是否包含 claude
-                if (name and 'claude' in name.lower()) or \
-                   (cmdline and any('claude' in str(cmd).lower() for cmd in cmdline)):
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return False
+        return self.backends.processes.is_claude_running()
+    
+    def check_claude(self):
+        """刷新 Claude Code 运行状态（由调度器按固定间隔执行，不在每次轮询时遍历进程）"""
+        self.claude_running = self.is_claude_code_running()
     
     def get_active_window_title(self):
         """获取当前活动窗口标题"""
-        try:
-            if platform.system() == "Windows":
-                import win32gui
-                hwnd = win32gui.GetForegroundWindow()
-                return win32gui.GetWindowText(hwnd)
-            elif platform.system() == "Darwin":
-                # macOS
-                from AppKit import NSWorkspace
-                active_app = NSWorkspace.sharedWorkspace().activeApplication()
-                return active_app.get('NSApplicationName', '')
-            elif platform.system() == "Linux":
-                # Linux
-                import subprocess
-                result = subprocess.run(['xdotool', 'getactivewindow', 'getwindowname'], 
-                                      capture_output=True, text=True)
-                return result.stdout.strip() if result.returncode == 0 else ""
-        except Exception:
-            pass
-        return ""
+        return self.backends.windows.active_window_title()
     
     def is_claude_code_active(self):
         """检查 Claude Code 是否是当前活动窗口"""
@@ -129,10 +181,10 @@ class SmartClipboardMonitor:
         return 'claude' in window_title.lower()
     
     def get_clipboard_image(self):
-        """获取剪切板中的图片"""
+        """获取剪切板中的图片（复制的文件返回文件路径列表）"""
         try:
-            # 使用 PIL 的 ImageGrab 跨平台获取剪切板图片
-            return ImageGrab.grabclipboard()
+            # 懒保存模式下不预先编码，留到真正需要文件时再编码
+            return self.backends.clipboard.read(encode=not self.lazy)
         except Exception:
             pass
         return None
@@ -140,132 +192,423 @@ class SmartClipboardMonitor:
     def get_clipboard_hash(self, image=None):
         """获取剪切板内容的哈希值"""
         try:
-            if image:
-                # 对图片数据计算哈希
-                from io import BytesIO
-                img_bytes = BytesIO()
-                image.save(img_bytes, format='PNG')
-                return hashlib.md5(img_bytes.getvalue()).hexdigest()
+            if isinstance(image, bytes):
+                # 剪切板原始 PNG 字节直接计算哈希
+                return hashlib.md5(image).hexdigest()
+            elif image:
+                # 对图片数据计算哈希（复用缓冲区，不复制编码结果）
+                return image_md5(image, self._png_buffer)
             else:
                 # 对文本内容计算哈希
-                text = pyperclip.paste()
-                return hashlib.md5(text.encode()).hexdigest()
+                text = self.backends.clipboard.read_text()
+                return text_md5(text)
         except Exception:
             return None
     
     def save_image(self, image):
         """保存图片到目录"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"clipboard_{timestamp}.png"
         filepath = self.tmp_dir / filename
         
-        image.save(filepath, "PNG")
+        # 启用后台重新压缩或超出资源预算时，使用最快的压缩级别写盘
+        degraded = self.governor is not None and self.governor.degraded
+        params = {"compress_level": FAST_COMPRESS_LEVEL} if self.recompressor or degraded else {}
+        if isinstance(image, bytes):
+            # PNG 字节原样写入，仅在启用缩放时解码
+            save_png(image, filepath, max_size=self.max_size, fsync=self.fsync, **params)
+        else:
+            atomic_save_image(image, filepath, "PNG", fsync=self.fsync, **params)
+        
+        if self.recompressor:
+            self.recompressor.submit(filepath)
         return filepath
     
+    def collect_recompressed(self):
+        """收集后台重新压缩的结果"""
+        if not self.recompressor:
+            return
+        for filepath, saved in self.recompressor.poll():
+            print(f"🗜️ 已重新压缩: {filepath.name}，节省 {saved / 1024:.0f} KB")
+    
+    def apply_budget(self):
+        """检查资源预算，在正常模式和省资源模式之间切换"""
+        if not self.governor or not self.governor.check():
+            return
+        if self.governor.degraded:
+            print(f"⚠️ 超出资源预算（{self.governor.describe()}），切换到省资源模式")
+        else:
+            print(f"✅ 资源占用已恢复（{self.governor.describe()}）")
+        if self.recompressor:
+            self.recompressor.set_concurrency(
+                0 if self.governor.degraded else self.recompressor.workers
+            )
+    
+    def print_stats(self):
+        """输出运行统计"""
+        if self.recompressor:
+            print(f"📊 {self.recompressor.format_stats()}")
+        if self.governor:
+            print(f"📊 {self.governor.format_stats()}")
+
+    def ingest_files(self, paths):
+        """零拷贝导入剪切板中复制的图片文件（不解码像素）"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        stored = []
+        for index, src in enumerate(filter_image_files(paths)):
+            filepath = self.tmp_dir / f"clipboard_{timestamp}_{index}{src.suffix.lower()}"
+            method = ingest_file(src, filepath, fsync=self.fsync)
+            print(f"📎 已导入文件 ({method}): {src}")
+            stored.append(filepath)
+        return stored
+    
     def cleanup_old_files(self):
-        """清理过期的文件"""
-        cutoff_time = datetime.now() - timedelta(hours=self.cleanup_hours)
+        """清理过期的文件；启用归档时改为移入 pack 归档"""
+        hours = self.archive_hours or self.cleanup_hours
+        cutoff_time = datetime.now() - timedelta(hours=hours)
         
-        for file_path in self.tmp_dir.glob("clipboard_*.png"):
+        aged = []
+        for file_path in self.tmp_dir.glob("clipboard_*"):
             try:
-                file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
+                file_time = datetime.fromtimestamp(stored_file_time(file_path.stat()))
                 if file_time < cutoff_time:
-                    file_path.unlink()
-                    print(f"🧹 已清理过期文件: {file_path}")
-                    
-                    # 从映射中移除
-                    for hash_key, path in list(self.image_files.items()):
-                        if path == file_path:
-                            del self.image_files[hash_key]
-                            break
-                            
+                    aged.append(file_path)
             except Exception as e:
                 print(f"清理文件失败 {file_path}: {e}")
+        
+        if self.archive:
+            if aged:
+                try:
+                    count = self.archive.archive_files(aged)
+                    print(f"📦 已归档 {count} 个截图到 {self.archive.archive_dir}")
+                except Exception as e:
+                    print(f"归档失败: {e}")
+                    return
+        else:
+            for file_path in aged:
+                try:
+                    file_path.unlink()
+                    print(f"🧹 已清理过期文件: {file_path}")
+                except Exception as e:
+                    print(f"清理文件失败 {file_path}: {e}")
+        
+        # 从映射中移除
+        aged = set(aged)
+        for hash_key, paths in self.image_files.items():
+            if aged.intersection(paths):
+                del self.image_files[hash_key]
+    
+    def remember_image(self, image_hash, image):
+        """懒保存模式：只在内存中保留图片数据，淘汰的旧图片立即释放"""
+        for _, evicted in self.pending_images.put(image_hash, image):
+            if isinstance(evicted, Image.Image):
+                evicted.close()
+    
+    def materialize_image(self, image_hash):
+        """懒保存模式：将内存中的图片写入文件"""
+        if image_hash in self.image_files:
+            return
+        image = self.pending_images.pop(image_hash)
+        if image is None:
+            return
+        
+        if isinstance(image, Image.Image):
+            # 只编码一次：同一份字节既写入文件，也用于恢复剪切板
+            image = encode_png(image)
+        filepath = self.save_image(image)
+        self.record_capture(image, filepath)
+        self.image_files[image_hash] = [filepath]
+        self.restore_cache = (image_hash, 'png', image)
+        print(f"💾 图片已保存: {filepath}")
     
     def handle_paste_in_claude(self, image_hash):
         """处理在 Claude Code 中的粘贴操作"""
+        if self.restore_cache and self.restore_cache[:2] == (image_hash, 'text'):
+            # 大段文本在粘贴前已经替换过，这次粘贴的是原文，替换已来不及
+            return
+        if self.lazy:
+            self.materialize_image(image_hash)
+        
         if image_hash in self.image_files:
-            file_path = self.image_files[image_hash]
-            if file_path.exists():
-                # 临时替换剪切板内容为文件路径
-                formatted_path = f" @{file_path} "
-                pyperclip.copy(formatted_path)
-                print(f"🎯 在 Claude Code 中粘贴文件引用: {file_path}")
+            file_paths = [p for p in self.image_files[image_hash] if p.exists()]
+            if file_paths:
+                # 临时替换剪切板内容为文件路径，粘贴完成后立即恢复图片
+                formatted_path = format_path_references(file_paths)
+                print(f"🎯 在 Claude Code 中粘贴文件引用: {formatted_path.strip()}")
+                self.replace_clipboard_until_pasted(formatted_path, image_hash)
+    
+    def replace_clipboard_until_pasted(self, text, image_hash):
+        """临时用文本替换剪切板，文本被粘贴后立即恢复原始图片
+
+        Linux 上文本由只服务一次粘贴的写入者持有（X11 上 TARGETS 查询不算作粘贴），
+        写入者结束即表示粘贴已完成；其他平台在下一次粘贴事件后恢复。
+        """
+        writer = self.backends.clipboard.write_text_once(text)
+        if writer is None:
+            self.backends.clipboard.write_text(text)
+            self.restore_on_next_paste = image_hash
+            return
+        
+        # 恢复前暂停轮询：读取剪切板本身也是一次选择请求，会提前消耗掉文本
+        self.restoring = True
+        
+        def wait_and_restore():
+            pasted = True
+            try:
+                writer.wait(timeout=RESTORE_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                writer.kill()
+                writer.wait()
+                pasted = False
+                print("⌛ 路径引用未被粘贴，恢复剪切板原内容")
+            try:
+                self.restore_clipboard(image_hash)
+            finally:
+                if self.pending_text == image_hash:
+                    if pasted:
+                        self.pending_text = None
+                    else:
+                        # 文本仍未以引用形式粘贴：下次轮询重新检查前台窗口，必要时再次替换
+                        self.pending_focus = None
+                self.restore_completed_at = time.monotonic()
+                self.restoring = False
+        
+        threading.Thread(target=wait_and_restore, daemon=True).start()
+    
+    def restore_clipboard(self, image_hash):
+        """用缓存的已编码数据恢复剪切板（不读盘、不重新编码）"""
+        if not self.restore_cache or self.restore_cache[0] != image_hash:
+            return False
+        
+        _, kind, data = self.restore_cache
+        start = time.perf_counter()
+        if kind == 'png':
+            restored = self.backends.clipboard.write_png(data)
+        elif kind == 'text':
+            self.backends.clipboard.write_text(data)
+            restored = True
+        else:
+            restored = self.backends.clipboard.write_files(data)
+        
+        label = "文本" if kind == 'text' else "图片"
+        if restored:
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"♻️ 剪切板{label}已恢复 ({elapsed:.0f} ms)")
+        else:
+            print(f"⚠️ 无法恢复剪切板{label}")
+        return restored
+    
+    def recent_capture(self, image_hash):
+        """同样的图片仍在最近截图缓冲区中且文件还在时，返回已保存的文件路径"""
+        if self.ring is None:
+            return None
+        entry = self.ring.find(image_hash)
+        if entry is not None and entry.path and Path(entry.path).exists():
+            return Path(entry.path)
+        return None
+    
+    def record_capture(self, image, filepath):
+        """把已编码的截图写入最近截图缓冲区"""
+        if self.ring is not None and isinstance(image, bytes):
+            self.ring.add(image, filepath)
+    
+    def process_clipboard(self):
+        """检查一次剪切板，保存新出现的图片
+
+        图片数据只在本方法内存活，不会跨越轮询间隔的 sleep 常驻内存
+        （当前剪切板图片的已编码字节除外，用于粘贴后恢复剪切板）。
+        剪切板变化计数不变时不读取内容，也不计算指纹（懒保存模式下指纹需要遍历整帧像素）。
+        """
+        if self.restoring:
+            return
+        
+        change = self.backends.clipboard.change_count()
+        if change is not None and change == self.clipboard_change_count:
+            if self.pending_text is not None:
+                # 内容未变，但等待替换的大段文本仍需检查前台窗口
+                self.process_text()
+            return
+        self.clipboard_change_count = change
+        
+        image = self.get_clipboard_image()
+        if isinstance(image, list):
+            # 复制的图片文件：按 stat 指纹去重，直接导入不解码
+            current_hash = file_list_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                filepaths = self.ingest_files(image)
+                if filepaths:
+                    self.image_files[current_hash] = filepaths
+                self.restore_cache = (current_hash, 'files', image)
+                self.last_clipboard_hash = current_hash
+        elif image and self.lazy:
+            # 懒保存模式：只计算指纹，不编码也不写盘
+            if isinstance(image, bytes):
+                current_hash = hashlib.md5(image).hexdigest()
+            else:
+                current_hash = fingerprint_image(image)
+            if current_hash != self.last_clipboard_hash:
+                self.remember_image(current_hash, image)
+                self.last_clipboard_hash = current_hash
+                print(f"🔖 已记录新图片 (hash: {current_hash[:8]}...)，在 Claude Code 中粘贴时保存")
+            elif isinstance(image, Image.Image):
+                image.close()
+        elif image:
+            # 检查是否是新的内容
+            current_hash = self.get_clipboard_hash(image)
+            if current_hash != self.last_clipboard_hash:
+                # 保存图片但不修改剪切板（从最近截图重新放回剪切板的图片复用原文件）
+                filepath = self.recent_capture(current_hash)
+                if filepath:
+                    print(f"♻️ 最近截图，复用已保存的文件: {filepath}")
+                else:
+                    filepath = self.save_image(image)
+                    self.record_capture(image, filepath)
+                    print(f"💾 图片已保存: {filepath}")
+                self.image_files[current_hash] = [filepath]
+                if isinstance(image, bytes):
+                    self.restore_cache = (current_hash, 'png', image)
+                self.last_clipboard_hash = current_hash
                 
-                # 1秒后恢复图片到剪切板
-                def restore_image():
-                    time.sleep(1)
-                    try:
-                        # 重新加载图片到剪切板
-                        from PIL import Image
-                        img = Image.open(file_path)
-                        # 这里需要平台特定的代码来将图片放回剪切板
-                        # 暂时跳过，因为PIL的ImageGrab.grabclipboard()只读不写
-                        pass
-                    except Exception:
-                        pass
+                print("✅ 剪切板图片保持不变，可正常在其他应用中粘贴")
+        elif image is None and self.text_threshold:
+            self.process_text()
+    
+    def read_large_text(self):
+        """读取剪切板文本，未超过阈值时返回 None"""
+        try:
+            text = self.backends.clipboard.read_text()
+        except Exception:
+            return None
+        if not text or not text_exceeds(text, self.text_threshold):
+            return None
+        return text
+    
+    def process_text(self):
+        """超大文本写入文件，Claude Code 处于前台时临时替换为 @路径 引用
+
+        文本必须在粘贴之前替换（粘贴后再替换原文已经进入终端），
+        因此在 Claude Code 窗口获得焦点时就替换，引用被粘贴后恢复原文；
+        引用未被粘贴就超时恢复时文本仍然等待替换。
+        剪切板变化计数不变时不重新读取和哈希文本，前台窗口不变时不重新查询窗口标题。
+        """
+        change = self.backends.clipboard.change_count()
+        if change is None or change != self.text_change_count:
+            self.text_change_count = change
+            text = self.read_large_text()
+            if text is None:
+                self.pending_text = None
+                return
+            
+            current_hash = text_md5(text)
+            if current_hash != self.last_clipboard_hash:
+                # 按内容命名，同样的文本只保存一份
+                filepath, created = save_text(text, self.tmp_dir, fsync=self.fsync)
+                self.image_files[current_hash] = [filepath]
+                self.restore_cache = (current_hash, 'text', text)
+                self.last_clipboard_hash = current_hash
+                self.pending_text = current_hash
+                self.pending_focus = None
+                state = "已保存" if created else "已存在"
+                print(f"📝 大段文本{state}: {filepath}（{len(text)} 字符）")
+        
+        if self.pending_text is None:
+            return
+        focus = self.backends.windows.active_window_id()
+        if focus is not None and focus == self.pending_focus:
+            return
+        self.pending_focus = focus
+        if self.is_claude_code_active():
+            formatted_path = format_path_references(self.image_files[self.pending_text])
+            print(f"🎯 Claude Code 处于前台，替换为文本文件引用: {formatted_path.strip()}")
+            self.replace_clipboard_until_pasted(formatted_path, self.pending_text)
+    
+    def poll(self):
+        """轮询一次剪切板，处理轮询间隔内发生的粘贴"""
+        if not self.claude_running:
+            return
+        
+        # 检查剪切板是否有图片
+        self.process_clipboard()
+        self.collect_recompressed()
+        self.apply_budget()
+        
+        # 检查是否有粘贴操作
+        if self.keyboard_available:
+            try:
+                pasted_at = self.paste_queue.get_nowait()
+                # 同一轮询间隔内的多次粘贴只处理一次
+                while not self.paste_queue.empty():
+                    pasted_at = self.paste_queue.get_nowait()
                 
-                threading.Thread(target=restore_image, daemon=True).start()
+                if self.restore_on_next_paste:
+                    # 路径引用已被粘贴，恢复原始图片
+                    self.restore_clipboard(self.restore_on_next_paste)
+                    self.restore_on_next_paste = None
+                elif self.restoring or pasted_at <= self.restore_completed_at:
+                    # 这次粘贴的是路径引用本身，不再重复处理
+                    pass
+                # 检测到粘贴操作，判断是否在 Claude Code 中
+                elif self.is_claude_code_active() and self.last_clipboard_hash:
+                    self.handle_paste_in_claude(self.last_clipboard_hash)
+            except queue.Empty:
+                pass
+    
+    def poll_interval(self):
+        """当前轮询间隔：Claude Code 未运行或使用电池时降低频率"""
+        interval = POLL_INTERVAL if self.claude_running else IDLE_POLL_INTERVAL
+        return self.power.poll_interval(interval)
+    
+    def schedule_tasks(self):
+        """注册周期任务（进程检测排在轮询之前，启动时先确定运行状态）"""
+        scheduler = self.scheduler
+        scheduler.every("process", lambda: self.power.poll_interval(PROCESS_CHECK_INTERVAL),
+                        self.check_claude)
+        scheduler.every("poll", self.poll_interval, self.poll)
+        scheduler.every("cleanup", CLEANUP_INTERVAL, self.cleanup_old_files,
+                        delay=CLEANUP_INTERVAL)
+        scheduler.every("stats", STATS_INTERVAL, self.print_stats, delay=STATS_INTERVAL)
     
     def run(self):
         """运行监听器"""
         print("🚀 Claude Code 智能剪切板监听器已启动")
         print(f"📁 文件保存目录: {self.tmp_dir.absolute()}")
-        print("💡 工作模式: 保存图片但不影响正常粘贴")
+        if self.lazy:
+            print("💡 工作模式: 懒保存，仅在 Claude Code 中粘贴时保存图片")
+        else:
+            print("💡 工作模式: 保存图片但不影响正常粘贴")
         print("🛑 按 Ctrl+C 停止")
         
         self.running = True
-        cleanup_counter = 0
+        self.power.start()
+        self.schedule_tasks()
         
         # 启动键盘监听
         self.start_keyboard_listener()
         
         while self.running:
             try:
-                # 每100次循环清理一次文件
-                cleanup_counter += 1
-                if cleanup_counter >= 100:
-                    self.cleanup_old_files()
-                    cleanup_counter = 0
-                
-                # 检查 Claude Code 是否运行
-                if not self.is_claude_code_running():
-                    time.sleep(2)
-                    continue
-                
-                # 检查剪切板是否有图片
-                image = self.get_clipboard_image()
-                if image:
-                    # 检查是否是新的内容
-                    current_hash = self.get_clipboard_hash(image)
-                    if current_hash != self.last_clipboard_hash:
-                        # 保存图片但不修改剪切板
-                        filepath = self.save_image(image)
-                        self.image_files[current_hash] = filepath
-                        self.last_clipboard_hash = current_hash
-                        
-                        print(f"💾 图片已保存: {filepath}")
-                        print("✅ 剪切板图片保持不变，可正常在其他应用中粘贴")
-                
-                # 检查是否有粘贴操作
-                if self.keyboard_available:
-                    try:
-                        self.paste_queue.get_nowait()
-                        # 检测到粘贴操作，判断是否在 Claude Code 中
-                        if self.is_claude_code_active() and self.last_clipboard_hash:
-                            self.handle_paste_in_claude(self.last_clipboard_hash)
-                    except queue.Empty:
-                        pass
+                # 会话锁定、空闲或休眠期间阻塞等待，不轮询也不计时
+                if self.power.paused:
+                    print(f"💤 {self.power.describe()}，暂停监听")
+                    self.power.wait_active()
+                    print("▶️ 会话已恢复，继续监听")
                 
-                time.sleep(0.5)
+                # 执行到期的任务，然后睡到下一个截止时间
+                self.scheduler.run_pending()
+                if self.running:
+                    self.scheduler.wait()
                 
             except KeyboardInterrupt:
                 print("\n🛑 正在停止监听器...")
                 self.running = False
             except Exception as e:
                 print(f"❌ 错误: {e}")
-                time.sleep(1)
         
+        self.stop_keyboard_listener()
+        if self.recompressor:
+            self.recompressor.shutdown()
+        self.print_stats()
+        self.power.stop()
         print("👋 监听器已停止")
 
 
@@ -285,9 +628,81 @@ def main():
         type=str,
         help="自定义存储目录路径"
     )
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="保存图片后执行 fsync（更安全但更慢，默认关闭）"
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        help="图片最长边上限（像素）；默认不缩放，剪切板 PNG 原样保存"
+    )
+    parser.add_argument(
+        "--test-paste",
+        action="store_true",
+        help="使用 uinput 虚拟键盘测试粘贴检测（Linux）"
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="懒保存：复制时只记录指纹，在 Claude Code 中粘贴时才写入文件"
+    )
+    parser.add_argument(
+        "--lazy-cache-mb",
+        type=int,
+        default=64,
+        help="懒保存模式下内存中保留的图片数据上限（MB，默认64）"
+    )
+    parser.add_argument(
+        "--recompress",
+        action="store_true",
+        help="先快速保存图片，再在低优先级后台进程中重新压缩以节省磁盘空间"
+    )
+    parser.add_argument(
+        "--archive-hours",
+        type=float,
+        help="超过该时间（小时）的截图移入 pack 归档而不是删除；可用 claude-clipboard-archive 恢复"
+    )
+    parser.add_argument(
+        "--archive-engine",
+        choices=["tar", "tiles"],
+        default="tar",
+        help="归档引擎：tar 为 pack 文件（默认），tiles 为分块去重存储（需要 numpy，适合大量相似截图）"
+    )
+    parser.add_argument(
+        "--cpu-budget",
+        type=float,
+        help="CPU 预算（单核百分比，含后台进程）；超出时暂停后台压缩并改用最快编码"
+    )
+    parser.add_argument(
+        "--rss-budget-mb",
+        type=int,
+        help="常驻内存预算（MB，含后台进程）；超出时同样切换到省资源模式"
+    )
+    parser.add_argument(
+        "--text-threshold-kb",
+        type=int,
+        help="剪切板文本超过该大小（KB）时保存为文件，在 Claude Code 中粘贴 @路径 引用"
+    )
+    parser.add_argument(
+        "--ring-mb",
+        type=int,
+        help="在共享内存中保留最近截图（MB 上限），可用 claude-clipboard-ring 直接重新交付"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="启用采样分析器，退出时写入 FILE（.prof 为 cProfile 格式，其他为折叠栈）"
+    )
     
     args = parser.parse_args()
     
+    if args.test_paste:
+        from .paste_listener import test_paste_listener
+        test_paste_listener()
+        return
+    
     # 检查依赖
     try:
         import PIL, pyperclip, psutil
@@ -298,9 +713,21 @@ def main():
     
     monitor = SmartClipboardMonitor(
         tmp_dir=args.tmp_dir,
-        cleanup_hours=args.cleanup_hours
+        cleanup_hours=args.cleanup_hours,
+        fsync=args.fsync,
+        max_size=args.max_size,
+        lazy=args.lazy,
+        lazy_cache_mb=args.lazy_cache_mb,
+        recompress=args.recompress,
+        archive_hours=args.archive_hours,
+        archive_engine=args.archive_engine,
+        cpu_budget=args.cpu_budget,
+        rss_budget_mb=args.rss_budget_mb,
+        text_threshold_kb=args.text_threshold_kb,
+        ring_mb=args.ring_mb
     )
-    monitor.run()
+    with profiling(args.profile):
+        monitor.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,267 @@
+"""
+截图存储工具
+所有写入都先落到同目录下的临时文件，再通过 os.replace 原子替换到最终路径，
+监听目录的程序（包括 Claude Code）只要看到文件出现就可以立即读取。
+"""
+
+import os
+import shutil
+import contextlib
+import hashlib
+import tempfile
+from pathlib import Path
+
+
+# 可直接导入存储目录的图片扩展名（按扩展名判断，不解码文件内容）
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+
+# 文本按块编码写入，避免为几 MB 的文本再生成一份完整的 UTF-8 副本
+TEXT_CHUNK_CHARS = 1 << 18
+
+# Linux ioctl: 让目标文件与源文件共享数据块（btrfs/xfs/bcachefs 等支持）
+FICLONE = 0x40049409
+
+
+def _fsync_dir(directory):
+    """同步目录项，确保 rename 本身落盘（Windows 不支持打开目录）"""
+    try:
+        dir_fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def fsync_path(filepath):
+    """把已写入的文件内容同步到磁盘（文件不存在时忽略）"""
+    # Windows 上 fsync 需要可写的文件描述符
+    try:
+        fd = os.open(str(filepath), os.O_RDWR if os.name == "nt" else os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """跨进程咨询锁（POSIX flock / Windows msvcrt.locking）"""
+    with open(lock_path, 'a+b') as lock_file:
+        try:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            try:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            except ImportError:
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write(filepath, write_func, fsync=False, mode=None):
+    """原子写入文件
+
+    write_func 接收一个已打开的二进制文件对象并写入全部内容。
+    临时文件以 "." 开头、".tmp" 结尾，不会被 clipboard_*.png 之类的匹配规则扫到。
+    fsync 默认关闭：只保证读者看不到半截文件，不保证断电后数据仍在。
+    mode 用于替换已有文件时保留其权限（临时文件默认 0600）。
+    """
+    filepath = Path(filepath)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=str(filepath.parent), prefix=f".{filepath.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_func(f)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, str(filepath))
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync:
+        _fsync_dir(filepath.parent)
+    return filepath
+
+
+def atomic_write_bytes(filepath, data, fsync=False, mode=None):
+    """原子写入字节数据"""
+    return atomic_write(filepath, lambda f: f.write(data), fsync=fsync, mode=mode)
+
+
+def atomic_save_image(image, filepath, format="PNG", fsync=False, **params):
+    """原子保存 PIL 图片"""
+    return atomic_write(
+        filepath, lambda f: image.save(f, format=format, **params), fsync=fsync
+    )
+
+
+def save_png(data, filepath, max_size=None, fsync=False, **params):
+    """保存 PNG 编码字节
+
+    未启用缩放时原样写入，不做任何解码；
+    启用 max_size 且图片超出限制时，才解码、缩放并按 params 重新编码。
+    """
+    if max_size:
+        from io import BytesIO
+        from PIL import Image
+        with Image.open(BytesIO(data)) as image:
+            if max(image.size) > max_size:
+                image.thumbnail((max_size, max_size))
+                return atomic_save_image(image, filepath, "PNG", fsync=fsync, **params)
+    return atomic_write_bytes(filepath, data, fsync=fsync)
+
+
+def stored_file_time(stat_result):
+    """存储文件的入库时间戳
+
+    硬链接导入的文件保留源文件的 mtime，但 link() 会更新 inode 的 ctime，
+    因此 POSIX 上取两者较大值，避免刚导入的旧文件被立即清理。
+    """
+    if os.name == "posix":
+        return max(stat_result.st_mtime, stat_result.st_ctime)
+    return stat_result.st_mtime
+
+
+def filter_image_files(paths):
+    """从文件列表中筛选出图片文件"""
+    return [
+        Path(path) for path in paths
+        if Path(path).suffix.lower() in IMAGE_EXTENSIONS and os.path.isfile(path)
+    ]
+
+
+def file_list_hash(paths):
+    """文件列表的指纹：只使用 stat 信息，与文件大小无关的常数时间"""
+    digest = hashlib.md5()
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        digest.update(
+            f"{path}:{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}\n".encode()
+        )
+    return digest.hexdigest()
+
+
+def _text_chunks(text):
+    for start in range(0, len(text), TEXT_CHUNK_CHARS):
+        yield text[start:start + TEXT_CHUNK_CHARS].encode("utf-8", "surrogatepass")
+
+
+def text_md5(text):
+    """按块计算文本 UTF-8 编码的 MD5"""
+    digest = hashlib.md5()
+    for chunk in _text_chunks(text):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_exceeds(text, limit):
+    """文本的 UTF-8 字节数是否超过 limit（大多数情况下无需编码即可判断）"""
+    if len(text) > limit:
+        return True
+    if len(text) * 4 <= limit:
+        return False
+    return sum(len(chunk) for chunk in _text_chunks(text)) > limit
+
+
+def save_text(text, directory, fsync=False):
+    """按内容哈希保存文本，返回 (文件路径, 是否新写入)
+
+    文件名由 MD5 决定，同样的文本只保存一份；已存在时只刷新 mtime，推迟过期清理。
+    """
+    digest = text_md5(text)
+    filepath = Path(directory) / f"clipboard_text_{digest[:16]}.txt"
+    if filepath.exists():
+        os.utime(filepath)
+        return filepath, False
+
+    def write_chunks(f):
+        for chunk in _text_chunks(text):
+            f.write(chunk)
+
+    atomic_write(filepath, write_chunks, fsync=fsync)
+    return filepath, True
+
+
+def _reflink(src_fd, dst_file):
+    """FICLONE 克隆整个文件"""
+    import fcntl
+    fcntl.ioctl(dst_file.fileno(), FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd, dst_file):
+    """内核态复制文件内容，不经过用户态缓冲区"""
+    dst_fd = dst_file.fileno()
+    while os.copy_file_range(src_fd, dst_fd, 1 << 30):
+        pass
+
+
+def ingest_file(src, dest, fsync=False):
+    """将已有图片文件导入存储目录，不解码像素
+
+    依次尝试硬链接、reflink (FICLONE)、copy_file_range，最后退回普通复制。
+    返回实际使用的方式名称。
+    """
+    src = Path(src)
+    dest = Path(dest)
+
+    # 1. 硬链接：常数时间，link() 本身是原子的
+    if os.name == "posix":
+        try:
+            os.link(src, dest)
+            return "hardlink"
+        except OSError:
+            pass
+
+    with open(src, "rb") as fsrc:
+        src_fd = fsrc.fileno()
+
+        # 2. reflink：常数时间，写时复制
+        try:
+            atomic_write(dest, lambda f: _reflink(src_fd, f), fsync=fsync)
+            return "reflink"
+        except (OSError, ImportError):
+            pass
+
+        # 3. copy_file_range：内核态复制
+        if hasattr(os, "copy_file_range"):
+            try:
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                atomic_write(dest, lambda f: _copy_file_range(src_fd, f), fsync=fsync)
+                return "copy_file_range"
+            except OSError:
+                pass
+
+        # 4. 普通复制
+        os.lseek(src_fd, 0, os.SEEK_SET)
+        atomic_write(dest, lambda f: shutil.copyfileobj(fsrc, f), fsync=fsync)
+        return "copy"
@@ -0,0 +1,172 @@
+"""
+终端直接交付
+Claude Code 是终端程序：找到它的控制终端后，直接把 @path 引用作为键盘输入送进去，
+不需要显示器、窗口焦点或剪切板，SSH 会话中同样可用。
+
+- 在 tmux 中运行时通过 tmux send-keys 写入对应的 pane
+- 否则通过 TIOCSTI 向终端输入队列注入（需要内核允许 dev.tty.legacy_tiocsti，
+  且本进程与目标使用同一个控制终端或具有 CAP_SYS_ADMIN）
+"""
+
+import os
+import sys
+import time
+import shutil
+import subprocess
+from collections import deque
+
+from .backends import get_backends
+from .coalescer import format_path_references
+
+
+# tmux 命令的超时时间（秒）
+TMUX_TIMEOUT = 2.0
+
+
+class TerminalTarget:
+    """Claude Code 进程所在的终端"""
+
+    __slots__ = ("pid", "tty", "pane")
+
+    def __init__(self, pid, tty, pane=None):
+        self.pid = pid
+        self.tty = tty
+        self.pane = pane
+
+    def describe(self):
+        where = f"tmux pane {self.pane}" if self.pane else self.tty
+        return f"PID {self.pid} @ {where}"
+
+
+def tmux_panes():
+    """列出 tmux 服务器中所有 pane 的 {终端设备: pane id}；没有 tmux 时返回空字典"""
+    if not shutil.which("tmux"):
+        return {}
+    try:
+        result = subprocess.run(
+            ["tmux", "list-panes", "-a", "-F", "#{pane_tty} #{pane_id}"],
+            capture_output=True, text=True, timeout=TMUX_TIMEOUT
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return {}
+    if result.returncode != 0:
+        return {}
+    panes = {}
+    for line in result.stdout.splitlines():
+        tty, _, pane = line.partition(" ")
+        if pane:
+            panes[tty] = pane
+    return panes
+
+
+def send_tmux(pane, text):
+    """按字面内容输入到 tmux pane（-l 不解析按键名）"""
+    result = subprocess.run(
+        ["tmux", "send-keys", "-t", pane, "-l", "--", text],
+        capture_output=True, text=True, timeout=TMUX_TIMEOUT
+    )
+    if result.returncode != 0:
+        raise OSError(result.stderr.strip() or f"tmux send-keys 失败: {result.returncode}")
+
+
+def send_tiocsti(tty, text):
+    """逐字节注入到终端输入队列"""
+    import fcntl
+    import termios
+
+    fd = os.open(tty, os.O_RDWR | os.O_NOCTTY)
+    try:
+        for byte in text.encode("utf-8"):
+            fcntl.ioctl(fd, termios.TIOCSTI, bytes([byte]))
+    finally:
+        os.close(fd)
+
+
+class TerminalSink:
+    """把路径引用直接输入到 Claude Code 的终端
+
+    目标终端在首次交付时查找并缓存，交付失败时重新查找一次。
+    """
+
+    def __init__(self, backends=None):
+        self.backends = backends or get_backends()
+        self.target = None
+
+        # 最近的交付延迟（毫秒）
+        self.latencies = deque(maxlen=1000)
+
+    def find_target(self):
+        """从进程扫描结果中找到 Claude Code 的终端，优先选择 tmux 中的实例"""
+        terminals = self.backends.processes.claude_terminals()
+        if not terminals:
+            return None
+        panes = tmux_panes()
+        for pid, tty in terminals:
+            if tty in panes:
+                return TerminalTarget(pid, tty, panes[tty])
+        pid, tty = terminals[0]
+        return TerminalTarget(pid, tty)
+
+    def _send(self, target, text):
+        if target.pane:
+            send_tmux(target.pane, text)
+        else:
+            send_tiocsti(target.tty, text)
+
+    def deliver(self, paths):
+        """输入路径引用，返回是否成功"""
+        text = format_path_references(paths)
+        start = time.perf_counter()
+        for attempt in range(2):
+            if self.target is None or attempt:
+                # 缓存的终端可能已经关闭或 Claude Code 已重启，重新查找
+                self.target = self.find_target()
+                if self.target is None:
+                    print("❌ 未找到运行在终端中的 Claude Code")
+                    return False
+            try:
+                self._send(self.target, text)
+                break
+            except (OSError, subprocess.TimeoutExpired) as e:
+                error = e
+        else:
+            print(f"❌ 无法输入到终端 {self.target.describe()}: {error}")
+            return False
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.latencies.append(elapsed)
+        print(f"⌨️ 已输入到 {self.target.describe()}: {text.strip()} ({elapsed:.1f} ms)")
+        return True
+
+    def format_stats(self):
+        """交付延迟统计"""
+        from .trace import percentile
+        values = list(self.latencies)
+        if not values:
+            return "终端交付延迟: 暂无数据"
+        return (f"终端交付延迟: {len(values)} 次，p50 {percentile(values, 0.5):.1f} ms / "
+                f"p95 {percentile(values, 0.95):.1f} ms / 最大 {max(values):.1f} ms")
+
+
+def main():
+    """命令行入口点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Claude Code 终端直接交付")
+    parser.add_argument("paths", nargs="*", help="要输入的文件路径；不指定时只列出找到的终端")
+    args = parser.parse_args()
+
+    sink = TerminalSink()
+    if not args.paths:
+        panes = tmux_panes()
+        terminals = sink.backends.processes.claude_terminals()
+        for pid, tty in terminals:
+            pane = panes.get(tty)
+            print(f"  PID {pid}  {tty}" + (f"  tmux {pane}" if pane else ""))
+        print(f"🖥️ 共找到 {len(terminals)} 个运行在终端中的 Claude Code")
+        return 0
+    return 0 if sink.deliver(args.paths) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+分块去重存储
+连续截图往往只有几行不同：把图片切成固定大小的块，用 NumPy 向量化计算每块的哈希，
+相同的块只保存一次，每张图片只记录一份块编号清单；需要时才重新拼接并编码为 PNG。
+
+作为截图归档的另一种引擎（--archive-engine tiles），接口与 ScreenshotArchive 相同。
+
+目录结构（screenshots/archive/tiles/）:
+  chunks.pack     追加写入的 zlib 压缩数据块（图片块，或无法分块的文件整体）
+  chunks.idx      CHUNK 记录数组，第 i 条记录即第 i 个数据块
+  manifests.pack  追加写入的清单: MANIFEST 头 + 块编号数组
+  index.json      {md5: [类型, 清单偏移, 原始大小, 原文件名, mtime]}
+"""
+
+import os
+import json
+import mmap
+import zlib
+import struct
+import hashlib
+import tempfile
+import contextlib
+from io import BytesIO
+from pathlib import Path
+
+from .cache import LRUCache
+from .storage import atomic_write_bytes, file_lock, fsync_path
+
+
+# 哈希1, 哈希2, 在 chunks.pack 中的偏移, 压缩后长度
+CHUNK = struct.Struct(">QQQI")
+# 类型, 宽, 高, 通道数, 块边长, 块数量
+MANIFEST = struct.Struct(">BIIBHI")
+
+KIND_TILES = 1
+KIND_RAW = 2
+KIND_NAMES = {KIND_TILES: "tiles", KIND_RAW: "raw"}
+
+TILE_SIZE = 64
+MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+
+# 重建时缓存的已解压图片块上限
+TILE_CACHE_MB = 32
+
+# 固定种子：哈希系数必须在多次运行之间保持一致
+_HASH_SEED = 0x434C4950
+
+
+def _require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("分块存储需要: pip install numpy")
+    return numpy
+
+
+class TileHasher:
+    """按块计算 128 位哈希（每个 64 位字先混合，再与两组随机奇数系数做线性组合，按 64 位回绕）
+
+    不混合时只有高位字节不同的两个块，差异只能影响哈希的高位，很容易互相抵消而冲突；
+    混合后每个输入位都会扩散到整个字。哈希只用于查找候选块，命中后仍会比较块内容。
+    """
+
+    def __init__(self):
+        self.np = _require_numpy()
+        self._coefficients = {}
+
+    def _coeffs(self, words):
+        coeffs = self._coefficients.get(words)
+        if coeffs is None:
+            rng = self.np.random.default_rng(_HASH_SEED + words)
+            coeffs = rng.integers(0, 2**63, size=(2, words), dtype=self.np.uint64) * 2 + 1
+            self._coefficients[words] = coeffs
+        return coeffs
+
+    def _mix(self, words):
+        """splitmix64 的混合函数（双射），逐字向量化计算"""
+        np = self.np
+        with np.errstate(over="ignore"):
+            z = words ^ np.uint64(0x9E3779B97F4A7C15)
+            z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            return z ^ (z >> np.uint64(31))
+
+    def hash_tiles(self, tiles):
+        """tiles: (n, 块字节数) 的 uint8 数组，返回两个长度为 n 的 uint64 数组"""
+        np = self.np
+        words = self._mix(np.ascontiguousarray(tiles).view("<u8"))
+        coeffs = self._coeffs(words.shape[1])
+        with np.errstate(over="ignore"):
+            h1 = (words * coeffs[0]).sum(axis=1, dtype=np.uint64)
+            h2 = (words * coeffs[1]).sum(axis=1, dtype=np.uint64)
+        return h1, h2
+
+
+def split_tiles(array, tile=TILE_SIZE):
+    """(H, W, C) 数组补零到块边长的整数倍后切块，返回 ((n, 块字节数) 数组, 行数, 列数)"""
+    np = _require_numpy()
+    height, width, bands = array.shape
+    rows, cols = -(-height // tile), -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile, bands), dtype=np.uint8)
+    padded[:height, :width] = array
+    tiles = padded.reshape(rows, tile, cols, tile, bands).swapaxes(1, 2)
+    return tiles.reshape(rows * cols, tile * tile * bands), rows, cols
+
+
+def join_tiles(tiles, rows, cols, width, height, bands, tile=TILE_SIZE):
+    """split_tiles 的逆操作"""
+    grid = tiles.reshape(rows, cols, tile, tile, bands).swapaxes(1, 2)
+    return grid.reshape(rows * tile, cols * tile, bands)[:height, :width]
+
+
+class TileStore:
+    """分块去重的截图归档"""
+
+    def __init__(self, archive_dir, fsync=False, tile=TILE_SIZE):
+        self.np = _require_numpy()
+        self.archive_dir = Path(archive_dir)
+        self.store_dir = self.archive_dir / "tiles"
+        self.index_path = self.store_dir / "index.json"
+        self.pack_path = self.store_dir / "chunks.pack"
+        self.chunk_index_path = self.store_dir / "chunks.idx"
+        self.manifest_path = self.store_dir / "manifests.pack"
+        self.fsync = fsync
+        self.tile = tile
+        self.hasher = TileHasher()
+        # entries: {md5: [类型, 清单偏移, 原始大小, 原文件名, mtime]}
+        # aliases: {原文件名: md5}，内容与已归档文件相同、文件名不同的截图
+        self.entries = {}
+        self.aliases = {}
+        self.names = {}
+        self.chunks = []
+        # {(哈希1, 哈希2): [块编号, ...]}：哈希相同但内容不同的块各自保存
+        self.chunk_ids = {}
+        self._maps = {}
+        self.tile_cache = LRUCache(max_bytes=TILE_CACHE_MB * 1024 * 1024)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        # 其他进程可能已经扩展了 pack，旧的映射长度不够
+        self._close_maps()
+        try:
+            index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            index = {}
+        self.entries = index.get("entries", {})
+        self.aliases = index.get("aliases", {})
+        self.names = {entry[3]: digest for digest, entry in self.entries.items()}
+        self.names.update(self.aliases)
+
+        # 只信任完整的记录；中途失败留下的半条记录会在下次追加时被覆盖
+        try:
+            raw = self.chunk_index_path.read_bytes()
+        except OSError:
+            raw = b""
+        count = len(raw) // CHUNK.size
+        self.chunks = [CHUNK.unpack_from(raw, i * CHUNK.size) for i in range(count)]
+        self.chunk_ids = {}
+        for i, (h1, h2, _, _) in enumerate(self.chunks):
+            self.chunk_ids.setdefault((h1, h2), []).append(i)
+
+    def save_index(self):
+        # 原文件删除后索引是找到归档内容的唯一途径，总是落盘
+        data = json.dumps({"entries": self.entries, "aliases": self.aliases}).encode("utf-8")
+        atomic_write_bytes(self.index_path, data, fsync=True)
+
+    def _close_maps(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+    def _append(self, path, data, truncate_to=None):
+        """追加写入，返回写入位置"""
+        with open(path, "ab") as f:
+            if truncate_to is not None:
+                f.truncate(truncate_to)
+            offset = f.seek(0, os.SEEK_END)
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        return offset
+
+    def _store_chunks(self, keys, payloads):
+        """写入尚未保存的数据块，返回每个 key 对应的块编号
+
+        哈希命中时比较块内容，不同则作为新块保存，不会把不同的块当成同一个。
+        """
+        new_records = []
+        new_data = []
+        # 本批新增、尚未写入 pack 的块 {块编号: 原始内容}
+        pending = {}
+        ids = []
+        pack_end = self.pack_path.stat().st_size if self.pack_path.exists() else 0
+        for key, payload in zip(keys, payloads):
+            data = payload()
+            candidates = self.chunk_ids.setdefault(key, [])
+            for chunk_id in candidates:
+                stored = pending[chunk_id] if chunk_id in pending else self._chunk(chunk_id)
+                if stored == data:
+                    break
+            else:
+                compressed = zlib.compress(data, 1)
+                chunk_id = len(self.chunks)
+                record = (key[0], key[1], pack_end, len(compressed))
+                pack_end += len(compressed)
+                self.chunks.append(record)
+                candidates.append(chunk_id)
+                pending[chunk_id] = data
+                new_records.append(CHUNK.pack(*record))
+                new_data.append(compressed)
+            ids.append(chunk_id)
+
+        if new_data:
+            # pack 文件可能已被映射用于读取，扩展前关闭映射
+            self._close_maps()
+            self._append(self.pack_path, b"".join(new_data))
+            self._append(self.chunk_index_path, b"".join(new_records),
+                         truncate_to=(len(self.chunks) - len(new_records)) * CHUNK.size)
+        return ids
+
+    def _encode(self, data):
+        """PNG 切块；其他格式或无法解码的文件作为一个整体数据块"""
+        np = self.np
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            from PIL import Image
+            try:
+                with Image.open(BytesIO(data)) as image:
+                    if image.mode not in MODES.values():
+                        image = image.convert("RGBA")
+                    array = np.asarray(image, dtype=np.uint8)
+            except Exception:
+                array = None
+            if array is not None:
+                if array.ndim == 2:
+                    array = array[:, :, None]
+                height, width, bands = array.shape
+                tiles, rows, cols = split_tiles(array, self.tile)
+                h1, h2 = self.hasher.hash_tiles(tiles)
+                keys = list(zip(h1.tolist(), h2.tolist()))
+                ids = self._store_chunks(keys, [tiles[i].tobytes for i in range(len(keys))])
+                header = MANIFEST.pack(KIND_TILES, width, height, bands, self.tile, len(ids))
+                return KIND_TILES, header + np.asarray(ids, dtype=">u4").tobytes()
+
+        digest = hashlib.md5(data).digest()
+        key = (int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big"))
+        ids = self._store_chunks([key], [lambda: data])
+        return KIND_RAW, MANIFEST.pack(KIND_RAW, 0, 0, 0, 0, 1) + struct.pack(">I", ids[0])
+
+    def add(self, filepath):
+        """归档单个文件，返回其内容的 MD5；内容已归档过时只记录不重复写入
+
+        调用方负责调用 save_index()，索引落盘之后才能删除原文件。
+        """
+        filepath = Path(filepath)
+        data = filepath.read_bytes()
+        digest = hashlib.md5(data).hexdigest()
+        if digest not in self.entries:
+            kind, manifest = self._encode(data)
+            self._close_maps()
+            offset = self._append(self.manifest_path, manifest)
+            self.entries[digest] = [KIND_NAMES[kind], offset, len(data), filepath.name,
+                                    filepath.stat().st_mtime]
+        if self.entries[digest][3] != filepath.name:
+            # 重复内容只保存一份，文件名作为别名写入索引，重新加载后仍可按文件名查找
+            self.aliases[filepath.name] = digest
+        else:
+            self.aliases.pop(filepath.name, None)
+        self.names[filepath.name] = digest
+        return digest
+
+    def archive_files(self, paths):
+        """归档一批文件并删除原文件，返回成功归档的数量
+
+        与 ScreenshotArchive.archive_files 相同：整批持有文件锁，数据和索引落盘之后才删除原文件。
+        """
+        with file_lock(self.store_dir / ".lock"):
+            self.load_index()
+            added = []
+            try:
+                for path in paths:
+                    try:
+                        self.add(path)
+                    except FileNotFoundError:
+                        continue
+                    added.append(Path(path))
+            finally:
+                if added:
+                    for path in (self.pack_path, self.chunk_index_path, self.manifest_path):
+                        fsync_path(path)
+                    self.save_index()
+                    for path in added:
+                        try:
+                            path.unlink()
+                        except FileNotFoundError:
+                            pass
+        return len(added)
+
+    def resolve(self, key):
+        """按 MD5、MD5 前缀或原文件名查找，返回 MD5；找不到或不唯一时返回 None"""
+        key = Path(key).name
+        if key in self.entries:
+            return key
+        if key in self.names:
+            return self.names[key]
+        matches = [digest for digest in self.entries if digest.startswith(key)]
+        return matches[0] if len(matches) == 1 else None
+
+    def _map(self, path):
+        mapped = self._maps.get(path)
+        if mapped is None:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = mapped
+        return mapped
+
+    def _chunk(self, chunk_id):
+        cached = self.tile_cache.get(chunk_id)
+        if cached is None:
+            _, _, offset, length = self.chunks[chunk_id]
+            cached = zlib.decompress(self._map(self.pack_path)[offset:offset + length])
+            self.tile_cache.put(chunk_id, cached)
+        return cached
+
+    def _manifest(self, offset):
+        manifest = self._map(self.manifest_path)
+        header = MANIFEST.unpack_from(manifest, offset)
+        start = offset + MANIFEST.size
+        # 复制出来，不持有映射的引用（映射在 pack 扩展时需要关闭）
+        ids = self.np.frombuffer(manifest[start:start + header[5] * 4], dtype=">u4")
+        return header, ids
+
+    def read(self, digest):
+        """读取归档内容；分块存储的图片在此时拼接并编码为 PNG（像素与原图一致）"""
+        np = self.np
+        kind, offset = self.entries[digest][:2]
+        (_, width, height, bands, tile, _), ids = self._manifest(offset)
+        if kind == KIND_NAMES[KIND_RAW]:
+            return self._chunk(int(ids[0]))
+
+        from PIL import Image
+        tiles = np.frombuffer(b"".join(self._chunk(int(i)) for i in ids), dtype=np.uint8)
+        rows, cols = -(-height // tile), -(-width // tile)
+        array = join_tiles(tiles, rows, cols, width, height, bands, tile)
+        if bands == 1:
+            array = array[:, :, 0]
+        buffer = BytesIO()
+        Image.fromarray(np.ascontiguousarray(array), MODES[bands]).save(
+            buffer, format="PNG", compress_level=1
+        )
+        return buffer.getvalue()
+
+    @contextlib.contextmanager
+    def materialize(self, digest):
+        """临时重建为文件，with 块结束后立即删除"""
+        name = self.entries[digest][3]
+        suffix = ".png" if self.entries[digest][0] == KIND_NAMES[KIND_TILES] else Path(name).suffix
+        fd, path = tempfile.mkstemp(prefix="claude_clipboard_tile_", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.read(digest))
+            yield Path(path)
+        finally:
+            os.unlink(path)
+
+    def disk_usage(self):
+        """存储占用的字节数"""
+        paths = (self.pack_path, self.chunk_index_path, self.manifest_path, self.index_path)
+        return sum(path.stat().st_size for path in paths if path.exists())
+
+    def close(self):
+        self._close_maps()
@@ -0,0 +1,306 @@
+"""
+剪切板事件轨迹的录制与回放
+录制真实使用时的剪切板变化（时间戳、图片尺寸、指纹，可选原始图片），
+回放时通过模拟剪切板把同一份轨迹喂给任意监听器，比较不同配置的吞吐、丢失率和尾延迟。
+
+轨迹文件格式（大端）:
+  文件头  b"CCMTRACE" + 版本号 (1 字节)
+  每条记录 RECORD 结构 + payload_len 字节的原始数据（未保存图片时为 0）
+"""
+
+import io
+import os
+import time
+import struct
+import hashlib
+import inspect
+import tempfile
+import contextlib
+from pathlib import Path
+
+from .backends import FakeClipboard, fake_backends
+from .clipboard import grab_clipboard
+from .storage import file_list_hash
+
+
+TRACE_MAGIC = b"CCMTRACE"
+TRACE_VERSION = 1
+
+# 相对录制开始的秒数, 类型, 字节数, 宽, 高, MD5, 附带数据长度
+RECORD = struct.Struct(">dBIHH16sI")
+
+KIND_PNG = 1
+KIND_FILES = 2
+
+
+class TraceEvent:
+    """轨迹中的一次剪切板变化"""
+
+    __slots__ = ("time", "kind", "size", "width", "height", "digest", "payload")
+
+    def __init__(self, time, kind, size, width, height, digest, payload=b""):
+        self.time = time
+        self.kind = kind
+        self.size = size
+        self.width = width
+        self.height = height
+        self.digest = digest
+        self.payload = payload
+
+
+def png_dimensions(data):
+    """从 PNG 的 IHDR 块读取宽高，不解码图片"""
+    if data[:8] != b"\x89PNG\r\n\x1a\n" or len(data) < 24:
+        return 0, 0
+    return struct.unpack(">II", data[16:24])
+
+
+def write_event(stream, event):
+    stream.write(RECORD.pack(
+        event.time, event.kind, event.size,
+        min(event.width, 0xFFFF), min(event.height, 0xFFFF),
+        event.digest, len(event.payload),
+    ))
+    stream.write(event.payload)
+
+
+def read_trace(path):
+    """逐条读取轨迹文件中的事件"""
+    with open(path, "rb") as stream:
+        header = stream.read(len(TRACE_MAGIC) + 1)
+        if header[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+            raise ValueError(f"不是剪切板轨迹文件: {path}")
+        if header[-1] != TRACE_VERSION:
+            raise ValueError(f"不支持的轨迹版本: {header[-1]}")
+        while True:
+            record = stream.read(RECORD.size)
+            if len(record) < RECORD.size:
+                return
+            t, kind, size, width, height, digest, payload_len = RECORD.unpack(record)
+            payload = stream.read(payload_len) if payload_len else b""
+            yield TraceEvent(t, kind, size, width, height, digest, payload)
+
+
+def record_trace(path, duration=None, interval=0.1, include_images=False):
+    """录制剪切板变化到轨迹文件，直到超时或 Ctrl+C；返回记录的事件数"""
+    count = 0
+    last_digest = None
+    start = time.monotonic()
+
+    with open(path, "wb") as stream:
+        stream.write(TRACE_MAGIC + bytes([TRACE_VERSION]))
+        print(f"⏺️ 正在录制剪切板轨迹到 {path}（Ctrl+C 结束）")
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                content = grab_clipboard()
+                now = time.monotonic() - start
+                event = None
+                if isinstance(content, bytes):
+                    digest = hashlib.md5(content).digest()
+                    if digest != last_digest:
+                        width, height = png_dimensions(content)
+                        event = TraceEvent(now, KIND_PNG, len(content), width, height, digest,
+                                           content if include_images else b"")
+                elif isinstance(content, list):
+                    digest = bytes.fromhex(file_list_hash(content))
+                    if digest != last_digest:
+                        size = sum(os.path.getsize(p) for p in content if os.path.isfile(p))
+                        event = TraceEvent(now, KIND_FILES, size, len(content), 0, digest)
+
+                if event is not None:
+                    write_event(stream, event)
+                    stream.flush()
+                    last_digest = event.digest
+                    count += 1
+                    print(f"📝 #{count} {now:8.2f}s {event.size / 1024:.0f} KB "
+                          f"{event.width}x{event.height}")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+
+    print(f"✅ 已录制 {count} 个事件")
+    return count
+
+
+class ReplayClipboard(FakeClipboard):
+    """回放用的内存剪切板：记录每个事件是否被监听器读到过，用于统计丢失和延迟"""
+
+    def __init__(self):
+        super().__init__()
+        self.event_id = None
+        self.observed = set()
+
+    def publish(self, event_id, content):
+        self.event_id = event_id
+        self.set_content(content)
+
+    def read(self, encode=True):
+        if self.event_id is not None:
+            self.observed.add(self.event_id)
+        return super().read(encode)
+
+
+class _PayloadFactory:
+    """为未保存图片的轨迹事件生成同尺寸、内容各不相同的模拟数据"""
+
+    def __init__(self, scratch_dir):
+        self.scratch_dir = Path(scratch_dir)
+        self.bases = {}
+
+    def prepare(self, event):
+        """预先生成基础图片，回放计时期间只做廉价的字节拼接"""
+        if event.kind == KIND_PNG and not event.payload:
+            size = (max(event.width, 1), max(event.height, 1))
+            if size not in self.bases:
+                from .benchmark import make_screenshot_png
+                self.bases[size] = make_screenshot_png(*size)
+
+    def build(self, index, event):
+        if event.kind == KIND_PNG:
+            if event.payload:
+                return event.payload
+            from .benchmark import make_png_variants
+            base = self.bases[(max(event.width, 1), max(event.height, 1))]
+            return next(make_png_variants(base, 1, start=index))
+
+        # 复制的文件：在临时目录中生成对应数量的文件，总大小与录制时一致
+        count = max(event.width, 1)
+        paths = []
+        for n in range(count):
+            path = self.scratch_dir / f"trace_{index}_{n}.png"
+            with open(path, "wb") as f:
+                f.truncate(event.size // count)
+            paths.append(str(path))
+        return paths
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def create_monitor(name, tmp_dir, backends=None, **options):
+    """按名称创建使用内存后端的监听器，只传入该类支持的参数"""
+    if name == "smart":
+        from .smart_monitor import SmartClipboardMonitor as monitor_class
+    elif name == "simple":
+        from .simple_monitor import SimpleClipboardMonitor as monitor_class
+    elif name == "drag":
+        from .drag_monitor import DragClipboardMonitor as monitor_class
+    else:
+        from .monitor import ClipboardMonitor as monitor_class
+
+    accepted = inspect.signature(monitor_class.__init__).parameters
+    kwargs = {k: v for k, v in options.items() if k in accepted and v is not None}
+    if "tmp_dir" in accepted:
+        kwargs["tmp_dir"] = tmp_dir
+    kwargs["backends"] = backends or fake_backends()
+    with contextlib.redirect_stdout(io.StringIO()):
+        monitor = monitor_class(**kwargs)
+    if hasattr(monitor, "temp_dir"):
+        monitor.temp_dir = Path(tmp_dir)
+    return monitor
+
+
+def replay_trace(path, monitor="monitor", speed=1.0, poll_interval=0.5, **options):
+    """将轨迹回放给监听器并统计结果
+
+    speed: 时间加速倍数（轨迹时间和轮询间隔同比缩短）；0 表示不等待，每个事件后立即轮询一次。
+    监听器每次轮询都调用 process_clipboard()，与 run() 中的单次循环一致；
+    两次轮询之间被覆盖的事件计为丢失，延迟为事件发布到被处理完成的时间。
+    返回统计结果字典。
+    """
+    events = list(read_trace(path))
+    if not events:
+        print("⚠️ 轨迹为空")
+        return None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scratch = Path(tmp_dir) / "source"
+        scratch.mkdir()
+        factory = _PayloadFactory(scratch)
+        for event in events:
+            factory.prepare(event)
+
+        clipboard = ReplayClipboard()
+        instance = create_monitor(
+            monitor, tmp_dir, backends=fake_backends(clipboard=clipboard), **options
+        )
+
+        published_at = {}
+        latencies = []
+        busy = 0.0
+        polls = 0
+
+        def poll():
+            nonlocal busy, polls
+            seen = set(clipboard.observed)
+            begin = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                instance.process_clipboard()
+                # 回放只统计捕获阶段，清空待交付批次
+                if hasattr(instance, "coalescer"):
+                    instance.coalescer.drain()
+            end = time.perf_counter()
+            busy += end - begin
+            polls += 1
+            for event_id in clipboard.observed - seen:
+                latencies.append(end - published_at[event_id])
+
+        start = time.perf_counter()
+        if not speed:
+            for index, event in enumerate(events):
+                clipboard.publish(index, factory.build(index, event))
+                published_at[index] = time.perf_counter()
+                poll()
+        else:
+            interval = poll_interval / speed
+            next_poll = start
+            index = 0
+            while index < len(events):
+                now = time.perf_counter()
+                # 发布所有已到时间的事件，两次轮询之间的事件会互相覆盖
+                while index < len(events) and start + events[index].time / speed <= now:
+                    clipboard.publish(index, factory.build(index, events[index]))
+                    published_at[index] = start + events[index].time / speed
+                    index += 1
+                if now >= next_poll:
+                    poll()
+                    # 与 run() 一致：处理完成后再等待一个轮询间隔
+                    next_poll = time.perf_counter() + interval
+                elif index < len(events):
+                    due = start + events[index].time / speed
+                    time.sleep(max(0.0, min(next_poll, due) - now))
+            # 最后一个事件之后再轮询一次
+            time.sleep(max(0.0, next_poll - time.perf_counter()))
+            poll()
+        wall = time.perf_counter() - start
+
+        if getattr(instance, "recompressor", None):
+            instance.recompressor.shutdown()
+
+    observed = len(clipboard.observed)
+    result = {
+        "events": len(events),
+        "observed": observed,
+        "dropped": len(events) - observed,
+        "drop_rate": (len(events) - observed) / len(events),
+        "polls": polls,
+        "wall_seconds": wall,
+        "busy_seconds": busy,
+        "throughput": observed / busy if busy else 0.0,
+        "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+        "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+    print(f"🎞️ 回放 {result['events']} 个事件 → {monitor}，速度 {f'{speed:g}x' if speed else '不限'}，"
+          f"轮询 {polls} 次，耗时 {wall:.1f} s")
+    print(f"📥 处理 {observed} 个，丢失 {result['dropped']} 个 ({result['drop_rate']:.1%})")
+    print(f"⚡ 吞吐: {result['throughput']:.1f} 事件/秒（按处理耗时）")
+    print(f"⏱️ 延迟: p50 {result['latency_p50_ms']:.1f} ms, p95 {result['latency_p95_ms']:.1f} ms, "
+          f"p99 {result['latency_p99_ms']:.1f} ms, 最大 {result['latency_max_ms']:.1f} ms")
+    return result
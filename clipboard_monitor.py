@@ -75,7 +75,15 @@ class ClipboardMonitor:
         filename = f"clipboard_{timestamp}.png"
         filepath = self.tmp_dir / filename
         
-        image.save(filepath, "PNG")
+        # 先写入同目录临时文件再原子替换，避免读到写了一半的图片
+        tmp_path = self.tmp_dir / f".{filename}.{os.getpid()}.tmp"
+        try:
+            image.save(tmp_path, "PNG")
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
         return filepath
     
     def cleanup_old_files(self):
@@ -0,0 +1,57 @@
+"""pack 归档的回归测试"""
+
+import tarfile
+
+import pytest
+
+from claude_clipboard_monitor.archive import ScreenshotArchive
+
+
+def _screenshot(directory, name, data):
+    path = directory / name
+    path.write_bytes(data)
+    return path
+
+
+def test_missing_index_does_not_overwrite_pack(tmp_path):
+    screenshots = tmp_path / "screenshots"
+    screenshots.mkdir()
+    archive_dir = tmp_path / "archive"
+    first = _screenshot(screenshots, "clipboard_first.png", b"first" * 100)
+    assert ScreenshotArchive(archive_dir).archive_files([first]) == 1
+    assert not first.exists()
+
+    # 索引丢失后继续归档，追加位置仍按 pack 的实际内容确定
+    (archive_dir / "index.json").unlink()
+    second = _screenshot(screenshots, "clipboard_second.png", b"second" * 100)
+    assert ScreenshotArchive(archive_dir).archive_files([second]) == 1
+
+    for pack in archive_dir.glob("pack-*.tar"):
+        with tarfile.open(pack) as tar:
+            members = {member.name: tar.extractfile(member).read() for member in tar}
+        assert members == {"clipboard_first.png": b"first" * 100,
+                           "clipboard_second.png": b"second" * 100}
+
+
+def test_originals_kept_until_index_saved(tmp_path, monkeypatch):
+    archive = ScreenshotArchive(tmp_path / "archive")
+    path = _screenshot(tmp_path, "clipboard_a.png", b"data")
+
+    def fail():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(archive, "save_index", fail)
+    with pytest.raises(OSError):
+        archive.archive_files([path])
+    assert path.exists()
+
+
+def test_duplicate_content_resolves_by_name_after_reload(tmp_path):
+    first = _screenshot(tmp_path, "clipboard_first.png", b"same")
+    second = _screenshot(tmp_path, "clipboard_second.png", b"same")
+    assert ScreenshotArchive(tmp_path / "archive").archive_files([first, second]) == 2
+
+    archive = ScreenshotArchive(tmp_path / "archive")
+    for name in ("clipboard_first.png", "clipboard_second.png"):
+        assert archive.read(archive.resolve(name)) == b"same"
+    archive.close()
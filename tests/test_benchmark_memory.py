@@ -0,0 +1,25 @@
+"""内存基准的回归测试：稳态内存必须平稳"""
+
+import pytest
+
+pytest.importorskip("psutil")
+
+from claude_clipboard_monitor import benchmark
+from claude_clipboard_monitor.smart_monitor import SmartClipboardMonitor
+
+
+def test_4k_decode_memory_is_flat(capsys):
+    # 不可压缩的 4K 截图，每张都完整解码并缩放
+    assert benchmark.benchmark_memory(captures=24, window=8)
+
+
+def test_growing_memory_is_detected(monkeypatch, capsys):
+    leaked = []
+    process_clipboard = SmartClipboardMonitor.process_clipboard
+
+    def leaking(self):
+        process_clipboard(self)
+        leaked.append(bytes(1024 * 1024))
+
+    monkeypatch.setattr(SmartClipboardMonitor, "process_clipboard", leaking)
+    assert not benchmark.benchmark_memory(captures=30, width=640, height=360, window=10)
@@ -0,0 +1,79 @@
+"""直接截图的回归测试（假抓取器 + 内存后端）"""
+
+import pytest
+from PIL import Image
+
+from claude_clipboard_monitor.backends import fake_backends
+from claude_clipboard_monitor.capture import ScreenCapture, parse_geometry
+from claude_clipboard_monitor.coalescer import format_path_references
+
+
+class FakeGrabber:
+    """从一张固定的"屏幕"图片中裁剪区域"""
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.regions = []
+        self.closed = False
+
+    def grab(self, region=None):
+        self.regions.append(region)
+        if region is None:
+            return self.screen.copy()
+        left, top, width, height = region
+        return self.screen.crop((left, top, left + width, top + height))
+
+    def describe(self):
+        return "fake"
+
+    def close(self):
+        self.closed = True
+
+
+def _screen():
+    screen = Image.new("RGB", (320, 240), "white")
+    screen.paste(Image.new("RGB", (100, 50), "red"), (20, 10))
+    return screen
+
+
+def test_capture_saves_region_and_delivers_path(tmp_path, capsys):
+    backends = fake_backends()
+    grabber = FakeGrabber(_screen())
+    capture = ScreenCapture(tmp_dir=tmp_path, grabber=grabber, backends=backends)
+
+    filepath = capture.capture(parse_geometry("100x50+20+10"))
+
+    assert grabber.regions == [(20, 10, 100, 50)]
+    assert filepath.parent == tmp_path
+    assert filepath.name.startswith("clipboard_") and filepath.suffix == ".png"
+    with Image.open(filepath) as saved:
+        assert saved.size == (100, 50)
+        assert saved.convert("RGB").getcolors() == [(100 * 50, (255, 0, 0))]
+    assert backends.clipboard.writes[-1] == ("text", format_path_references([filepath]))
+    assert len(capture.latencies) == 1 and len(capture.latencies[0]) == 4
+
+
+def test_capture_without_deliver_only_saves(tmp_path):
+    backends = fake_backends()
+    capture = ScreenCapture(tmp_dir=tmp_path, deliver=False,
+                            grabber=FakeGrabber(_screen()), backends=backends)
+    filepath = capture.capture()
+    assert filepath.exists()
+    assert backends.clipboard.writes == []
+
+
+def test_terminal_delivery_falls_back_to_clipboard(tmp_path):
+    # 没有运行在终端中的 Claude Code 时回退到剪切板
+    backends = fake_backends()
+    capture = ScreenCapture(tmp_dir=tmp_path, terminal=True,
+                            grabber=FakeGrabber(_screen()), backends=backends)
+    filepath = capture.capture()
+    assert backends.clipboard.writes[-1] == ("text", format_path_references([filepath]))
+
+
+def test_parse_geometry_rejects_bad_regions():
+    assert parse_geometry("640x480") == (0, 0, 640, 480)
+    with pytest.raises(ValueError):
+        parse_geometry("0x480+1+1")
+    with pytest.raises(ValueError):
+        parse_geometry("wide")
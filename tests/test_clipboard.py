@@ -0,0 +1,101 @@
+"""一次性文本剪切板所有者的回归测试（不需要 X 服务器）"""
+
+import pytest
+
+pytest.importorskip("Xlib")
+
+from Xlib import X, Xatom
+from Xlib.xobject.drawable import Window
+
+from claude_clipboard_monitor.clipboard import OneShotTextSelection, TEXT_TARGETS
+
+ATOMS = {name: 100 + i for i, name in enumerate(("TARGETS", "TIMESTAMP") + TEXT_TARGETS)}
+
+
+class FakeRequestor(Window):
+    """记录写入的属性和发送的事件"""
+
+    def __init__(self):
+        super().__init__(None, 42)
+        self.properties = {}
+        self.notified = []
+
+    def change_property(self, prop, prop_type, fmt, data):
+        self.properties[prop] = (prop_type, data)
+
+    def send_event(self, event):
+        self.notified.append(event.property)
+
+
+class FakeRequest:
+    type = X.SelectionRequest
+    time = 0
+    selection = 1
+
+    def __init__(self, requestor, target):
+        self.requestor = requestor
+        self.target = target
+        self.property = 7
+
+
+class FakeDisplay:
+    def __init__(self, events):
+        self.events = list(events)
+        self.closed = False
+
+    def pending_events(self):
+        return len(self.events)
+
+    def next_event(self):
+        return self.events.pop(0)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeWindow:
+    destroyed = False
+
+    def destroy(self):
+        self.destroyed = True
+
+
+def _owner(events):
+    owner = object.__new__(OneShotTextSelection)
+    owner.X = X
+    owner.Xatom = Xatom
+    owner.text = " @/tmp/clipboard_text.txt "
+    owner.display = FakeDisplay(events)
+    owner.window = FakeWindow()
+    owner.targets_atom = ATOMS["TARGETS"]
+    owner.timestamp_atom = ATOMS["TIMESTAMP"]
+    owner.text_atoms = {ATOMS[name]: name for name in TEXT_TARGETS}
+    owner.owned_since = 0
+    owner.pasted = False
+    return owner
+
+
+def test_targets_request_does_not_consume_reference():
+    requestor = FakeRequestor()
+    owner = _owner([])
+    owner.handle_selection_request(FakeRequest(requestor, ATOMS["TARGETS"]))
+
+    assert not owner.pasted
+    prop_type, atoms = requestor.properties[7]
+    assert prop_type == Xatom.ATOM and ATOMS["UTF8_STRING"] in atoms
+
+
+def test_reference_served_after_targets_then_owner_exits():
+    requestor = FakeRequestor()
+    owner = _owner([FakeRequest(requestor, ATOMS["TARGETS"]),
+                    FakeRequest(requestor, ATOMS["TIMESTAMP"]),
+                    FakeRequest(requestor, ATOMS["UTF8_STRING"])])
+    owner._serve()
+
+    assert owner.pasted
+    assert requestor.properties[7] == (ATOMS["UTF8_STRING"], b" @/tmp/clipboard_text.txt ")
+    assert requestor.notified == [7, 7, 7]
+    assert owner.window.destroyed and owner.display.closed
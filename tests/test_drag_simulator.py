@@ -0,0 +1,88 @@
+"""拖拽模拟器的回归测试（Linux 窗口查找与按 id 激活）"""
+
+import os
+import stat
+
+from claude_clipboard_monitor import backends as backends_module
+from claude_clipboard_monitor.backends import PyAutoGUIInput, fake_backends
+from claude_clipboard_monitor.drag_simulator import ClaudeCodeWindowFinder, DragSimulator
+
+WMCTRL_LIST = (
+    "0x01e00003  0 0    0    1920 32   host Top Panel\n"
+    "0x04a00007  0 100  60   1600 900  host ~/project - Claude Code\n"
+)
+
+
+def _fake_wmctrl(tmp_path, monkeypatch):
+    """在 PATH 前面放一个假的 wmctrl：-lG 输出窗口列表，其余调用记录参数"""
+    log = tmp_path / "wmctrl.log"
+    script = tmp_path / "wmctrl"
+    script.write_text(
+        "#!/bin/sh\n"
+        f"if [ \"$1\" = \"-lG\" ]; then printf '{WMCTRL_LIST}'; exit 0; fi\n"
+        f"echo \"$@\" >> {log}\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return log
+
+
+def test_wmctrl_windows_include_geometry(tmp_path, monkeypatch):
+    _fake_wmctrl(tmp_path, monkeypatch)
+    windows = ClaudeCodeWindowFinder()._find_linux_claude()
+    assert windows == [{
+        'title': "~/project - Claude Code", 'id': "0x04a00007",
+        'x': 100, 'y': 60, 'width': 1600, 'height': 900,
+    }]
+
+
+def test_pyautogui_input_activates_by_id(tmp_path, monkeypatch):
+    log = _fake_wmctrl(tmp_path, monkeypatch)
+    monkeypatch.setattr(backends_module.platform, "system", lambda: "Linux")
+    # 无法确认激活结果，仍返回 False 交给调用方确认
+    assert not PyAutoGUIInput().activate({'id': "0x04a00007"})
+    assert log.read_text().split() == ["-ia", "0x04a00007"]
+
+
+class UnconfirmedInput:
+    """激活请求无法确认的输入后端（没有 XTEST 的 Linux）"""
+
+    def __init__(self, windows):
+        self.windows = windows
+        self.events = []
+
+    def activate(self, window, timeout):
+        # 模拟窗口管理器稍后把窗口切到前台
+        self.events.append(("activate", window.get('id')))
+        self.windows.active_title = "Claude Code"
+        return False
+
+    def click(self, x, y):
+        self.events.append(("click", x, y))
+
+    def hotkey(self, *keys):
+        self.events.append(("hotkey",) + keys)
+
+
+def test_window_without_geometry_is_pasted_after_activation():
+    backends = fake_backends()
+    backends.windows.windows = [{'id': "0x04a00007"}]
+    backends.windows.active_title = "terminal"
+    backends.input = UnconfirmedInput(backends.windows)
+    simulator = DragSimulator(backends=backends, activate_timeout=0.2)
+
+    assert simulator.simulate_drag_to_claude(["/tmp/a.png", "/tmp/b.png"])
+    assert backends.input.events[0] == ("activate", "0x04a00007")
+    assert backends.input.events[-1][0] == "hotkey"
+    assert not any(event[0] == "click" for event in backends.input.events)
+
+
+def test_unconfirmed_window_is_not_pasted():
+    backends = fake_backends()
+    backends.windows.windows = [{'id': "0x04a00007"}]
+    backends.windows.active_title = "terminal"
+    simulator = DragSimulator(backends=backends, activate_timeout=0.05)
+    backends.input.activate = lambda window, timeout: False
+
+    assert not simulator.simulate_drag_to_claude("/tmp/a.png")
+    assert not any(event[0] == "hotkey" for event in backends.input.events)
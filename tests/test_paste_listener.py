@@ -0,0 +1,105 @@
+"""evdev 粘贴监听器的回归测试（需要 /dev/uinput 写权限）"""
+
+import os
+import time
+import threading
+
+import pytest
+
+evdev = pytest.importorskip("evdev")
+
+if not os.access("/dev/uinput", os.W_OK):
+    pytest.skip("需要 /dev/uinput 写权限", allow_module_level=True)
+
+from evdev import ecodes, UInput
+
+from claude_clipboard_monitor import paste_listener
+from claude_clipboard_monitor.paste_listener import EvdevPasteListener
+
+DEVICE_NAME = "claude-clipboard-test-keyboard"
+
+
+def _virtual_keyboard():
+    keyboard = UInput({ecodes.EV_KEY: [ecodes.KEY_LEFTCTRL, ecodes.KEY_V]}, name=DEVICE_NAME)
+    # 等待 udev 创建设备节点
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        for path in evdev.list_devices():
+            try:
+                if evdev.InputDevice(path).name == DEVICE_NAME:
+                    return keyboard
+            except OSError:
+                continue
+        time.sleep(0.05)
+    keyboard.close()
+    pytest.skip("虚拟键盘设备未出现")
+
+
+def _press_paste(keyboard):
+    for code, value in ((ecodes.KEY_LEFTCTRL, 1), (ecodes.KEY_V, 1),
+                        (ecodes.KEY_V, 0), (ecodes.KEY_LEFTCTRL, 0)):
+        keyboard.write(ecodes.EV_KEY, code, value)
+        keyboard.syn()
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def only_virtual_keyboard(monkeypatch):
+    """只监听测试用的虚拟键盘，忽略机器上的真实键盘"""
+    scan = EvdevPasteListener._scan_devices
+
+    def scan_virtual(self):
+        found = []
+        for device in scan(self):
+            if device.name == DEVICE_NAME:
+                found.append(device)
+            else:
+                device.close()
+        return found
+
+    monkeypatch.setattr(EvdevPasteListener, "_scan_devices", scan_virtual)
+    monkeypatch.setattr(paste_listener, "RESCAN_INTERVAL", 0.05)
+
+
+def test_ctrl_v_detected_and_unplug_handled(only_virtual_keyboard):
+    pastes = []
+    pasted = threading.Event()
+
+    def on_paste():
+        pastes.append(time.monotonic())
+        pasted.set()
+
+    keyboard = _virtual_keyboard()
+    listener = EvdevPasteListener(on_paste)
+    listener.start()
+    try:
+        _press_paste(keyboard)
+        assert pasted.wait(5)
+        assert len(pastes) == 1
+
+        # 拔出：设备被移除，线程不会在失效的设备上空转
+        keyboard.close()
+        assert _wait_until(lambda: not listener.devices)
+        assert listener.thread.is_alive()
+        cpu = time.process_time()
+        time.sleep(0.5)
+        assert time.process_time() - cpu < 0.25
+
+        # 重新插入后自动重新扫描到设备
+        pasted.clear()
+        keyboard = _virtual_keyboard()
+        assert _wait_until(lambda: listener.devices)
+        _press_paste(keyboard)
+        assert pasted.wait(5)
+        assert len(pastes) == 2
+    finally:
+        listener.stop()
+        keyboard.close()
@@ -0,0 +1,187 @@
+"""会话与电源状态感知的回归测试
+
+启动独立的 dbus-daemon，用 jeepney 实现一个假的 logind / UPower 服务，
+切换 LockedHint、PrepareForSleep 和 OnBattery，检查暂停/恢复和低频轮询。
+"""
+
+import queue
+import shutil
+import threading
+import subprocess
+import time
+
+import pytest
+
+pytest.importorskip("jeepney")
+
+if not shutil.which("dbus-daemon") or not shutil.which("gdbus"):
+    pytest.skip("需要 dbus-daemon 和 gdbus", allow_module_level=True)
+
+from jeepney import DBusAddress, HeaderFields, MessageType, new_error, new_method_return, new_signal
+from jeepney.bus_messages import message_bus
+from jeepney.io.blocking import open_dbus_connection
+
+from claude_clipboard_monitor.backends import fake_backends
+from claude_clipboard_monitor.power import BATTERY_INTERVAL_FACTOR, LOGIND, UPOWER, PowerState
+from claude_clipboard_monitor.scheduler import IDLE_POLL_INTERVAL
+from claude_clipboard_monitor.smart_monitor import SmartClipboardMonitor
+
+MANAGER_PATH = "/org/freedesktop/login1"
+SESSION_PATH = "/org/freedesktop/login1/session/_3test"
+UPOWER_PATH = "/org/freedesktop/UPower"
+SESSION = "org.freedesktop.login1.Session"
+PROPERTIES = "org.freedesktop.DBus.Properties"
+
+
+class FakeLoginService:
+    """在独立总线上占用 logind 和 UPower 的名字，应答属性查询并按需发出信号"""
+
+    def __init__(self, address):
+        self.connection = open_dbus_connection(bus=address)
+        for name in (LOGIND, UPOWER):
+            self.connection.send_and_get_reply(message_bus.RequestName(name))
+        self.properties = {
+            (SESSION_PATH, "LockedHint"): False,
+            (SESSION_PATH, "IdleHint"): False,
+            (UPOWER_PATH, "OnBattery"): False,
+        }
+        self.outgoing = queue.Queue()
+        self.running = True
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _reply(self, message):
+        member = message.header.fields.get(HeaderFields.member)
+        path = message.header.fields.get(HeaderFields.path)
+        if member == "GetSessionByPID":
+            return new_method_return(message, "o", (SESSION_PATH,))
+        if member == "Get" and (path, message.body[1]) in self.properties:
+            return new_method_return(message, "v", (("b", self.properties[path, message.body[1]]),))
+        return new_error(message, "org.freedesktop.DBus.Error.UnknownMethod")
+
+    def _serve(self):
+        # 所有收发都在同一线程中进行，jeepney 的阻塞连接不保证线程安全
+        while self.running:
+            try:
+                message = self.connection.receive(timeout=0.05)
+            except TimeoutError:
+                message = None
+            except OSError:
+                return
+            if message is not None and message.header.message_type == MessageType.method_call:
+                self.connection.send(self._reply(message))
+            while not self.outgoing.empty():
+                self.connection.send(self.outgoing.get())
+
+    def set_property(self, path, interface, name, value):
+        self.properties[path, name] = value
+        emitter = DBusAddress(path, interface=PROPERTIES)
+        self.outgoing.put(new_signal(
+            emitter, "PropertiesChanged", "sa{sv}as", (interface, {name: ("b", value)}, [])
+        ))
+
+    def prepare_for_sleep(self, value):
+        emitter = DBusAddress(MANAGER_PATH, interface="org.freedesktop.login1.Manager")
+        self.outgoing.put(new_signal(emitter, "PrepareForSleep", "b", (value,)))
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=2)
+        self.connection.close()
+
+
+@pytest.fixture
+def bus():
+    daemon = subprocess.Popen(
+        ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    address = daemon.stdout.readline().strip()
+    service = FakeLoginService(address)
+    try:
+        yield address, service
+    finally:
+        service.close()
+        daemon.terminate()
+        daemon.wait(timeout=5)
+
+
+def _until(condition, emit, timeout=5.0):
+    """重复发出信号直到条件成立（gdbus monitor 启动后才会注册匹配规则）"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        emit()
+        if condition():
+            return True
+        time.sleep(0.1)
+    return condition()
+
+
+def test_locked_session_pauses_and_battery_slows_polling(bus):
+    address, service = bus
+    service.properties[UPOWER_PATH, "OnBattery"] = True
+
+    power = PowerState(address=address)
+    try:
+        assert power.start()
+        assert power.session_path == SESSION_PATH
+        assert not power.paused
+        # 初始状态通过 Properties.Get 读取
+        assert power.on_battery
+        assert power.poll_interval(0.5) == 0.5 * BATTERY_INTERVAL_FACTOR
+
+        assert _until(lambda: power.paused,
+                      lambda: service.set_property(SESSION_PATH, SESSION, "LockedHint", True))
+        assert power.describe() == "会话已锁定"
+        assert not power.wait_active(0.1)
+
+        # 阻塞在 wait_active() 中的监听循环应在解锁后立即恢复
+        resumed = []
+        waiter = threading.Thread(target=lambda: resumed.append(power.wait_active(5)))
+        waiter.start()
+        assert _until(lambda: not power.paused,
+                      lambda: service.set_property(SESSION_PATH, SESSION, "LockedHint", False))
+        waiter.join(timeout=5)
+        assert resumed == [True]
+
+        assert _until(lambda: power.paused, lambda: service.prepare_for_sleep(True))
+        assert power.describe() == "系统休眠"
+        assert _until(lambda: not power.paused, lambda: service.prepare_for_sleep(False))
+
+        assert _until(lambda: not power.on_battery,
+                      lambda: service.set_property(UPOWER_PATH, UPOWER, "OnBattery", False))
+        assert power.poll_interval(0.5) == 0.5
+    finally:
+        power.stop()
+
+
+def test_other_sessions_do_not_pause(bus):
+    address, service = bus
+    power = PowerState(address=address)
+    try:
+        assert power.start()
+        other = "/org/freedesktop/login1/session/_3other"
+        # 先确认信号已能送达，再检查其它会话的锁屏不影响当前会话
+        assert _until(lambda: power.on_battery,
+                      lambda: service.set_property(UPOWER_PATH, UPOWER, "OnBattery", True))
+        service.set_property(other, SESSION, "LockedHint", True)
+        time.sleep(0.3)
+        assert not power.paused
+    finally:
+        power.stop()
+
+
+def test_monitor_uses_low_frequency_profile_on_battery(bus, tmp_path):
+    address, service = bus
+    monitor = SmartClipboardMonitor(tmp_dir=tmp_path, backends=fake_backends())
+    monitor.power = PowerState(address=address)
+    try:
+        assert monitor.power.start()
+        monitor.claude_running = False
+        assert monitor.poll_interval() == IDLE_POLL_INTERVAL
+
+        assert _until(lambda: monitor.power.on_battery,
+                      lambda: service.set_property(UPOWER_PATH, UPOWER, "OnBattery", True))
+        assert monitor.poll_interval() == IDLE_POLL_INTERVAL * BATTERY_INTERVAL_FACTOR
+    finally:
+        monitor.power.stop()
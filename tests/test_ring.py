@@ -0,0 +1,46 @@
+"""截图环形缓冲区的回归测试"""
+
+import sys
+
+from claude_clipboard_monitor import ring as ring_module
+from claude_clipboard_monitor.ring import PATH_BYTES, CaptureRing
+
+
+def test_reuse_after_interrupted_write_resets_ring(tmp_path):
+    path = tmp_path / "ring"
+    ring = CaptureRing.create(capacity_mb=1, path=path, slots=4)
+    ring.add(b"png" * 100, "/tmp/clipboard_a.png")
+    # 模拟写入者在 add() 中途退出：代数停在奇数
+    _, _, _, _, head, seq, generation = ring._header()
+    ring._set_counters(head, seq, generation + 1)
+    ring.close()
+
+    ring = CaptureRing.create(capacity_mb=1, path=path, slots=4)
+    assert ring.entries() == []
+    assert ring.add(b"next")
+    assert [entry.size for entry in ring.entries()] == [4]
+    ring.close()
+
+
+def test_long_multibyte_path_is_stored_whole(tmp_path):
+    ring = CaptureRing.create(capacity_mb=1, path=tmp_path / "ring", slots=4)
+    # 300 多字节：旧布局会在 200 字节处切开一个汉字
+    path = "/tmp/" + "截图" * 50 + "/clipboard_a.png"
+    assert len(path.encode("utf-8")) > 200
+    ring.add(b"png", path)
+    assert ring.entries()[0].path == path
+    ring.close()
+
+
+def test_overlong_path_is_omitted_and_paste_path_fails(tmp_path, monkeypatch, capsys):
+    ring_path = tmp_path / "ring"
+    ring = CaptureRing.create(capacity_mb=1, path=ring_path, slots=4)
+    ring.add(b"png", "/tmp/" + "图" * PATH_BYTES)
+    assert ring.entries()[0].path == ""
+    ring.close()
+
+    monkeypatch.setattr(ring_module, "default_ring_path", lambda: ring_path)
+    monkeypatch.setattr(sys, "argv", ["claude-clipboard-ring", "paste", "--path"])
+    monkeypatch.setenv("CLAUDE_CLIPBOARD_BACKEND", "fake")
+    assert ring_module.main() == 1
+    assert "路径过长" in capsys.readouterr().out
@@ -0,0 +1,55 @@
+"""周期任务调度的回归测试：各监听器在虚拟时钟上运行 24 小时"""
+
+import contextlib
+import io
+
+import pytest
+
+from claude_clipboard_monitor.backends import fake_backends
+from claude_clipboard_monitor.scheduler import (
+    CLEANUP_INTERVAL, POLL_INTERVAL, PROCESS_CHECK_INTERVAL, STATS_INTERVAL,
+    WINDOW_REFRESH_INTERVAL, SimulatedClock,
+)
+from claude_clipboard_monitor.trace import create_monitor
+
+DURATION = 24 * 3600
+
+# 进程检测、轮询和窗口刷新在启动时立即执行一次，清理和统计第一次在一个间隔之后执行；
+# 停止任务在第 24 小时整执行，同一时刻到期的任务也会执行
+EXPECTED = {
+    "process": DURATION // PROCESS_CHECK_INTERVAL + 1,
+    "poll": int(DURATION / POLL_INTERVAL) + 1,
+    "cleanup": DURATION // CLEANUP_INTERVAL,
+    "stats": DURATION // STATS_INTERVAL,
+    "window": DURATION // WINDOW_REFRESH_INTERVAL + 1,
+}
+
+TASKS = {
+    "monitor": ["process", "poll", "cleanup", "stats"],
+    "smart": ["process", "poll", "cleanup", "stats"],
+    "simple": ["process", "poll", "cleanup"],
+    "drag": ["process", "poll", "window", "cleanup", "stats"],
+}
+
+
+@pytest.mark.parametrize("name", sorted(TASKS))
+def test_monitor_runs_periodic_tasks_for_24_hours(name, tmp_path):
+    clock = SimulatedClock()
+    monitor = create_monitor(name, tmp_path, backends=fake_backends(), clock=clock)
+    # 不订阅真实的电源状态，轮询间隔保持不变
+    monitor.power.start = lambda: False
+
+    def stop():
+        monitor.running = False
+
+    monitor.scheduler.after("stop", DURATION, stop)
+    with contextlib.redirect_stdout(io.StringIO()):
+        monitor.run()
+
+    tasks = monitor.scheduler.tasks
+    assert clock.now() == DURATION
+    assert sorted(set(tasks) - {"stop"}) == sorted(TASKS[name])
+    assert {task: tasks[task].runs for task in TASKS[name]} == \
+        {task: EXPECTED[task] for task in TASKS[name]}
+    assert EXPECTED["cleanup"] == 1440
+    assert all(task.errors == 0 for task in tasks.values())
@@ -0,0 +1,55 @@
+"""剪切板选择服务的回归测试（不需要 X 服务器）"""
+
+import pytest
+
+pytest.importorskip("Xlib")
+
+from Xlib.xobject.drawable import Window
+
+from claude_clipboard_monitor.selection_server import SelectionClipboardMonitor
+
+
+class FakeRequestor(Window):
+    """记录属性写入和事件掩码变化"""
+
+    def __init__(self):
+        super().__init__(None, 42)
+        self.properties = {}
+        self.event_masks = []
+
+    def change_property(self, prop, prop_type, fmt, data):
+        self.properties[prop] = (prop_type, data)
+
+    def change_attributes(self, event_mask):
+        self.event_masks.append(event_mask)
+
+
+class FakeDisplay:
+    def flush(self):
+        pass
+
+
+class FakeDeleteEvent:
+    def __init__(self, window, atom):
+        self.window = window
+        self.atom = atom
+
+
+def test_incr_keeps_event_mask_while_other_transfer_runs():
+    monitor = object.__new__(SelectionClipboardMonitor)
+    monitor.display = FakeDisplay()
+    monitor.chunk_size = 4
+    requestor = FakeRequestor()
+    monitor.incr_sends = {
+        (requestor.id, 7): [requestor, 1, b"", 0],
+        (requestor.id, 8): [requestor, 1, b"abcdef", 0],
+    }
+
+    # 属性 7 的传输结束，属性 8 仍在进行：不能停止接收该窗口的属性事件
+    monitor.continue_incr_send(FakeDeleteEvent(requestor, 7))
+    assert requestor.event_masks == []
+
+    for _ in range(3):
+        monitor.continue_incr_send(FakeDeleteEvent(requestor, 8))
+    assert monitor.incr_sends == {}
+    assert requestor.event_masks == [0]
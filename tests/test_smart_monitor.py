@@ -0,0 +1,31 @@
+"""智能监听器的回归测试（内存后端）"""
+
+from PIL import Image
+
+from claude_clipboard_monitor import smart_monitor
+from claude_clipboard_monitor.backends import fake_backends
+from claude_clipboard_monitor.smart_monitor import SmartClipboardMonitor
+
+
+def test_lazy_mode_fingerprints_only_when_clipboard_changes(tmp_path, monkeypatch, capsys):
+    fingerprints = []
+    fingerprint_image = smart_monitor.fingerprint_image
+
+    def counting(image):
+        fingerprints.append(image.size)
+        return fingerprint_image(image)
+
+    monkeypatch.setattr(smart_monitor, "fingerprint_image", counting)
+    backends = fake_backends()
+    monitor = SmartClipboardMonitor(tmp_dir=tmp_path, lazy=True, backends=backends)
+
+    backends.clipboard.set_content(Image.new("RGB", (64, 64), "red"))
+    for _ in range(5):
+        monitor.process_clipboard()
+    assert len(fingerprints) == 1
+
+    backends.clipboard.set_content(Image.new("RGB", (64, 64), "blue"))
+    monitor.process_clipboard()
+    monitor.process_clipboard()
+    assert len(fingerprints) == 2
+    assert len(monitor.pending_images) == 2
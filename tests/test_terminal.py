@@ -0,0 +1,80 @@
+"""终端直接交付的回归测试（需要 tmux）"""
+
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+if not shutil.which("tmux"):
+    pytest.skip("需要 tmux", allow_module_level=True)
+
+pytest.importorskip("psutil")
+
+from claude_clipboard_monitor.backends import SystemProcesses, fake_backends, is_claude_command
+from claude_clipboard_monitor.coalescer import format_path_references
+from claude_clipboard_monitor.terminal import TerminalSink, tmux_panes
+
+
+def test_claude_is_matched_by_executable_name():
+    assert is_claude_command("claude", ["claude", "--append-system-prompt", "clipboard"])
+    assert is_claude_command("node", ["node", "/usr/lib/node_modules/@anthropic-ai/claude-code/cli.js"])
+    assert not is_claude_command("python3", ["python3", "-m", "claude_clipboard_monitor"])
+    assert not is_claude_command("vim", ["vim", "CLAUDE.md"])
+
+
+@pytest.fixture
+def tmux(tmp_path, monkeypatch):
+    """独立 socket 上的 tmux 服务器；设置 TMUX 后不带 -L/-S 的 tmux 命令也连接到它"""
+    socket = str(tmp_path / "tmux.sock")
+
+    def run(*args):
+        return subprocess.run(["tmux", "-S", socket, *args], capture_output=True,
+                              text=True, check=True).stdout
+
+    run("-f", os.devnull, "new-session", "-d", "-s", "test", "-x", "200", "-y", "20")
+    monkeypatch.setenv("TMUX", f"{socket},0,0")
+    try:
+        yield run
+    finally:
+        subprocess.run(["tmux", "-S", socket, "kill-server"], capture_output=True)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    return condition()
+
+
+def test_send_keys_reaches_claude_pane(tmux, tmp_path):
+    # 用改名为 claude 的 cat 代替 Claude Code：等待终端输入，参数里带有 clipboard
+    claude = tmp_path / "claude"
+    shutil.copy(shutil.which("cat"), claude)
+    notes = tmp_path / "clipboard-notes.txt"
+    notes.write_text("")
+    # 参数里带 claude 但不是 Claude Code 的进程放在另一个 pane
+    log = tmp_path / "claude.log"
+    log.write_text("")
+    decoy = tmux("new-window", "-P", "-F", "#{pane_id}", f"tail -f {log}").strip()
+    pane = tmux("new-window", "-P", "-F", "#{pane_id}", f"{claude} {notes} -").strip()
+
+    assert _wait_for(lambda: pane in tmux_panes().values())
+    assert decoy in tmux_panes().values()
+
+    backends = fake_backends()
+    backends.processes = SystemProcesses()
+    sink = TerminalSink(backends=backends)
+    target = _wait_for(sink.find_target)
+    assert target is not None
+    assert target.pane == pane
+
+    paths = [str(tmp_path / "shot 1.png"), str(tmp_path / "shot2.png")]
+    assert sink.deliver(paths)
+    expected = format_path_references(paths).strip()
+    assert _wait_for(lambda: expected in tmux("capture-pane", "-p", "-t", pane))
+    assert expected not in tmux("capture-pane", "-p", "-t", decoy)
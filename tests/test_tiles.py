@@ -0,0 +1,86 @@
+"""分块去重存储的回归测试"""
+
+from io import BytesIO
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from claude_clipboard_monitor.tiles import TileHasher, TileStore, split_tiles
+
+
+def _colliding_pair():
+    """旧的线性哈希下哈希完全相同的两块：全黑，以及第 7、15 字节为 128 的副本"""
+    black = np.zeros((64, 64, 3), dtype=np.uint8)
+    other = black.copy()
+    flat = other.reshape(-1)
+    flat[7] = 128
+    flat[15] = 128
+    return black, other
+
+
+def _png(array):
+    buffer = BytesIO()
+    Image.fromarray(array, "RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_high_byte_differences_change_hash():
+    black, other = _colliding_pair()
+    hasher = TileHasher()
+    first = hasher.hash_tiles(split_tiles(black)[0])
+    second = hasher.hash_tiles(split_tiles(other)[0])
+    assert (int(first[0][0]), int(first[1][0])) != (int(second[0][0]), int(second[1][0]))
+
+
+def test_colliding_tiles_are_stored_separately(tmp_path):
+    black, other = _colliding_pair()
+    screenshots = tmp_path / "screenshots"
+    screenshots.mkdir()
+    paths = []
+    for name, array in (("clipboard_black.png", black), ("clipboard_other.png", other)):
+        path = screenshots / name
+        path.write_bytes(_png(array))
+        paths.append(path)
+
+    store = TileStore(tmp_path / "archive")
+    # 即使哈希冲突，也必须按内容区分数据块
+    store.hasher.hash_tiles = lambda tiles: (
+        np.zeros(len(tiles), dtype=np.uint64), np.zeros(len(tiles), dtype=np.uint64)
+    )
+    assert store.archive_files(paths) == 2
+
+    for name, array in (("clipboard_black.png", black), ("clipboard_other.png", other)):
+        data = store.read(store.resolve(name))
+        with Image.open(BytesIO(data)) as image:
+            assert np.array_equal(np.asarray(image), array)
+    store.close()
+
+
+def test_archived_images_round_trip_after_reopen(tmp_path):
+    black, other = _colliding_pair()
+    path = tmp_path / "clipboard_other.png"
+    path.write_bytes(_png(other))
+    TileStore(tmp_path / "archive").archive_files([path])
+
+    store = TileStore(tmp_path / "archive")
+    with Image.open(BytesIO(store.read(store.resolve("clipboard_other.png")))) as image:
+        assert np.array_equal(np.asarray(image), other)
+    store.close()
+
+
+def test_duplicate_content_resolves_by_name_after_reload(tmp_path):
+    black, _ = _colliding_pair()
+    paths = []
+    for name in ("clipboard_a.png", "clipboard_b.png"):
+        path = tmp_path / name
+        path.write_bytes(_png(black))
+        paths.append(path)
+    assert TileStore(tmp_path / "archive").archive_files(paths) == 2
+
+    store = TileStore(tmp_path / "archive")
+    assert store.resolve("clipboard_a.png") == store.resolve("clipboard_b.png")
+    with Image.open(BytesIO(store.read(store.resolve("clipboard_b.png")))) as image:
+        assert np.array_equal(np.asarray(image), black)
+    store.close()